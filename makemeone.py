@@ -4,7 +4,7 @@
 makemeone.py
 
 Usage:
-    $ python makemeone.py [agent-IPv4]
+    $ python makemeone.py [agent-IPv4] [options]
 
 Description:
     script to create a one-of-everything configuration on a 6.x switch
@@ -25,6 +25,8 @@ Prerequisites:
     containing the index references and minimum leaves to create a table entry.
     rowStatus leaf must be the last object for each config entry
     with SOME-MODULE-MIB being the top-level object in the JSON structure.
+    The "index" holds one value per object of the entry's INDEX clause, they
+    are encoded the way that clause says (see pyindex.py).
 
     Example:
 
@@ -54,6 +56,33 @@ Prerequisites:
 
 Parameters:
     agent-IPv4: the IP address of the SNMP manager agent.
+
+Options:
+    --port=N: UDP port of the SNMP agent, default 161.
+
+    --record=traceFile: save every net-SNMP command with its exit code and output
+    to traceFile.
+
+    --replay=traceFile: answer the net-SNMP commands from a recorded traceFile,
+    no agent needed.
+
+    --numeric[=oidmap.json]: send numeric OIDs with MIB loading turned off,
+    see pyresolve.py.
+
+    --v3-user=name [--v3-auth=MD5|SHA:password] [--v3-priv=DES|AES:password]:
+    SNMPv3 instead of v2c, see pytransport.py.
+
+    --daemon[=socketFile]: run in a pyprobed.py daemon instead, see pyprobed.py.
+
+    --profile[=file.pstats]: cProfile stats plus a Python CPU / child CPU /
+    network wait breakdown of the run, see pytransport.py.
+
+    --progress[=SECONDS]: entries done out of the conf with the command rate,
+    latency and an ETA, a status line on a terminal or a line every SECONDS
+    in a log, see pytransport.py.
+
+    --timeline=file.json: every SNMP operation as a Chrome trace-event span
+    for chrome://tracing or Perfetto, see pytransport.py.
     
 Revision:
     version 1.0, 08/22/2017 -- original version.
@@ -62,20 +91,22 @@ Author:
     Jeremy Mattfeld, jmattfel@ciena.com
 ==================================================================================="""
 
-from subprocess import Popen, PIPE, check_output, check_call, CalledProcessError, STDOUT
-from collections import OrderedDict
-import json
+from subprocess import CalledProcessError, STDOUT
 import IPy
 import sys
 import re
 
+import pyindex
+import pytransport
+
 
 def rowStatusGet(ip, module, obj):
     cmd = "snmpget -v 2c -c public -Oqv %s %s::%s" % (ip, module, obj)
 
     try:
-        output = check_output(cmd, shell=True)
-        match = re.match('active',output,flags=0)
+        output = pytransport.snmpRun(cmd)
+        #-m '' (--numeric) prints active(1) as just 1
+        match = re.match('(active|1)\s*$',output,flags=0)
         if match == None:
             return True
         else:
@@ -84,30 +115,16 @@ def rowStatusGet(ip, module, obj):
         print("ERROR getting value from %s::%s" % (module, obj))
 
 
-def nameToOidIndexGet(string):
-    print(string)
-
-    index = ''
-
-    for char in range(len(string)):
-        dec = ord(string[char])
-        index = index + '.' + str(dec)
-    return index
-
-
 def snmpSetCmdHandler(ip, module, entry, obj):
     setArgs = ''
 
+    #the instance suffix, encoded from the entry's INDEX clause
+    index = pyindex.suffixGet(module, entry, obj.get('index'))
+
     for key, val in obj.iteritems():
         data = val #this is an ordered dict
-        #if key == 'index' then grab index(es) then continue")
+        #the index is already in the suffix
         if key == 'index':
-            index = ''
-            for key, val in data.iteritems():
-                if 'Name' in key:
-                    index = nameToOidIndexGet(val)
-                else:
-                    index = index + '.' + val
             continue
         #else just build command str with [leaf.index type value]")
         else:
@@ -126,7 +143,7 @@ def snmpSetCmdHandler(ip, module, entry, obj):
 
     #send the snmpset command to the shell
     try:
-        output = check_output(cmd, shell=True)
+        output = pytransport.snmpRun(cmd)
         print(output)
     except CalledProcessError:
         print("ERROR setting %s" % (entry))
@@ -142,7 +159,8 @@ def snmpSetCmdHandler(ip, module, entry, obj):
         print(cmd)
 
         try:
-            output = check_output(cmd, shell=True)
+            with pytransport.operation('validate'):
+                output = pytransport.snmpRun(cmd)
             print(output)
         except CalledProcessError:
             print("ERROR setting %s" % (obj))
@@ -156,38 +174,46 @@ def snmpSetCmdHandler(ip, module, entry, obj):
 # main execution starts here
 ######
 
-usage = '''Usage: $ python makemeone.py [agent-IPv4]'''
+usage = '''Usage: $ python makemeone.py [agent-IPv4] [options]'''
+#with --daemon the run happens in a pyprobed.py daemon, see pytransport.daemonForward()
+returncode = pytransport.daemonForward(sys.argv)
+if returncode is not None:
+    sys.exit(returncode)
+options, args = pytransport.optionsParse(sys.argv)
 
 #command line arguments error checking
-if (len(sys.argv) < 2) or (sys.argv[1] == '-h') or (sys.argv[1] == '--help'):
-    if (len(sys.argv) < 2):
+if (len(args) < 2) or (args[1] == '-h') or (args[1] == '--help'):
+    if (len(args) < 2):
         print("ERROR: missing required argument\n%s" %usage)
         sys.exit()
     print(__doc__)
     sys.exit()
 
-if (len(sys.argv) > 2):
-    print("ERROR: unexpected argument %s\n%s" %(sys.argv[2], usage))
+if (len(args) > 2):
+    print("ERROR: unexpected argument %s\n%s" %(args[2], usage))
     sys.exit()
 
 #check IPv4 address
-agentIp = str(sys.argv[1])
+agentIp = str(args[1])
 try:
     IPy.IP(agentIp)
 except:
     print("ERROR: you must use a valid SNMP-agent IPv4\n%s" %usage)
     sys.exit()
+agentIp = pytransport.agentAddress(agentIp)
 
 #file I/O
 #configFilename = "makemeone.conf"
 configFilename = "test.conf"
 try:
-    with open(configFilename) as jsonConfigFile:
-        configData = json.load(jsonConfigFile, object_pairs_hook=OrderedDict)
+    configData = pytransport.confLoad(configFilename)
 except IOError:
     print("Error: could not find file %s" % (configFilename))
     sys.exit()
 
+#one progress unit per entry
+pytransport.progressPlan(sum(len(children) for children in configData.values()))
+
 #parse JSON config data
 for key, value in configData.iteritems():
     module = key
@@ -196,6 +222,9 @@ for key, value in configData.iteritems():
         entry = key
         obj = value #this is an ordered dict
         #could send entry,obj to function here
-        snmpSetCmdHandler(agentIp, module, entry, obj)
-
-jsonConfigFile.close()
+        try:
+            with pytransport.operation('create', "%s::%s" % (module, entry)):
+                snmpSetCmdHandler(agentIp, module, entry, obj)
+        except pyindex.IndexEncodeError as err:
+            print("ERROR: skipping %s::%s, %s" % (module, entry, err))
+        pytransport.progressAdvance(1, "%s::%s" % (module, entry))
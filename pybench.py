@@ -0,0 +1,220 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pybench.py
+
+Usage:
+    $ python pybench.py [--scripts=pyoids,pyschar,pycreate,makemeone] [--runs=N]
+                        [--port=1161] [--rules=pystub.conf] [--latency=MS] [--jitter=MS]
+                        [--loss=PCT] [--history=pybench.csv] [--script-args=ARGS]
+
+Description:
+    end-to-end benchmark of the scripts against the pystub.py loopback agent.
+    Every script is run start to finish in a scratch directory exactly like it
+    would be run against a switch, and the wall time, child CPU time and the
+    number of SETs the stub agent handled are recorded.
+
+    Results are appended to the history file and compared with the previous
+    run that used the same stub settings, so regressions and speedups show up
+    as a percentage.
+
+Prerequisites:
+    Same as the scripts being benchmarked (net-SNMP tools and the MIB files).
+    pyoids gets a generated root OID .csv with one row per module in the confs.
+
+Parameters:
+    --scripts:  comma separated list of scripts to run (default: all four)
+    --runs:     number of times to run each script (default 1)
+    --history:  .csv file the results are appended to (default pybench.csv)
+    --script-args:  extra options for the scripts, space separated,
+                e.g. --script-args="--speculative"
+    the remaining options are passed to the stub agent, see pystub.py
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import subprocess
+import resource
+import tempfile
+import shutil
+import time
+import csv
+import sys
+import os
+
+import pyber
+import pystub
+import pytransport
+
+
+SCRIPTS = ['pyoids', 'pyschar', 'pycreate', 'makemeone']
+HISTORY_FIELDS = ['date', 'script', 'scriptArgs', 'latency', 'loss', 'wallTime', 'childCpu',
+                  'sets', 'setsPerSec', 'requests', 'setFailures']
+
+
+def rootOidsCsvWrite(agent, filename):
+    '''
+    pyoids needs a root OID per module, the common prefix of everything the
+    stub serves for that module is as good as any.
+    '''
+    roots = OrderedDict()
+    for oid, column in sorted(agent.columns.items()):
+        module = column['name'].split('::')[0]
+        prefix = roots.get(module, oid)
+        length = 0
+        while length < min(len(prefix), len(oid)) and prefix[length] == oid[length]:
+            length += 1
+        roots[module] = oid[:length]
+
+    with open(filename, 'w') as out:
+        writer = csv.DictWriter(out, fieldnames=['moduleName', 'rootOid'])
+        writer.writeheader()
+        for module, root in roots.items():
+            writer.writerow({'moduleName': module, 'rootOid': pyber.oidFormat(root)})
+
+
+def workDirSetup(script, agent):
+    '''
+    scratch directory with the conf files each script expects to find in cwd
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    workDir = tempfile.mkdtemp(prefix='pybench-%s-' % script)
+    for configFilename in pystub.DEFAULT_CONFS:
+        shutil.copy(os.path.join(here, configFilename), workDir)
+    #pycreate.py and makemeone.py read test.conf
+    if script in ('pycreate', 'makemeone'):
+        shutil.copy(os.path.join(here, '%s.conf' % script), os.path.join(workDir, 'test.conf'))
+    if script == 'pyoids':
+        rootOidsCsvWrite(agent, os.path.join(workDir, 'rootOids.csv'))
+    return workDir
+
+
+def scriptRun(script, agent, port, scriptArgs=''):
+    '''
+    runs one script to completion and returns its timings and stub counters
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    workDir = workDirSetup(script, agent)
+    cmd = [sys.executable, os.path.join(here, '%s.py' % script)]
+    stdin = None
+    if script == 'pyoids':
+        stdin = 'rootOids.csv\n'
+    elif script == 'makemeone':
+        cmd += ['127.0.0.1', '--port=%d' % port]
+    else:
+        cmd += ['127.0.0.1', '%s.report.csv' % script, '--port=%d' % port]
+    cmd += scriptArgs.split()
+
+    statsBefore = agent.statsGet()
+    cpuBefore = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.time()
+
+    with open(os.devnull, 'w') as devnull:
+        proc = subprocess.Popen(cmd, cwd=workDir, stdin=subprocess.PIPE, stdout=devnull,
+                                stderr=devnull)
+        proc.communicate(stdin.encode() if stdin else None)
+
+    wallTime = time.time() - start
+    cpuAfter = resource.getrusage(resource.RUSAGE_CHILDREN)
+    statsAfter = agent.statsGet()
+    shutil.rmtree(workDir, ignore_errors=True)
+
+    sets = statsAfter['sets'] - statsBefore['sets']
+    return {'script': script,
+            'scriptArgs': scriptArgs,
+            'returncode': proc.returncode,
+            'wallTime': round(wallTime, 3),
+            'childCpu': round((cpuAfter.ru_utime + cpuAfter.ru_stime) -
+                              (cpuBefore.ru_utime + cpuBefore.ru_stime), 3),
+            'sets': sets,
+            'setsPerSec': round(sets / wallTime, 2) if wallTime else 0,
+            'requests': statsAfter['requests'] - statsBefore['requests'],
+            'setFailures': statsAfter['setFailures'] - statsBefore['setFailures']}
+
+
+def historyLastGet(historyFilename, script, scriptArgs, latency, loss):
+    last = None
+    try:
+        with open(historyFilename) as historyFile:
+            for row in csv.DictReader(historyFile):
+                if (row['script'] == script and row.get('scriptArgs', '') == scriptArgs
+                        and float(row['latency']) == latency and float(row['loss']) == loss):
+                    last = row
+    except IOError:
+        pass
+    return last
+
+
+def historyWrite(historyFilename, results):
+    newFile = not os.path.exists(historyFilename)
+    with open(historyFilename, 'a') as historyFile:
+        writer = csv.DictWriter(historyFile, fieldnames=HISTORY_FIELDS, extrasaction='ignore')
+        if newFile:
+            writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def deltaFormat(new, old):
+    if not old:
+        return ''
+    old = float(old)
+    if old == 0:
+        return ''
+    return '%+.1f%%' % ((new - old) * 100.0 / old)
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pybench.py [--scripts=pyoids,pyschar,pycreate,makemeone] [--runs=N] [--port=1161] [--rules=pystub.conf] [--latency=MS] [--jitter=MS] [--loss=PCT] [--history=pybench.csv] [--script-args=ARGS]'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if len(args) > 1:
+        print("ERROR: unexpected argument %s\n%s" % (args[1], usage))
+        sys.exit()
+
+    scripts = options.get('scripts', ','.join(SCRIPTS)).split(',')
+    for script in scripts:
+        if script not in SCRIPTS:
+            print("ERROR: unknown script %s\n%s" % (script, usage))
+            sys.exit()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        agent = pystub.agentFromOptions(options, [os.path.join(here, configFilename)
+                                                  for configFilename in pystub.DEFAULT_CONFS])
+    except (IOError, ValueError) as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
+    port = agent.start(int(options.get('port', 1161)))
+
+    historyFilename = options.get('history', 'pybench.csv')
+    runs = int(options.get('runs', 1))
+    scriptArgs = options.get('script-args', '')
+    date = time.strftime('%Y-%m-%d %H:%M:%S')
+    results = []
+
+    print('%-10s %4s %10s %10s %8s %10s %10s' % ('script', 'run', 'wall(s)', 'cpu(s)',
+                                                 'sets', 'sets/sec', 'vs last'))
+    for script in scripts:
+        last = historyLastGet(historyFilename, script, scriptArgs, agent.latency, agent.loss)
+        for run in range(runs):
+            result = scriptRun(script, agent, port, scriptArgs)
+            result.update({'date': date, 'latency': agent.latency, 'loss': agent.loss})
+            results.append(result)
+            print('%-10s %4d %10.3f %10.3f %8d %10.2f %10s' % (
+                script, run + 1, result['wallTime'], result['childCpu'], result['sets'],
+                result['setsPerSec'], deltaFormat(result['wallTime'],
+                                                  last and last['wallTime'])))
+            if result['returncode']:
+                print('WARNING: %s exited with %d' % (script, result['returncode']))
+
+    agent.stop()
+    historyWrite(historyFilename, results)
+    print('results appended to %s' % historyFilename)
@@ -0,0 +1,339 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyber.py
+
+Description:
+    minimal BER encoder/decoder for SNMPv1/v2c/v3 messages.  This is just enough
+    of ASN.1 to let pystub.py answer the net-SNMP tools on the loopback
+    interface, it is NOT a general purpose ASN.1 library.  The v3 security
+    parameters are carried as opaque bytes here, see pyusm.py for USM.
+
+    Values are passed around as (tag, value) tuples:
+        INTEGER             (ASN_INTEGER, int)
+        OCTET STRING        (ASN_OCTET_STR, bytes)
+        OBJECT IDENTIFIER   (ASN_OBJECT_ID, tuple of ints)
+        IpAddress           (ASN_IPADDRESS, 4 bytes)
+        Counter32/Gauge32/TimeTicks/Counter64   (tag, int)
+        NULL and the v2 exceptions              (tag, None)
+==================================================================================="""
+
+from __future__ import print_function
+
+
+ASN_INTEGER = 0x02
+ASN_OCTET_STR = 0x04
+ASN_NULL = 0x05
+ASN_OBJECT_ID = 0x06
+ASN_SEQUENCE = 0x30
+ASN_IPADDRESS = 0x40
+ASN_COUNTER = 0x41
+ASN_GAUGE = 0x42
+ASN_TIMETICKS = 0x43
+ASN_OPAQUE = 0x44
+ASN_COUNTER64 = 0x46
+SNMP_NOSUCHOBJECT = 0x80
+SNMP_NOSUCHINSTANCE = 0x81
+SNMP_ENDOFMIBVIEW = 0x82
+
+PDU_GET = 0xa0
+PDU_GETNEXT = 0xa1
+PDU_RESPONSE = 0xa2
+PDU_SET = 0xa3
+PDU_GETBULK = 0xa5
+PDU_REPORT = 0xa8
+
+#error-status values from RFC 3416
+ERR_NOERROR = 0
+ERR_TOOBIG = 1
+ERR_NOSUCHNAME = 2
+ERR_BADVALUE = 3
+ERR_GENERR = 5
+ERR_NOACCESS = 6
+ERR_WRONGTYPE = 7
+ERR_WRONGLENGTH = 8
+ERR_WRONGVALUE = 10
+ERR_NOCREATION = 11
+ERR_INCONSISTENTVALUE = 12
+ERR_NOTWRITABLE = 17
+ERR_INCONSISTENTNAME = 18
+
+#net-SNMP snmpset type letters and the tag each one is sent with
+TYPE_LETTERS = {
+    'i': ASN_INTEGER,
+    'u': ASN_GAUGE,
+    'c': ASN_COUNTER,
+    't': ASN_TIMETICKS,
+    'a': ASN_IPADDRESS,
+    'o': ASN_OBJECT_ID,
+    's': ASN_OCTET_STR,
+    'x': ASN_OCTET_STR,
+    'd': ASN_OCTET_STR,
+}
+
+UNSIGNED_TAGS = (ASN_COUNTER, ASN_GAUGE, ASN_TIMETICKS, ASN_COUNTER64)
+
+
+class BerError(Exception):
+    pass
+
+
+def oidParse(oid):
+    '''
+    '.1.3.6.1' or '1.3.6.1' to (1, 3, 6, 1)
+    '''
+    return tuple(int(arc) for arc in oid.strip().strip('.').split('.') if arc != '')
+
+
+def oidFormat(oid):
+    '''
+    (1, 3, 6, 1) to '.1.3.6.1', the way net-SNMP prints numeric OIDs
+    '''
+    return '.' + '.'.join(str(arc) for arc in oid)
+
+
+def lengthEncode(length):
+    if length < 0x80:
+        return bytearray([length])
+    out = bytearray()
+    while length:
+        out.insert(0, length & 0xff)
+        length >>= 8
+    return bytearray([0x80 | len(out)]) + out
+
+
+def tlvEncode(tag, content):
+    return bytearray([tag]) + lengthEncode(len(content)) + content
+
+
+def integerEncode(value, tag=ASN_INTEGER):
+    content = bytearray()
+    if tag in UNSIGNED_TAGS:
+        while True:
+            content.insert(0, value & 0xff)
+            value >>= 8
+            if value == 0:
+                break
+        #keep unsigned values positive
+        if content[0] & 0x80:
+            content.insert(0, 0)
+    else:
+        while True:
+            content.insert(0, value & 0xff)
+            if -0x80 <= value < 0x80:
+                break
+            value >>= 8
+    return tlvEncode(tag, content)
+
+
+def oidEncode(oid):
+    if len(oid) < 2:
+        oid = tuple(oid) + (0,) * (2 - len(oid))
+    content = bytearray([oid[0] * 40 + oid[1]])
+    for arc in oid[2:]:
+        chunk = bytearray([arc & 0x7f])
+        arc >>= 7
+        while arc:
+            chunk.insert(0, 0x80 | (arc & 0x7f))
+            arc >>= 7
+        content += chunk
+    return tlvEncode(ASN_OBJECT_ID, content)
+
+
+def valueEncode(value):
+    tag, data = value
+    if tag in (ASN_INTEGER,) + UNSIGNED_TAGS:
+        return integerEncode(data, tag)
+    if tag == ASN_OBJECT_ID:
+        return oidEncode(data)
+    if tag in (ASN_OCTET_STR, ASN_IPADDRESS, ASN_OPAQUE):
+        return tlvEncode(tag, bytearray(data))
+    if tag in (ASN_NULL, SNMP_NOSUCHOBJECT, SNMP_NOSUCHINSTANCE, SNMP_ENDOFMIBVIEW):
+        return tlvEncode(tag, bytearray())
+    raise BerError('cannot encode tag 0x%02x' % tag)
+
+
+def sequenceEncode(items, tag=ASN_SEQUENCE):
+    content = bytearray()
+    for item in items:
+        content += item
+    return tlvEncode(tag, content)
+
+
+def tlvDecode(data, pos):
+    '''
+    Returns (tag, content, nextPos) for the TLV starting at data[pos]
+    '''
+    if pos + 2 > len(data):
+        raise BerError('truncated TLV')
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        numBytes = length & 0x7f
+        if numBytes == 0 or pos + numBytes > len(data):
+            raise BerError('bad length')
+        length = 0
+        for byte in data[pos:pos + numBytes]:
+            length = (length << 8) | byte
+        pos += numBytes
+    if pos + length > len(data):
+        raise BerError('truncated content')
+    return tag, data[pos:pos + length], pos + length
+
+
+def integerDecode(content, signed=True):
+    value = 0
+    for byte in content:
+        value = (value << 8) | byte
+    if signed and content and content[0] & 0x80:
+        value -= 1 << (8 * len(content))
+    return value
+
+
+def oidDecode(content):
+    if not content:
+        return ()
+    first = content[0]
+    oid = [first // 40 if first < 80 else 2, first % 40 if first < 80 else first - 80]
+    arc = 0
+    for byte in content[1:]:
+        arc = (arc << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            oid.append(arc)
+            arc = 0
+    return tuple(oid)
+
+
+def valueDecode(tag, content):
+    if tag == ASN_INTEGER:
+        return (tag, integerDecode(content))
+    if tag in UNSIGNED_TAGS:
+        return (tag, integerDecode(content, signed=False))
+    if tag == ASN_OBJECT_ID:
+        return (tag, oidDecode(content))
+    if tag in (ASN_OCTET_STR, ASN_IPADDRESS, ASN_OPAQUE):
+        return (tag, bytes(content))
+    return (tag, None)
+
+
+def sequenceDecode(content):
+    '''
+    Returns the list of (tag, content) items inside a constructed value
+    '''
+    items = []
+    pos = 0
+    while pos < len(content):
+        tag, item, pos = tlvDecode(content, pos)
+        items.append((tag, item))
+    return items
+
+
+def varbindsEncode(varbinds):
+    return sequenceEncode([sequenceEncode([oidEncode(oid), valueEncode(value)])
+                           for oid, value in varbinds])
+
+
+def varbindsDecode(content):
+    varbinds = []
+    for tag, item in sequenceDecode(content):
+        (oidTag, oidContent), (valTag, valContent) = sequenceDecode(item)[:2]
+        varbinds.append((oidDecode(oidContent), valueDecode(valTag, valContent)))
+    return varbinds
+
+
+def pduEncode(pdu):
+    return sequenceEncode([integerEncode(pdu['requestId']),
+                           integerEncode(pdu.get('errorStatus', 0)),
+                           integerEncode(pdu.get('errorIndex', 0)),
+                           varbindsEncode(pdu['varbinds'])],
+                          tag=pdu['type'])
+
+
+def pduDecode(tag, content):
+    items = sequenceDecode(content)
+    if len(items) < 4:
+        raise BerError('short PDU')
+    pdu = {'type': tag,
+           'requestId': integerDecode(items[0][1]),
+           'errorStatus': integerDecode(items[1][1]),
+           'errorIndex': integerDecode(items[2][1]),
+           'varbinds': varbindsDecode(items[3][1])}
+    if tag == PDU_GETBULK:
+        #for GETBULK these two fields are non-repeaters and max-repetitions
+        pdu['nonRepeaters'] = pdu['errorStatus']
+        pdu['maxRepetitions'] = pdu['errorIndex']
+    return pdu
+
+
+def scopedPduEncode(scopedPdu):
+    return sequenceEncode([tlvEncode(ASN_OCTET_STR, bytearray(scopedPdu['contextEngineId'])),
+                           tlvEncode(ASN_OCTET_STR, bytearray(scopedPdu['contextName'])),
+                           pduEncode(scopedPdu['pdu'])])
+
+
+def scopedPduDecode(content):
+    items = sequenceDecode(content)
+    if len(items) < 3:
+        raise BerError('short scopedPDU')
+    return {'contextEngineId': bytes(items[0][1]),
+            'contextName': bytes(items[1][1]),
+            'pdu': pduDecode(items[2][0], items[2][1])}
+
+
+def messageEncode(msg):
+    '''
+    Encodes a v1/v2c community message: {'version', 'community', 'pdu'}
+    or a v3 message: {'version': 3, 'msgId', 'maxSize', 'flags', 'securityModel',
+    'securityParameters', 'scopedPdu'} ('encryptedPdu' bytes instead of
+    'scopedPdu' when the privacy flag is set)
+    '''
+    if msg['version'] == 3:
+        if 'encryptedPdu' in msg:
+            data = tlvEncode(ASN_OCTET_STR, bytearray(msg['encryptedPdu']))
+        else:
+            data = scopedPduEncode(msg['scopedPdu'])
+        return bytes(sequenceEncode([
+            integerEncode(3),
+            sequenceEncode([integerEncode(msg['msgId']),
+                            integerEncode(msg['maxSize']),
+                            tlvEncode(ASN_OCTET_STR, bytearray([msg['flags']])),
+                            integerEncode(msg['securityModel'])]),
+            tlvEncode(ASN_OCTET_STR, bytearray(msg['securityParameters'])),
+            data]))
+
+    return bytes(sequenceEncode([integerEncode(msg['version']),
+                                 tlvEncode(ASN_OCTET_STR, bytearray(msg['community'])),
+                                 pduEncode(msg['pdu'])]))
+
+
+def messageDecode(data):
+    data = bytearray(data)
+    tag, content, end = tlvDecode(data, 0)
+    if tag != ASN_SEQUENCE:
+        raise BerError('message is not a SEQUENCE')
+    items = sequenceDecode(content)
+    if len(items) < 3:
+        raise BerError('short message')
+    msg = {'version': integerDecode(items[0][1])}
+    if msg['version'] == 3:
+        globalData = sequenceDecode(items[1][1])
+        if len(globalData) < 4 or len(globalData[2][1]) != 1:
+            raise BerError('bad msgGlobalData')
+        msg.update({'msgId': integerDecode(globalData[0][1]),
+                    'maxSize': integerDecode(globalData[1][1]),
+                    'flags': globalData[2][1][0],
+                    'securityModel': integerDecode(globalData[3][1]),
+                    'securityParameters': bytes(items[2][1])})
+        if len(items) < 4:
+            raise BerError('short message')
+        if items[3][0] == ASN_OCTET_STR:
+            msg['encryptedPdu'] = bytes(items[3][1])
+        else:
+            msg['scopedPdu'] = scopedPduDecode(items[3][1])
+        return msg
+    if msg['version'] not in (0, 1):
+        raise BerError('unsupported SNMP version %s' % msg['version'])
+    msg['community'] = bytes(items[1][1])
+    msg['pdu'] = pduDecode(items[2][0], items[2][1])
+    return msg
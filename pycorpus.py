@@ -0,0 +1,278 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pycorpus.py
+
+Usage:
+    $ python pycorpus.py [className ...] [--size=MIN..MAX]
+
+Description:
+    the extended test corpus of pyschar.py --corpus, for the bytes that
+    string.punctuation does not cover and that keep showing up in field bugs:
+    UTF-8 multibyte sequences (valid and broken), control bytes, leading and
+    trailing whitespace, and multibyte strings at the SIZE boundary.
+
+    A corpus class is a generator registered with @corpusClass, it yields
+    (label, value) probes for one leaf given the leaf's SIZE range, value
+    being the bytes to set, or (label, value, False) for a probe a conforming
+    agent rejects.  The report lists the probes that went against that
+    expectation: the rejected ones, and the taken ones of the second kind
+    with a '+' in front ("lengths:+split-at-max").  Nothing is built before a leaf asks for it and a
+    class stops being asked for probes as soon as it is conclusive: when its
+    first 'sample' probes were all rejected, the rest of the class is taken
+    to be rejected too.  The generators yield their most representative
+    probes first for that reason, so a leaf that rejects every non-ASCII byte
+    costs three sets for the whole utf8 class instead of one per sequence.
+    A leaf that takes the first probes gets all of them, the malformed
+    sequences and odd whitespace after them are what the field bugs are.
+    Probes that would not fit in the SIZE maximum of the leaf are left out
+    (except by the lengths class, whose point is the maximum: it expects the
+    multibyte string that fits in octets to be taken and the ones over SIZE
+    in octets, though not in chars, to be rejected), so a rejection is about
+    the bytes and not the length.
+
+    maxLengthSearch() is the other half of the length testing, the search
+    for the longest string a leaf takes behind pyschar.py --length-probe.
+
+    New classes are added by decorating a generator in this module (or in a
+    module imported before the run) with @corpusClass('name', sample=N).
+
+    Run on its own, it prints the probes of the given classes (all of them if
+    none are given) for a leaf of the given SIZE range.
+
+Parameters:
+    className:  corpus classes to print (default all)
+    --size:     SIZE range of the leaf (default 0..255)
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import binascii
+import sys
+
+import pytransport
+
+
+#name: CorpusClass, in registration order, see corpusClass()
+corpusClasses = OrderedDict()
+
+#what the probes are padded with to reach the SIZE minimum of a leaf
+FILL_BYTE = b'a'
+#the lengths class leaves alone leaves longer than this, its values go on the command line
+LENGTHS_CEILING = 4096
+
+
+class CorpusClass(object):
+    '''
+    a registered generator and the number of probes that decide the class
+    when they all have the same outcome
+    '''
+
+    def __init__(self, name, generate, sample):
+        self.name = name
+        self.generate = generate
+        self.sample = sample
+
+    def probesGet(self, sizeMin, sizeMax):
+        '''
+        the (label, value, expected) probes of the class for the leaf, without
+        the ones fill() found too long for it, expected being False for the
+        probes a conforming agent rejects
+        '''
+        for probe in self.generate(sizeMin, sizeMax):
+            label, value, expected = (tuple(probe) + (True,))[:3]
+            if value is not None:
+                yield label, value, expected
+
+
+def corpusClass(name, sample=3):
+    '''
+    decorator registering a generator(sizeMin, sizeMax) of (label, value) or
+    (label, value, expected) probes
+    '''
+    def register(generate):
+        corpusClasses[name] = CorpusClass(name, generate, sample)
+        return generate
+    return register
+
+
+def classesGet(names):
+    '''
+    the classes picked by --corpus: True for all of them, or a comma separated
+    list of names.  Raises ValueError for unknown names.
+    '''
+    if names is True:
+        return list(corpusClasses.values())
+    picked = []
+    for name in names.split(','):
+        if name not in corpusClasses:
+            raise ValueError('unknown corpus class %s, known classes are %s'
+                             % (name, ', '.join(corpusClasses)))
+        picked.append(corpusClasses[name])
+    return picked
+
+
+def fill(head, tail, sizeMin, sizeMax):
+    '''
+    head + tail with FILL_BYTEs in between, enough to reach sizeMin, None
+    when head + tail is already longer than sizeMax
+    '''
+    if len(head) + len(tail) > sizeMax:
+        return None
+    return head + FILL_BYTE * max(0, sizeMin - len(head) - len(tail)) + tail
+
+
+def hexFormat(value):
+    '''
+    the value as net-SNMP takes it with the 'x' type
+    '''
+    return binascii.hexlify(value).decode('ascii').upper()
+
+
+@corpusClass('utf8', sample=3)
+def utf8Probes(sizeMin, sizeMax):
+    #one of each length first, that decides most agents
+    sequences = [('2-byte', b'\xc3\xa9'), ('3-byte', b'\xe2\x82\xac'), ('4-byte', b'\xf0\x9f\x98\x80'),
+                 ('nbsp', b'\xc2\xa0'), ('cjk', b'\xe4\xb8\xad'), ('bom', b'\xef\xbb\xbf'),
+                 ('lone-continuation', b'\x80'), ('overlong', b'\xc0\xaf'), ('truncated', b'\xe2\x82'),
+                 ('surrogate', b'\xed\xa0\x80'), ('latin1', b'\xe9'), ('byte-ff', b'\xff')]
+    for label, sequence in sequences:
+        yield label, fill(b'a' + sequence, b'b', sizeMin, sizeMax)
+
+
+@corpusClass('control', sample=4)
+def controlProbes(sizeMin, sizeMax):
+    representatives = [0x00, 0x07, 0x1b, 0x7f]
+    for byte in representatives + [byte for byte in range(0x20) if byte not in representatives]:
+        yield 'ctl-%02x' % byte, fill(b'a' + bytes(bytearray([byte])), b'b', sizeMin, sizeMax)
+
+
+@corpusClass('whitespace', sample=4)
+def whitespaceProbes(sizeMin, sizeMax):
+    yield 'leading-space', fill(b' a', b'', sizeMin, sizeMax)
+    yield 'trailing-space', fill(b'a', b' ', sizeMin, sizeMax)
+    yield 'only-spaces', fill(b' ' * max(1, sizeMin), b'', sizeMin, sizeMax)
+    yield 'inner-tab', fill(b'a\tb', b'', sizeMin, sizeMax)
+    yield 'leading-tab', fill(b'\ta', b'', sizeMin, sizeMax)
+    yield 'trailing-newline', fill(b'a', b'\n', sizeMin, sizeMax)
+    yield 'inner-crlf', fill(b'a\r\nb', b'', sizeMin, sizeMax)
+
+
+@corpusClass('lengths', sample=3)
+def lengthProbes(sizeMin, sizeMax):
+    '''
+    multibyte strings at the SIZE maximum, for agents that count characters
+    where SNMP counts octets: only the first one fits in octets, an agent
+    enforcing SIZE rejects the other two
+    '''
+    if sizeMax < 2 or sizeMax > LENGTHS_CEILING:
+        return
+    #fits in octets
+    yield 'max-octets-multibyte', b'a' * (sizeMax - 2) + b'\xc3\xa9'
+    #one octet over, the last char split by the limit
+    yield 'split-at-max', b'a' * (sizeMax - 1) + b'\xc3\xa9', False
+    #sizeMax chars, twice sizeMax octets
+    yield 'max-chars-multibyte', b'\xc3\xa9' * sizeMax, False
+
+
+def classProbe(corpus, sizeMin, sizeMax, probe):
+    '''
+    Runs probe(label, value, expected), which returns True when the value was
+    taken, over the probes of a class until the class is conclusive, its
+    first 'sample' probes all expected to be taken and all rejected.  Returns
+    (unexpectedLabels, probed, conclusive), the labels of the probes taken
+    against expectation starting with a '+'.
+    '''
+    unexpected = []
+    rejected = 0
+    probed = 0
+    for label, value, expected in corpus.probesGet(sizeMin, sizeMax):
+        accepted = probe(label, value, expected)
+        probed += 1
+        if accepted != expected:
+            unexpected.append(label if expected else '+' + label)
+            rejected += expected
+        if probed == corpus.sample and rejected == probed:
+            return unexpected, probed, True
+    return unexpected, probed, False
+
+
+def classSummaryGet(corpus, unexpected, probed, conclusive):
+    '''
+    the report text of a class, None when every probe went as expected:
+    "utf8:all(3 probed)", "whitespace:leading-space,trailing-newline" or
+    "lengths:+split-at-max"
+    '''
+    if not unexpected:
+        return None
+    if conclusive:
+        return '%s:all(%d probed)' % (corpus.name, probed)
+    return '%s:%s' % (corpus.name, ','.join(unexpected))
+
+
+def maxLengthSearch(accepted, sizeMin, sizeMax, ceiling):
+    '''
+    The pyschar.py --length-probe search for the longest string a leaf
+    really takes, accepted(length) setting one string of that length.
+    Agents often enforce a different limit than the MIB, so this does not
+    trust the SIZE clause: it binary searches between the MIB minimum and
+    maximum and, when the MIB maximum is accepted, keeps doubling past it (up
+    to ceiling) to catch agents that do not enforce the MIB at all.  That is
+    about log2(range) sets per leaf instead of one per length.
+
+    Returns the text of the report: "32", "300 (MIB 255)", ">=4096 (MIB 255)"
+    or "none" when not even the minimum length was accepted.
+    '''
+    low = max(sizeMin, 1)
+    sizeMax = max(sizeMax, low)
+    if not accepted(low):
+        return 'none'
+
+    #low is always accepted and high is always rejected (or the ceiling)
+    if accepted(sizeMax):
+        low = sizeMax
+        #the last doubling stops at the ceiling, so an agent without a limit reaches it
+        high = min(sizeMax * 2, ceiling)
+        while high > low and accepted(high):
+            low = high
+            high = min(high * 2, ceiling)
+        if high <= low:
+            return '>=%d (MIB %d)' % (low, sizeMax)
+    else:
+        high = sizeMax
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if accepted(middle):
+            low = middle
+        else:
+            high = middle
+
+    if low > sizeMax:
+        return '%d (MIB %d)' % (low, sizeMax)
+    return str(low)
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pycorpus.py [className ...] [--size=MIN..MAX]'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+
+    try:
+        classes = classesGet(','.join(args[1:]) if len(args) > 1 else True)
+        sizeMin, sizeMax = [int(bound) for bound in options.get('size', '0..255').split('..')]
+    except ValueError as err:
+        print("ERROR: %s\n%s" % (err, usage))
+        sys.exit()
+
+    for corpus in classes:
+        print('%s (decided after %d rejected probes)' % (corpus.name, corpus.sample))
+        for label, value, expected in corpus.probesGet(sizeMin, sizeMax):
+            print('    %-24s %s%s' % (label, hexFormat(value), '' if expected else ' (expect rejected)'))
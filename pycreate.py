@@ -5,7 +5,7 @@
 pycreate.py
 
 Usage:
-    $ python pycreate.py [agent-IPv4] [outputFilename]
+    $ python pycreate.py [agent-IPv4] [outputFilename] [options]
 
 Description:
     script to exercise special characters on read-create DisplayString leaves
@@ -28,6 +28,8 @@ Prerequisites:
     null so the script knows to exercise a set of strings on this leaf.
     rowStatus leaf must be the last object for each config entry
     with SOME-MODULE-MIB being the top-level object in the JSON structure.
+    The "index" holds one value per object of the entry's INDEX clause, they
+    are encoded the way that clause says (see pyindex.py).
 
     Example:
 
@@ -62,6 +64,73 @@ Parameters:
     agent-IPv4: the IP address of the SNMP manager agent.
 
     outputFilename: the .csv filename where you want the special char report saved.
+
+Options:
+    --port=N: UDP port of the SNMP agent, default 161.
+
+    --record=traceFile: save every net-SNMP command with its exit code and output
+    to traceFile.
+
+    --replay=traceFile: answer the net-SNMP commands from a recorded traceFile,
+    no agent needed.
+
+    --numeric[=oidmap.json]: send numeric OIDs with MIB loading turned off,
+    see pyresolve.py.
+
+    --v3-user=name [--v3-auth=MD5|SHA:password] [--v3-priv=DES|AES:password]:
+    SNMPv3 instead of v2c, see pytransport.py.
+
+    --daemon[=socketFile]: run in a pyprobed.py daemon instead, see pyprobed.py.
+
+    --profile[=file.pstats]: cProfile stats plus a Python CPU / child CPU /
+    network wait breakdown of the run, see pytransport.py.
+
+    --timeline=file.json: every SNMP operation as a Chrome trace-event span
+    for chrome://tracing or Perfetto, see pytransport.py.
+
+    --time-budget=SECONDS[s|m|h] [--schedule=pycreate.schedule.json]: only run
+    the entries that fit in the budget, never tested entries first, then the
+    ones whose MIB definition changed, then the rest.  A create-only entry
+    and the entries that need its row are scheduled as one, in conf order.
+    The timings and the progress of the cycle are kept in the schedule file
+    so the next run picks up where this one stopped, see pyschedule.py.
+
+    --progress[=SECONDS]: progress of the entry/leaf/char probes with the
+    command rate, latency and an ETA, a status line on a terminal or a line
+    every SECONDS in a log, see pytransport.py.  With --workers the progress
+    is counted in --workers units.
+
+    --results=results.db [--firmware=label]: also add every leaf/char outcome
+    to an SQLite database for queries across runs and firmware builds, see
+    pyresults.py.
+
+    --workers=agent-IPv4[,agent-IPv4...]: share the entries out to worker
+    processes, one for the agent-IPv4 argument and one per listed agent, all
+    pulling entries from one queue.  A create-only entry and the entries
+    that need its row (their index holds its index) go to one worker
+    together and run in conf order.  Interchangeable switches of one model
+    split the conf between them, and an agent listed again works on two
+    tables at once.  The rows of every worker end up in the one report, in
+    conf order, and with --results every agent gets its own run.  Not with
+    --record, --replay, --timeline, --profile or --time-budget, see pyshard.py.
+
+    --pipeline: run the DURING create sweep of an entry while the POST create
+    sweep of the entry before it runs, each sweep in its own thread.  The
+    sweeps of one entry still run in order and the entries are still created
+    in conf order, the agent just stops waiting on one row at a time.  The
+    report is the same as without it.  Not with --workers, --record,
+    --replay, --timeline or --profile, see pypipeline.py.
+
+    --verify: read the accepted values back and add the chars that came back
+    different to the report as accepted-but-mangled columns.  During create the
+    value is read in the same GET as the rowStatus check, post create all the
+    values of one char are read back in one batched GET.  --speculative is
+    ignored so the value left on each leaf is known.
+
+    --speculative: during the POST create sweep, send the three formats of each
+    special char (see charPrefix() and charSandwich()) at the same time and keep
+    the first one that worked.  The DURING create sweep is always sequential
+    because every attempt there creates the table entry.
     
 Revision:
     original version 1.0, 08/24/2017
@@ -70,15 +139,22 @@ Author:
     Jeremy Mattfeld, jmattfel@ciena.com
 ==================================================================================="""
 
-from subprocess import Popen, PIPE, check_output, check_call, CalledProcessError, STDOUT
-from collections import OrderedDict
+from subprocess import CalledProcessError, STDOUT
 import re
-import json
 import IPy
 import csv
 import sys
+import time
 import string
 
+import pyindex
+import pymatrix
+import pypipeline
+import pyresults
+import pyschedule
+import pyshard
+import pytransport
+
 
 class Callonce(object):
 # this is a decorator for functions we only want to execute once
@@ -109,8 +185,9 @@ def rowStatusNotActiveCheck(ip, module, obj):
     cmd = "snmpget -v 2c -c public -Oqv %s %s::%s" % (ip, module, obj)
 
     try:
-        output = check_output(cmd, shell=True)
-        match = re.match('active',output,flags=0)
+        output = pytransport.snmpRun(cmd)
+        #-m '' (--numeric) prints active(1) as just 1
+        match = re.match('(active|1)\s*$',output,flags=0)
         if match == None:
             return True
         else:
@@ -119,18 +196,21 @@ def rowStatusNotActiveCheck(ip, module, obj):
         print("ERROR getting value from %s::%s" % (module, obj))
 
 
-def nameToOidIndexGet(string):
-    '''
-    Some tables are indexed with an arbritary OID string made of the decimal ascii
-    values of the entry name.  This function takes the name and returns the
-    corresponding OID index for that name.
+def rowStatusReadBackCheck(ip, module, obj, leafObj, setValue):
     '''
-    index = ''
+    --verify version of rowStatusNotActiveCheck().  The string leaf that was just
+    set is read back in the same GET as the rowStatus leaf, so checking it costs
+    no extra round trip.
 
-    for char in range(len(string)):
-        dec = ord(string[char])
-        index = index + '.' + str(dec)
-    return index
+    Returns (notActive, mangled)
+    '''
+    status, printed = pytransport.snmpGetBatch(ip, ["%s::%s" % (module, obj),
+                                                    "%s::%s" % (module, leafObj)])
+    if status is None:
+        print("ERROR getting value from %s::%s" % (module, obj))
+    notActive = (status is not None) and (re.match('(active|1)$', status.strip()) == None)
+    mangled = (printed is None) or (pytransport.hexStringDecode(printed) != setValue)
+    return notActive, mangled
 
 
 def expectedStringLengthGet(module, obj):
@@ -138,11 +218,9 @@ def expectedStringLengthGet(module, obj):
     Some string type leaves expect strings of a certain number of bytes.
     This function parses the MIB for this info.
     '''
-    p1 = Popen(["snmptranslate -On -Td  %s::%s 2>/dev/null" % (module, obj)], shell=True, stdout=PIPE)
-    p2 = Popen(["grep 'SYNTAX'"], shell=True, stdin=p1.stdout, stdout=PIPE)
-    p1.stdout.close()
-
-    output = p2.communicate()[0]
+    output = pytransport.snmpRun("snmptranslate -On -Td  %s::%s 2>/dev/null" % (module, obj), check=False)
+    #keep only the SYNTAX line(s), like the old "| grep 'SYNTAX'" did
+    output = ''.join(line for line in output.splitlines(True) if 'SYNTAX' in line)
     truncOutput = output.split('..')[0]
     if '|' in truncOutput:
         minStringLength = truncOutput.split('|')[1]
@@ -152,6 +230,115 @@ def expectedStringLengthGet(module, obj):
     return int(minStringLength)
 
 
+def stringLeavesCount(obj):
+    '''
+    the number of DisplayString leaves of a conf entry, what --time-budget
+    estimates the cost of a new entry by
+    '''
+    return max(1, len([leaf for leaf, data in obj.iteritems()
+                       if leaf != 'index' and data.get('type') == 's' and data.get('value') is None]))
+
+
+def createOnly(obj):
+    '''
+    True for a conf entry without string leaves to exercise, it is only there
+    for the rows the entries after it need (see snmpCreateTableEntryHandler())
+    '''
+    return not [leaf for leaf, data in obj.iteritems()
+                if leaf != 'index' and data.get('type') == 's' and data.get('value') is None]
+
+
+def entryChainsGet(entries):
+    '''
+    Groups the (module, entry, obj) entries into the chains that have to run
+    together, in conf order and against one agent: a create-only entry and
+    the entries right after it in its module whose index holds its index,
+    the rows it creates (wwpLeosDhcpRelayAgentL2StateEntry and the Cid/Rid
+    string entries of its VLAN).  Every other entry is a chain of its own.
+    '''
+    chains = []
+    parentIndex = None
+    for module, entry, obj in entries:
+        index = obj.get('index') or {}
+        if parentIndex and module == chains[-1][0][0] and \
+                all(index.get(name) == value for name, value in parentIndex.items()):
+            chains[-1].append((module, entry, obj))
+            continue
+        chains.append([(module, entry, obj)])
+        parentIndex = index if createOnly(obj) else None
+    return chains
+
+
+def chainKeyGet(chain):
+    '''
+    'MODULE::entry', or 'MODULE::parent,child,...' for a chain of entries
+    '''
+    return "%s::%s" % (chain[0][0], ','.join(entry for module, entry, obj in chain))
+
+
+def chainUnitsGet(chain):
+    '''
+    the --progress units of a chain, a special char on a string leaf and phase
+    '''
+    return sum(stringLeavesCount(obj) * numSpecial * 2 for module, entry, obj in chain)
+
+
+def mibDefinitionHashGet(module, obj):
+    '''
+    hash of the MIB definitions of the leaves of a conf entry, so --time-budget
+    can tell when they changed
+    '''
+    leaves = ' '.join("%s::%s" % (module, leaf) for leaf in obj if leaf != 'index')
+    output = pytransport.snmpRun("snmptranslate -Td %s 2>/dev/null" % leaves, check=False)
+    return pyschedule.definitionHashGet(output)
+
+
+def chainDefinitionHashGet(chain):
+    '''
+    mibDefinitionHashGet() of a chain, the entry's own for a single entry
+    '''
+    hashes = [mibDefinitionHashGet(module, obj) for module, entry, obj in chain]
+    if len(hashes) == 1:
+        return hashes[0]
+    return pyschedule.definitionHashGet(''.join(hashes))
+
+
+def chainsScheduledIterate(scheduler, planned):
+    '''
+    Yields the chains --time-budget runs and keeps the --progress total to
+    them: it starts at the chains that fit by their estimates and follows
+    what the budget actually runs or skips.
+    '''
+    counted = set(key for key, units, mibHash, chain in scheduler.itemsFit(planned))
+    pytransport.progressPlan(sum(chainUnitsGet(chain) for key, units, mibHash, chain in planned
+                                 if key in counted))
+    position = 0
+    for chain in scheduler.itemsIterate(planned):
+        #the items before this one were skipped
+        while planned[position][0] != chainKeyGet(chain):
+            if planned[position][0] in counted:
+                pytransport.progressPlan(-chainUnitsGet(planned[position][3]))
+            position += 1
+        position += 1
+        if chainKeyGet(chain) not in counted:
+            pytransport.progressPlan(chainUnitsGet(chain))
+        yield chain
+    for key, units, mibHash, chain in planned[position:]:
+        if key in counted:
+            pytransport.progressPlan(-chainUnitsGet(chain))
+
+
+def chainEntriesIterate(chains, chainOf):
+    '''
+    the ('MODULE::entry', (module, entry, obj)) --pipeline units of the
+    entries of the chains, chainOf gets the chain of every entry key
+    '''
+    for chain in chains:
+        for module, entry, obj in chain:
+            chainOf["%s::%s" % (module, entry)] = chain
+            yield "%s::%s" % (module, entry), (module, entry, obj)
+
+
 def charInsert(cmd, char, iteration):
     '''
     some MIB tables have multiple string leaves we wish to test during a create.
@@ -207,13 +394,14 @@ def tableEntryValidate(ip, module, setObject):
     validateCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
 
     try:
-        output = check_output(validateCmd, stderr=STDOUT, shell=True)
+        with pytransport.operation('validate'):
+            output = pytransport.snmpRun(validateCmd, stderr=STDOUT)
     except CalledProcessError:
         print("ERROR setting %s, cmd:%s" % (setObject, validateCmd))
     return
 
 
-def snmpCreateTableEntryHandler(ip, module, key, obj, char):
+def snmpCreateTableEntryHandler(ip, module, key, obj, char, mangledChars=None):
     '''
     This is the workhorse function for this script.  It is called for every
     char in string.punctuation (all the special chars).
@@ -224,6 +412,9 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
         key:    the table entry object
         obj:    data for the table entry from the .conf file
         char:   the special character we are testing
+        mangledChars:   with --verify, a dictionary the chars that were accepted
+                        but read back differently are added to, keyed like
+                        failedChars.
 
     Returns:
         failedChars:    a dictionary containing failed string objects as keys
@@ -251,17 +442,13 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
     stringLeavesList = []
     failedChars = {}
 
+    #the instance suffix was encoded from the INDEX clause when the run was planned
+    index = pyindex.suffixGet(module, key, obj.get('index'))
+
     for key, val in obj.iteritems():
         data = val #this is an ordered dict
-        #if key == 'index' then grab index(es) then continue")
+        #the index is already in the suffix
         if key == 'index':
-            index = ''
-            #this catches multiple indexed instances and OID representations of entry names
-            for key, val in data.iteritems():
-                if 'Name' in key:
-                    index = nameToOidIndexGet(val)
-                else:
-                    index = index + '.' + val
             continue
         #else just build command str with [leaf.index type value]")
         else:
@@ -314,20 +501,24 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
             all three formats without success.  See docstrings on charPrefix() and
             charSandwich() for more info
             '''
+            acceptedCmd = None
             try:
-                output = check_output(cmd, stderr=STDOUT, shell=True)
+                output = pytransport.snmpRun(cmd, stderr=STDOUT)
+                acceptedCmd = cmd
             except CalledProcessError:
                 returnChar = char + "1"
                 failedChars[stringLeavesList[iteration]] = returnChar
                 preCmd = charPrefix(cmd, char)
                 try:
-                    output = check_output(preCmd, stderr=STDOUT, shell=True)
+                    output = pytransport.snmpRun(preCmd, stderr=STDOUT)
+                    acceptedCmd = preCmd
                 except CalledProcessError:
                     returnChar = char + "2"
                     failedChars[stringLeavesList[iteration]] = returnChar
                     swCmd = charSandwich(cmd, char)
                     try:
-                        output = check_output(swCmd, stderr=STDOUT, shell=True)
+                        output = pytransport.snmpRun(swCmd, stderr=STDOUT)
+                        acceptedCmd = swCmd
                     except CalledProcessError:
                         successfulPkt = False
                         returnChar = char + "3"
@@ -342,7 +533,16 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
                 '''
                 if successfulPkt: 
                     #we had a successful packet so lets check table entry status, if its not active(1) then we 
-                    if rowStatusNotActiveCheck(ip, module, setObject):
+                    if (mangledChars is not None) and acceptedCmd:
+                        leafObj = stringLeavesList[iteration]
+                        setValue = pytransport.setValueGet(acceptedCmd, "%s::%s" % (module, leafObj))
+                        notActive, mangled = rowStatusReadBackCheck(ip, module, setObject,
+                                                                    leafObj, setValue)
+                        if mangled:
+                            mangledChars[leafObj] = mangledChars.get(leafObj, '') + char
+                    else:
+                        notActive = rowStatusNotActiveCheck(ip, module, setObject)
+                    if notActive:
                         tableEntryValidate(ip, module, setObject)
                 
                     if not lastChar:
@@ -351,15 +551,16 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
                         setArgs = "%s::%s i 6" % (module, setObject)
                         destroyCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
 
-                        try:
-                            output = check_output(destroyCmd, shell=True, stderr=STDOUT)
-                        except CalledProcessError:
+                        with pytransport.operation('destroy'):
                             try:
-                                setArgs = "%s::%s i 4" % (module, setObject)
-                                destroyCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
-                                output = check_output(destroyCmd, shell=True, stderr=STDOUT)
+                                output = pytransport.snmpRun(destroyCmd, stderr=STDOUT)
                             except CalledProcessError:
-                                print("ERROR deleting %s, cmd:%s" % (setObject, destroyCmd))
+                                try:
+                                    setArgs = "%s::%s i 4" % (module, setObject)
+                                    destroyCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
+                                    output = pytransport.snmpRun(destroyCmd, stderr=STDOUT)
+                                except CalledProcessError:
+                                    print("ERROR deleting %s, cmd:%s" % (setObject, destroyCmd))
 
                 elif lastChar:
                     '''
@@ -370,7 +571,7 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
                     should work (string arguments are '1.' '2.' ...).
                     '''
                     try:
-                        output = check_output(defaultCmd, stderr=STDOUT, shell=True)
+                        output = pytransport.snmpRun(defaultCmd, stderr=STDOUT)
                     except CalledProcessError:
                         print("ERROR setting %s, cmd:%s" % (setObject, defaultCmd))
                         
@@ -383,7 +584,7 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
             cmd = "snmpset -v 2c -c private %s %s" % (ip, createArgs)
 
             try:
-                output = check_output(cmd, stderr=STDOUT, shell=True)
+                output = pytransport.snmpRun(cmd, stderr=STDOUT)
             except CalledProcessError:
                 print("ERROR setting %s, cmd:%s" % (setObject, cmd))
         else:
@@ -393,17 +594,24 @@ def snmpCreateTableEntryHandler(ip, module, key, obj, char):
     return failedChars
 
 
-def snmpPostCreateTableEntryHandler(ip, module, key, obj, char):
+def snmpPostCreateTableEntryHandler(ip, module, key, obj, char, mangledChars=None):
     '''
     This function is similar to the one ablove except it only exercises
     post-create sets on allready created tables.
 
+    With --verify each string leaf is set on its own (the entry already exists
+    so the other leaves do not need to be in the packet) and all of the values
+    that were accepted for this char are read back together at the end.
+
     Parameters:
         ip:     the ipv4 of the remote snmp agent
         module: the name of the MIB module we are currently working with
         key:    the table entry object
         obj:    data for the table entry from the .conf file
         char:   the special character we are testing
+        mangledChars:   with --verify, a dictionary the chars that were accepted
+                        but read back differently are added to, keyed like
+                        failedChars.
 
     Returns:
         failedChars:    a dictionary containing failed string objects as keys
@@ -423,17 +631,17 @@ def snmpPostCreateTableEntryHandler(ip, module, key, obj, char):
     stringLeavesList = []
     failedChars = {}
 
+    #per leaf argument strings and accepted values for --verify
+    leafArgsList = []
+    written = []
+
+    #the instance suffix was encoded from the INDEX clause when the run was planned
+    index = pyindex.suffixGet(module, key, obj.get('index'))
+
     for key, val in obj.iteritems():
         data = val #this is an ordered dict
-        #if key == 'index' then grab index(es) then continue")
+        #the index is already in the suffix
         if key == 'index':
-            index = ''
-            #this catches multiple indexed instances and OID representations of entry names
-            for key, val in data.iteritems():
-                if 'Name' in key:
-                    index = nameToOidIndexGet(val)
-                else:
-                    index = index + '.' + val
             continue
         #else just build command str with [leaf.index type value]")
         else:
@@ -462,9 +670,11 @@ def snmpPostCreateTableEntryHandler(ip, module, key, obj, char):
                 setValue = char
 
             if char == "'":
-                setArgs = setArgs + ' %s::%s s "%s."' % (module, setObject, numStringLeaves)
+                leafArgs = ' %s::%s s "%s."' % (module, setObject, numStringLeaves)
             else:
-                setArgs = setArgs + " %s::%s s '%s.'" % (module, setObject, numStringLeaves)
+                leafArgs = " %s::%s s '%s.'" % (module, setObject, numStringLeaves)
+            setArgs = setArgs + leafArgs
+            leafArgsList.append(leafArgs)
     
     if numStringLeaves > 0:
         for iteration in range(numStringLeaves):
@@ -473,8 +683,25 @@ def snmpPostCreateTableEntryHandler(ip, module, key, obj, char):
             This way we can set the special char to one leaf per iteration with the charInsert
             function and return useful info when a snmpset packet fails.
             '''
-            defaultCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
+            if mangledChars is not None:
+                defaultCmd = "snmpset -v 2c -c private %s %s" % (ip, leafArgsList[iteration])
+            else:
+                defaultCmd = "snmpset -v 2c -c private %s %s" % (ip, setArgs)
             cmd = charInsert(defaultCmd, char, str(iteration + 1))
+            leafObj = "%s::%s" % (module, stringLeavesList[iteration])
+
+            #--verify needs to know which format is left on the leaf, so no racing then
+            if pytransport.options.get('speculative') and (mangledChars is None):
+                '''
+                the table entry already exists so the three formats do not depend on
+                each other, send them all at once and keep the first one that worked.
+                '''
+                tier = pytransport.tiersRun([cmd, charPrefix(cmd, char), charSandwich(cmd, char)])
+                if tier is None:
+                    failedChars[stringLeavesList[iteration]] = char + "3"
+                elif tier > 0:
+                    failedChars[stringLeavesList[iteration]] = char + str(tier)
+                continue
 
             '''
             the nested exception handling here will try setting each char using
@@ -483,42 +710,165 @@ def snmpPostCreateTableEntryHandler(ip, module, key, obj, char):
             charSandwich() for more info
             '''
             try:
-                output = check_output(cmd, stderr=STDOUT, shell=True)
+                output = pytransport.snmpRun(cmd, stderr=STDOUT)
+                written.append((iteration, pytransport.setValueGet(cmd, leafObj)))
             except CalledProcessError:
                 returnChar = char + "1"
                 failedChars[stringLeavesList[iteration]] = returnChar
                 preCmd = charPrefix(cmd, char)
                 try:
-                    output = check_output(preCmd, stderr=STDOUT, shell=True)
+                    output = pytransport.snmpRun(preCmd, stderr=STDOUT)
+                    written.append((iteration, pytransport.setValueGet(preCmd, leafObj)))
                 except CalledProcessError:
                     returnChar = char + "2"
                     failedChars[stringLeavesList[iteration]] = returnChar
                     swCmd = charSandwich(cmd, char)
                     try:
-                        output = check_output(swCmd, stderr=STDOUT, shell=True)
+                        output = pytransport.snmpRun(swCmd, stderr=STDOUT)
+                        written.append((iteration, pytransport.setValueGet(swCmd, leafObj)))
                     except CalledProcessError:
                         returnChar = char + "3"
                         failedChars[stringLeavesList[iteration]] = returnChar
 
+        if (mangledChars is not None) and written:
+            #one batched read-back for every value this char left on the entry
+            readBack = pytransport.snmpGetBatch(ip, ["%s::%s" % (module, stringLeavesList[iteration])
+                                                     for iteration, setValue in written])
+            for (iteration, setValue), printed in zip(written, readBack):
+                if (printed is None) or (pytransport.hexStringDecode(printed) != setValue):
+                    leafObj = stringLeavesList[iteration]
+                    mangledChars[leafObj] = mangledChars.get(leafObj, '') + char
+
     return failedChars
 
 
-def specialCharReportSingleLineWrite(module, duringCreateChars, postCreateChars, out):
+def specialCharReportSingleLineWrite(module, duringCreateChars, postCreateChars, out,
+                                     duringCreateMangled=None, postCreateMangled=None):
     '''
     This function is called to write a single line in the outputFilename.csv
     '''
 
     # initialize csv dictwriter
     fieldnames = ['MODULE::leafName', 'disallowed-chars(CREATE)', 'disallowed-chars(POST-CREATE)']
+    if pytransport.options.get('verify'):
+        fieldnames += ['accepted-but-mangled(CREATE)', 'accepted-but-mangled(POST-CREATE)']
     writer = csv.DictWriter(out, fieldnames=fieldnames, dialect='singlequote') 
     csvHeaderWrite(writer, fieldnames, out)
 
     # write the csv line
-    writer.writerow({'MODULE::leafName':string.rstrip(module,'\n'), 'disallowed-chars(CREATE)':duringCreateChars, 'disallowed-chars(POST-CREATE)':postCreateChars})
+    row = {'MODULE::leafName':string.rstrip(module,'\n'), 'disallowed-chars(CREATE)':duringCreateChars, 'disallowed-chars(POST-CREATE)':postCreateChars}
+    if pytransport.options.get('verify'):
+        row['accepted-but-mangled(CREATE)'] = duringCreateMangled
+        row['accepted-but-mangled(POST-CREATE)'] = postCreateMangled
+    writer.writerow(row)
 
     return
 
 
+def phaseRun(ip, module, entry, obj, phase):
+    '''
+    Runs the DURING ('create') or POST ('post-create') create sweep of one
+    conf entry over every special char.  Returns (outcomes, mangledChars),
+    outcomes being (leafObj, char, returnChar, latency) per string leaf and
+    char and mangledChars the --verify dictionary, None without --verify.
+    '''
+    if phase == 'create':
+        handler = snmpCreateTableEntryHandler
+    else:
+        handler = snmpPostCreateTableEntryHandler
+    mangledChars = {} if pytransport.options.get('verify') else None
+    outcomes = []
+    for index in range(numSpecial):
+        start = time.time()
+        with pytransport.operation(phase, "%s::%s" % (module, entry), string.punctuation[index]):
+            temp = handler(ip, module, entry, obj, string.punctuation[index], mangledChars)
+        for leafObj, returnChar in (temp or {}).items():
+            outcomes.append((leafObj, string.punctuation[index], returnChar, time.time() - start))
+        pytransport.progressAdvance(stringLeavesCount(obj), "%s::%s" % (module, entry))
+    return outcomes, mangledChars
+
+
+def entryRowsGet(module, createSweep, postCreateSweep):
+    '''
+    Adds the outcomes of the two sweeps of an entry to --results and returns
+    its report rows, [MODULE::leaf, during, post, mangledDuring, mangledPost]
+    per string leaf.
+    '''
+    entryRows = []
+
+    results = pymatrix.ResultMatrix()
+    for phase, (outcomes, mangledChars) in (('create', createSweep), ('post-create', postCreateSweep)):
+        for leafObj, char, returnChar, latency in outcomes:
+            pyresults.outcomeRecord("%s::%s" % (module, leafObj), char, phase, returnChar, latency)
+            results.record(leafObj, phase, char, returnChar)
+    duringCreateMangled = createSweep[1]
+    postCreateMangled = postCreateSweep[1]
+
+    #the report rows, the results are only turned into strings here
+    for key in results.leavesGet():
+        moduleAndLeaf = "%s::%s" %(module, key)
+        disallowedCharsDuringCreate = pymatrix.cellFormat(results.tokensGet(key, 'create'),
+                                                          'disallowed-chars(CREATE)')
+        disallowedCharsPostCreate = pymatrix.cellFormat(results.tokensGet(key, 'post-create'),
+                                                        'disallowed-chars(POST-CREATE)')
+
+        mangledDuringCreate = None
+        mangledPostCreate = None
+        if pytransport.options.get('verify'):
+            mangledDuringCreate = string.join(duringCreateMangled.get(key, '')) or 'None'
+            mangledPostCreate = string.join(postCreateMangled.get(key, '')) or 'None'
+
+        entryRows.append([moduleAndLeaf, disallowedCharsDuringCreate, disallowedCharsPostCreate,
+                          mangledDuringCreate, mangledPostCreate])
+
+    return entryRows
+
+
+def entryRun(ip, module, entry, obj):
+    '''
+    Runs the DURING and POST create sweeps of one conf entry and returns its
+    report rows, see entryRowsGet().  Called in turn for every entry, or by
+    the pyshard.py workers with --workers.
+    '''
+    print("\n%s::%s" %(module, entry))
+
+    print("exercising special chars DURING table create...")
+    createSweep = phaseRun(ip, module, entry, obj, 'create')
+
+    print("exercising special chars POST create...")
+    postCreateSweep = phaseRun(ip, module, entry, obj, 'post-create')
+
+    return entryRowsGet(module, createSweep, postCreateSweep)
+
+
+def chainRun(ip, chain):
+    '''
+    entryRun() of every entry of a chain (see entryChainsGet()) in conf
+    order, returns the report rows of all of them.  The pyshard.py unit of
+    --workers, so the entries that need a row never run without it.
+    '''
+    chainRows = []
+    for module, entry, obj in chain:
+        chainRows.extend(entryRun(ip, module, entry, obj))
+    return chainRows
+
+
+def createStageRun(module, entry, obj):
+    '''
+    first --pipeline stage, the DURING create sweep of an entry
+    '''
+    print("\n%s::%s exercising special chars DURING table create..." %(module, entry))
+    return phaseRun(agentIp, module, entry, obj, 'create')
+
+
+def postCreateStageRun(module, entry, obj):
+    '''
+    second --pipeline stage, the POST create sweep on the row the first stage left
+    '''
+    print("\n%s::%s exercising special chars POST create..." %(module, entry))
+    return phaseRun(agentIp, module, entry, obj, 'post-create')
+
+
 ######
 # main
 ######
@@ -526,42 +876,69 @@ def specialCharReportSingleLineWrite(module, duringCreateChars, postCreateChars,
 #misc definitions
 csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True, quoting=csv.QUOTE_MINIMAL, quotechar="'")
 numSpecial = len(string.punctuation)
-usage = '''Usage: $ python pycreate.py [agent-IPv4] [outputFilename]'''
-numArgs = len(sys.argv)
+usage = '''Usage: $ python pycreate.py [agent-IPv4] [outputFilename] [options]'''
+#with --daemon the run happens in a pyprobed.py daemon, see pytransport.daemonForward()
+returncode = pytransport.daemonForward(sys.argv)
+if returncode is not None:
+    sys.exit(returncode)
+options, args = pytransport.optionsParse(sys.argv)
+numArgs = len(args)
 
 
 #command line arguments error checking
-if (numArgs == 2) and ((sys.argv[1] == '-h') or (sys.argv[1] == '--help')):
+if (numArgs == 2) and ((args[1] == '-h') or (args[1] == '--help')):
     print(__doc__)
     sys.exit()
 elif (numArgs < 3):
     print("ERROR: missing required argument\n%s" %usage)
     sys.exit()
 
-if (len(sys.argv) > 3):
-    print("ERROR: unexpected argument %s\n%s" %(sys.argv[3], usage))
+if (numArgs > 3):
+    print("ERROR: unexpected argument %s\n%s" %(args[3], usage))
     sys.exit()
 
 #check IPv4 address
-agentIp = str(sys.argv[1])
+agentIp = str(args[1])
 try:
     IPy.IP(agentIp)
 except:
     print("ERROR: you must use a valid SNMP-agent IPv4\n%s" %usage)
     sys.exit()
+agentIp = pytransport.agentAddress(agentIp)
+
+#--workers: the entries are shared out to one worker process per agent, see pyshard.py
+workerAgents = []
+if options.get('workers'):
+    workerAgents = [str(args[1])] + str(options['workers']).split(',')
+    try:
+        for workerAgent in workerAgents:
+            IPy.IP(workerAgent)
+    except:
+        print("ERROR: --workers needs a comma separated list of SNMP-agent IPv4s\n%s" %usage)
+        sys.exit()
+    for option in ('record', 'replay', 'timeline', 'profile', 'time-budget'):
+        if options.get(option):
+            print("ERROR: --%s cannot be used with --workers\n%s" %(option, usage))
+            sys.exit()
+
+#--pipeline: the sweeps of different entries overlap in threads, see pypipeline.py
+if options.get('pipeline'):
+    for option in ('workers', 'record', 'replay', 'timeline', 'profile'):
+        if options.get(option):
+            print("ERROR: --%s cannot be used with --pipeline\n%s" %(option, usage))
+            sys.exit()
 
 
 #file I/O
 #configFilename = "pycreate.conf"
 configFilename = "test.conf"
 try:
-    with open(configFilename) as jsonConfigFile:
-        configData = json.load(jsonConfigFile, object_pairs_hook=OrderedDict)
+    configData = pytransport.confLoad(configFilename)
 except IOError:
     print("Error: could not find file %s" % (configFilename))
     sys.exit()
 
-outFilename = str(sys.argv[2])
+outFilename = str(args[2])
 try:
     specialCharReport = open(outFilename, 'w')
 except IOError:
@@ -569,60 +946,83 @@ except IOError:
     sys.exit()
 
 
-#parse JSON config data
-for key, value in configData.iteritems():
-    module = key
-    children = value #this is an ordered dict
-    for k, v in children.iteritems():
-        entry = k
-        obj = v #this is an ordered dict
-        
-        flag = False
-        print("\n%s::%s" %(module, entry))
-
-        #for each special char
-        duringCreateReport = {}
-        postCreateReport = {}
-        print("exercising special chars DURING table create...")
-        for index in range(numSpecial):
-            temp = snmpCreateTableEntryHandler(agentIp, module, entry, obj, string.punctuation[index])
-            if temp:
-                if (flag == False):
-                    duringCreateReport = temp.copy()
-                    flag = True
-                else:    
-                    for key, value in duringCreateReport.iteritems():                        
-                        duringCreateReport[str(key)] = duringCreateReport[str(key)] + temp[str(key)]
-
-        flag = False
-        print("exercising special chars POST create...")
-        for index in range(numSpecial):
-            temp = snmpPostCreateTableEntryHandler(agentIp, module, entry, obj, string.punctuation[index])
-            if temp:
-                if (flag == False):
-                    postCreateReport = temp.copy()
-                    flag = True
-                else:    
-                    for key, value in postCreateReport.iteritems():                        
-                        postCreateReport[str(key)] = postCreateReport[str(key)] + temp[str(key)]
-                        
-        #write csv report
-        for key, value in duringCreateReport.iteritems():
-            moduleAndLeaf = "%s::%s" %(module, key)
+#entries in conf order, or picked and ordered by pyschedule.py with --time-budget
+entries = [(module, entry, obj) for module, children in configData.iteritems()
+           for entry, obj in children.iteritems()]
 
-            if not duringCreateReport[key]:
-                disallowedCharsDuringCreate = 'None'
-            else:
-                disallowedCharsDuringCreate = string.join(value)
+#encode the instance suffix of every entry once, the probe loops only look them up
+encodedEntries = []
+for module, entry, obj in entries:
+    try:
+        pyindex.suffixGet(module, entry, obj.get('index'))
+        encodedEntries.append((module, entry, obj))
+    except pyindex.IndexEncodeError as err:
+        print("ERROR: skipping %s::%s, %s" % (module, entry, err))
+entries = encodedEntries
 
-            if not postCreateReport[key]:
-                disallowedCharsPostCreate = 'None'
-            else:
-                postCreateData = postCreateReport[key]
-                disallowedCharsPostCreate = string.join(postCreateData)
+#a create-only entry runs together with the entries that need its row, see entryChainsGet()
+chains = entryChainsGet(entries)
 
-            specialCharReportSingleLineWrite(moduleAndLeaf, disallowedCharsDuringCreate,
-                                             disallowedCharsPostCreate, specialCharReport)
+scheduler = None
+if options.get('time-budget'):
+    try:
+        budget = pyschedule.budgetParse(options['time-budget'])
+    except ValueError as err:
+        print("ERROR: %s\n%s" %(err, usage))
+        sys.exit()
+    scheduler = pyschedule.Scheduler(options.get('schedule', 'pycreate.schedule.json'), budget)
+    planned = scheduler.plan([(chainKeyGet(chain), sum(stringLeavesCount(obj) for module, entry, obj in chain),
+                               chainDefinitionHashGet(chain), chain)
+                              for chain in chains])
+    #rows of the entries the earlier runs of this cycle already did
+    for row in scheduler.resultsGet():
+        specialCharReportSingleLineWrite(row[0], row[1], row[2], specialCharReport, row[3], row[4])
+    #plans the --progress total too
+    chains = chainsScheduledIterate(scheduler, planned)
+
+#one progress unit per special char on a string leaf and phase, or per chain with --workers
+if workerAgents:
+    pytransport.progressPlan(len(chains))
+elif not scheduler:
+    pytransport.progressPlan(sum(chainUnitsGet(chain) for chain in chains))
+
+if workerAgents:
+    #one unit per chain, an entry's post-create sweep needs the row its create sweep leaves
+    #behind and the entries after a create-only entry need its row
+    unitRows = pyshard.shardsRun(workerAgents, [(chainKeyGet(chain), (chain,)) for chain in chains], chainRun)
+    #the workers' rows are written in conf order once they are all back
+    for chain in chains:
+        for row in unitRows.get(chainKeyGet(chain), []):
+            specialCharReportSingleLineWrite(row[0], row[1], row[2], specialCharReport, row[3], row[4])
+elif options.get('pipeline'):
+    #the create sweep of an entry runs while the post-create sweep of the one before it does
+    chainOf = {}
+    sweeps = pypipeline.pipelineRun(chainEntriesIterate(chains, chainOf), [createStageRun, postCreateStageRun])
+    #chain key: [rows, seconds, failed] of its entries done so far
+    chainsDone = {}
+    #the entries come out in conf order, their rows are written as they do
+    for key, sweepResults, error, seconds in sweeps:
+        chain = chainOf[key]
+        chainDone = chainsDone.setdefault(chainKeyGet(chain), [[], 0.0, False])
+        chainDone[1] += seconds
+        if error:
+            print("ERROR: %s failed\n%s" % (key, error))
+            chainDone[2] = True
+        else:
+            entryRows = entryRowsGet(key.split('::')[0], sweepResults[0], sweepResults[1])
+            for row in entryRows:
+                specialCharReportSingleLineWrite(row[0], row[1], row[2], specialCharReport, row[3], row[4])
+            chainDone[0].extend(entryRows)
+        #a chain is only checkpointed whole
+        if scheduler and key == "%s::%s" % chain[-1][:2] and not chainDone[2]:
+            scheduler.itemDone(chainKeyGet(chain), chainDone[1], chainDone[0])
+else:
+    for chain in chains:
+        chainStart = time.time()
+        chainRows = chainRun(agentIp, chain)
+        for row in chainRows:
+            specialCharReportSingleLineWrite(row[0], row[1], row[2], specialCharReport, row[3], row[4])
+        if scheduler:
+            scheduler.itemDone(chainKeyGet(chain), time.time() - chainStart, chainRows)
 
-jsonConfigFile.close()
 specialCharReport.close()
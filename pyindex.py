@@ -0,0 +1,305 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyindex.py
+
+Usage:
+    $ python pyindex.py MODULE::entry value [value ...]
+
+Description:
+    instance index encoding of the conf table entries, driven by the INDEX
+    clause of the entry in the MIB (RFC 2578 section 7.7) instead of guessing
+    from the conf key names:
+        integers:                   one sub-identifier
+        IpAddress:                  four sub-identifiers
+        fixed size OCTET STRINGs:   one sub-identifier per octet
+        other OCTET STRINGs:        the length, then one per octet
+        OBJECT IDENTIFIERs:         the number of arcs, then the arcs
+    IMPLIED on the last INDEX object drops the length.  The conf "index" gives
+    one value per INDEX object, matched by name, or in INDEX order when the
+    names differ.  A fixed size string may be given as hex octets separated by
+    ':' or '-' (a MAC address for instance).
+
+    The INDEX clause and the syntax of its objects are read once per entry
+    with snmptranslate -Td, and the encoded suffix of every row once per run
+    (kept across the jobs of a pyprobed.py daemon), so the probe loops of
+    pycreate/makemeone only look it up.  Entries whose INDEX clause cannot be
+    read (no MIB files, a --replay trace without the snmptranslate commands)
+    fall back to the old guess, see indexGuess(), with a warning.
+
+    Run on its own, it prints the INDEX clause of the entry and the suffix
+    the values encode to.
+
+Parameters:
+    MODULE::entry:  the table entry, as in the conf files
+    value:          one value per INDEX object, in INDEX order
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import sys
+import re
+
+import pytransport
+
+
+INTEGER_SYNTAXES = ('INTEGER', 'Integer32', 'Unsigned32', 'Gauge32', 'Gauge', 'Counter32',
+                    'Counter', 'TimeTicks', 'UInteger32')
+ADDRESS_SYNTAXES = ('IpAddress', 'NetworkAddress')
+STRING_SYNTAXES = ('OCTET STRING', 'Opaque')
+OID_SYNTAXES = ('OBJECT IDENTIFIER',)
+
+#the lines of snmptranslate -Td before the DESCRIPTION
+INDEX_PATTERN = re.compile(r'^\s*INDEX\s*\{([^}]*)\}', re.M)
+AUGMENTS_PATTERN = re.compile(r'^\s*AUGMENTS\s*\{\s*([\w-]+)\s*\}', re.M)
+SYNTAX_PATTERN = re.compile(r'^\s*SYNTAX\s+(.*?)\s*$', re.M)
+SIZES_PATTERN = re.compile(r'\(([^()]*)\)\s*$')
+HEX_OCTETS_PATTERN = re.compile(r'^[0-9A-Fa-f]{1,2}([:-][0-9A-Fa-f]{1,2})*$')
+
+#'MODULE::entry': [(name, kind, fixedSize, implied), ...], None when unknown
+indexSpecs = {}
+#('MODULE::entry', ((name, value), ...)): '.n.n.n'
+suffixes = {}
+
+
+class IndexEncodeError(ValueError):
+    pass
+
+
+def definitionGet(module, name):
+    '''
+    the snmptranslate -Td definition of an object up to its DESCRIPTION,
+    objects of other modules (INDEX { ifIndex }) are looked up by name
+    '''
+    for target in ('%s::%s' % (module, name), '-IR %s' % name):
+        output = pytransport.snmpRun("snmptranslate -Td %s 2>/dev/null" % target, check=False)
+        definition = output.decode('latin-1').split('DESCRIPTION')[0]
+        if 'OBJECT-TYPE' in definition:
+            return definition
+    return None
+
+
+def indexClauseParse(definition):
+    '''
+    [(name, implied), ...] of an "INDEX { a, IMPLIED b }" clause, like the
+    index of a pymibparse record, None when there is no INDEX clause
+    '''
+    match = INDEX_PATTERN.search(definition)
+    if match is None:
+        return None
+    clause = []
+    for component in match.group(1).split(','):
+        words = component.split()
+        if words:
+            clause.append((words[-1], words[0] == 'IMPLIED'))
+    return clause
+
+
+def syntaxParse(definition):
+    '''
+    (kind, fixedSize) of an index object from its SYNTAX line, kind being one
+    of 'integer', 'address', 'string' or 'oid', fixedSize the length of a
+    SIZE (n) string and None otherwise
+    '''
+    match = SYNTAX_PATTERN.search(definition)
+    if match is None:
+        return None, None
+    syntax = match.group(1)
+    for kind, names in (('string', STRING_SYNTAXES), ('oid', OID_SYNTAXES),
+                        ('address', ADDRESS_SYNTAXES), ('integer', INTEGER_SYNTAXES)):
+        for name in names:
+            if syntax == name or syntax.startswith(name + ' ') or syntax.startswith(name + '('):
+                fixedSize = None
+                sizes = SIZES_PATTERN.search(syntax)
+                if kind == 'string' and sizes and '|' not in sizes.group(1):
+                    bounds = [bound.strip() for bound in sizes.group(1).replace('SIZE', '').split('..')]
+                    if len(set(bounds)) == 1 and bounds[0].isdigit():
+                        fixedSize = int(bounds[0])
+                return kind, fixedSize
+    return None, None
+
+
+def indexSpecGet(module, entry):
+    '''
+    [(name, kind, fixedSize, implied), ...] for the INDEX objects of an entry,
+    following AUGMENTS, or None when the MIB does not tell
+    '''
+    key = '%s::%s' % (module, entry)
+    if key in indexSpecs:
+        return indexSpecs[key]
+
+    spec = None
+    definition = definitionGet(module, entry)
+    if definition:
+        augments = AUGMENTS_PATTERN.search(definition)
+        if augments:
+            definition = definitionGet(module, augments.group(1)) or ''
+        clause = indexClauseParse(definition)
+        if clause:
+            spec = []
+            for name, implied in clause:
+                objectDefinition = definitionGet(module, name)
+                kind, fixedSize = syntaxParse(objectDefinition or '')
+                if kind is None:
+                    spec = None
+                    break
+                spec.append((name, kind, fixedSize, implied))
+
+    indexSpecs[key] = spec
+    return spec
+
+
+def mibIndexSpecGet(mibIndex, module, entry):
+    '''
+    indexSpecGet() from a pymibparse.py MibIndex instead of snmptranslate, for
+    tools that run without net-snmp (pystub.py --native).  A spec found there
+    is cached for suffixGet(), None is not so snmptranslate still gets asked.
+    '''
+    key = '%s::%s' % (module, entry)
+    record = mibIndex.objectGet(module, entry)
+    if record and record['augments']:
+        record = mibIndex.objectGet(record['module'], record['augments'])
+    if not record or not record['index']:
+        return None
+
+    spec = []
+    for name, implied in record['index']:
+        objectRecord = mibIndex.objectGet(record['module'], name)
+        baseType = objectRecord['baseType'] if objectRecord else None
+        kind = None
+        for candidate, names in (('string', STRING_SYNTAXES), ('oid', OID_SYNTAXES),
+                                 ('address', ADDRESS_SYNTAXES), ('integer', INTEGER_SYNTAXES)):
+            if baseType in names:
+                kind = candidate
+        if kind is None:
+            return None
+        fixedSize = None
+        sizes = objectRecord['sizes']
+        if kind == 'string' and len(sizes) == 1 and sizes[0][0] == sizes[0][1]:
+            fixedSize = sizes[0][0]
+        spec.append((name, kind, fixedSize, implied))
+
+    indexSpecs[key] = spec
+    return spec
+
+
+def octetsGet(value, fixedSize):
+    if fixedSize and len(value) != fixedSize and HEX_OCTETS_PATTERN.match(value):
+        octets = [int(octet, 16) for octet in re.split('[:-]', value)]
+        if len(octets) == fixedSize:
+            return octets
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return list(bytearray(value))
+
+
+def componentEncode(name, value, kind, fixedSize, implied):
+    '''
+    the sub-identifiers of one INDEX object, raises IndexEncodeError when the
+    conf value does not fit its syntax
+    '''
+    value = str(value) if isinstance(value, int) else value
+    try:
+        if kind == 'integer':
+            return [int(value)]
+        if kind == 'address':
+            octets = [int(octet) for octet in value.split('.')]
+            if len(octets) != 4 or [octet for octet in octets if not 0 <= octet <= 255]:
+                raise ValueError(value)
+            return octets
+        if kind == 'oid':
+            arcs = [int(arc) for arc in value.strip('.').split('.')]
+            return arcs if implied else [len(arcs)] + arcs
+    except ValueError:
+        raise IndexEncodeError('%s=%s is not a valid %s index value' % (name, value, kind))
+
+    octets = octetsGet(value, fixedSize)
+    if fixedSize:
+        if len(octets) != fixedSize:
+            raise IndexEncodeError('%s=%s is not %d octets long' % (name, value, fixedSize))
+        return octets
+    return octets if implied else [len(octets)] + octets
+
+
+def indexGuess(indexData):
+    '''
+    The encoding used before the INDEX clause was read: values are appended
+    as they are, and a key with 'Name' in it replaces the whole index with
+    the decimal ascii values of its value, without a length.
+    '''
+    index = ''
+    for key, val in indexData.items():
+        if 'Name' in key:
+            index = ''.join('.%d' % ord(char) for char in val)
+        else:
+            index = index + '.' + val
+    return index
+
+
+def suffixEncode(spec, indexData):
+    if len(spec) != len(indexData):
+        raise IndexEncodeError('%d index values for the %d INDEX objects %s' % (
+            len(indexData), len(spec), ', '.join(name for name, kind, fixedSize, implied in spec)))
+    if set(indexData) == set(name for name, kind, fixedSize, implied in spec):
+        values = [indexData[name] for name, kind, fixedSize, implied in spec]
+    else:
+        values = list(indexData.values())
+    arcs = []
+    for (name, kind, fixedSize, implied), value in zip(spec, values):
+        arcs.extend(componentEncode(name, value, kind, fixedSize, implied))
+    return ''.join('.%d' % arc for arc in arcs)
+
+
+def suffixGet(module, entry, indexData):
+    '''
+    The '.n.n.n' instance suffix of a conf entry's "index", computed once per
+    entry and values.  Raises IndexEncodeError when the values do not match
+    the INDEX clause.
+    '''
+    if not indexData:
+        return ''
+    key = ('%s::%s' % (module, entry), tuple(indexData.items()))
+    if key in suffixes:
+        return suffixes[key]
+
+    spec = indexSpecGet(module, entry)
+    if spec is None:
+        print('WARNING: no INDEX clause found for %s, guessing its index encoding' % key[0],
+              file=sys.stderr)
+        suffix = indexGuess(indexData)
+    else:
+        suffix = suffixEncode(spec, indexData)
+
+    suffixes[key] = suffix
+    return suffix
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pyindex.py MODULE::entry value [value ...]'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if len(args) < 3 or '::' not in args[1]:
+        print(usage)
+        sys.exit()
+
+    module, entry = args[1].split('::', 1)
+    spec = indexSpecGet(module, entry)
+    if spec is None:
+        print("ERROR: no INDEX clause found for %s" % args[1])
+        sys.exit(1)
+    for name, kind, fixedSize, implied in spec:
+        print('%-32s %s%s%s' % (name, kind, ' SIZE (%d)' % fixedSize if fixedSize else '',
+                                ' IMPLIED' if implied else ''))
+    indexData = OrderedDict(('%d' % position, value) for position, value in enumerate(args[2:]))
+    try:
+        print(suffixEncode(spec, indexData))
+    except IndexEncodeError as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
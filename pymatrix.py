@@ -0,0 +1,229 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pymatrix.py
+
+Usage:
+    $ python pymatrix.py union|intersect|diff report [report ...] [--out=outputFilename]
+
+Description:
+    bit-packed special char results, for merging the reports of many leaves,
+    agents and builds without handling the "#1 %3" strings along the way.
+
+    A ResultMatrix keeps one integer per (leaf, phase), a bitmask with
+    TIER_BITS bits per char of its alphabet (string.punctuation by default):
+    bit n of a char is set when format n of the char failed (see charPrefix()
+    and charSandwich() in the scripts), so "#2" is the first two bits of '#'.
+    Merging is one integer operation per row whatever the number of chars:
+        union:      the chars that failed on any of the inputs, worst tier
+        intersect:  the chars that failed on all of them, best tier
+        diff:       what the first input failed and none of the others did
+    The "#1 %3" strings of the reports are only parsed when a report is read
+    and only built again when one is written.
+
+    Run on its own, it merges the disallowed-chars columns of pyschar.py or
+    pycreate.py reports (or of --results runs given as results.db:RUN) and
+    writes a report of the same kind.
+
+Parameters:
+    union|intersect|diff:   how to merge the reports
+    report:                 a report written by pyschar.py or pycreate.py, or
+                            results.db:RUN for a run of a pyresults.py database
+    --out:                  file to write the merged report to (default stdout)
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import string
+import csv
+import sys
+import re
+
+import pyresults
+import pytransport
+
+
+#one bit per format of a char: plain, 'a' prefixed, 'a' 'b' sandwiched
+TIER_BITS = 3
+DEFAULT_ALPHABET = string.punctuation
+RUN_PATTERN = re.compile(r'^(.+):(\d+)$')
+
+
+class ResultMatrix(object):
+    '''
+    rows: (leaf, phase): bitmask of the failed formats of every char, rows
+    with nothing failed are kept (as 0) so the leaves of a report stay listed
+    '''
+
+    def __init__(self, alphabet=DEFAULT_ALPHABET):
+        self.alphabet = alphabet
+        self.positions = dict((char, position * TIER_BITS) for position, char in enumerate(alphabet))
+        self.rows = OrderedDict()
+
+    def record(self, leaf, phase, char, returnChar):
+        '''
+        adds a charSetTry()-style result: False or '' for a char that was taken,
+        otherwise the char followed by the number of formats that failed
+        '''
+        mask = self.rows.get((leaf, phase), 0)
+        if returnChar:
+            tier = int(returnChar[len(char):])
+            mask |= ((1 << tier) - 1) << self.positions[char]
+        self.rows[(leaf, phase)] = mask
+
+    def tokensGet(self, leaf, phase):
+        '''
+        ['#1', '%3'], every failed char with the highest format that failed
+        '''
+        mask = self.rows.get((leaf, phase), 0)
+        tokens = []
+        for char in self.alphabet:
+            bits = (mask >> self.positions[char]) & ((1 << TIER_BITS) - 1)
+            if bits:
+                tokens.append('%s%d' % (char, bits.bit_length()))
+        return tokens
+
+    def leavesGet(self):
+        return list(OrderedDict((leaf, None) for leaf, phase in self.rows))
+
+    def combine(self, others, operation):
+        '''
+        a new matrix with operation(mask, otherMask) applied row by row, rows
+        missing from an input count as nothing failed
+        '''
+        combined = ResultMatrix(self.alphabet)
+        combined.rows = OrderedDict(self.rows)
+        for other in others:
+            if other.alphabet != self.alphabet:
+                raise ValueError('cannot combine results of different alphabets')
+            for key in list(combined.rows) + [key for key in other.rows if key not in combined.rows]:
+                combined.rows[key] = operation(combined.rows.get(key, 0), other.rows.get(key, 0))
+        return combined
+
+    def union(self, *others):
+        return self.combine(others, lambda mask, other: mask | other)
+
+    def intersection(self, *others):
+        return self.combine(others, lambda mask, other: mask & other)
+
+    def difference(self, *others):
+        return self.combine(others, lambda mask, other: mask & ~other)
+
+
+def tokensParse(text, alphabet=DEFAULT_ALPHABET):
+    '''
+    [(char, tier), ...] of a report cell, "#1 %3" (pyschar) or "# 1 % 3"
+    (pycreate), nothing for '' or 'None'
+    '''
+    text = re.sub(r'\s', '', text or '')
+    if text == 'None':
+        return []
+    tokens = re.findall(r'(.)(\d)', text)
+    if ''.join(char + tier for char, tier in tokens) != text:
+        raise ValueError('cannot read the results "%s"' % text)
+    return [(char, tier) for char, tier in tokens if char in alphabet]
+
+
+def cellFormat(tokens, column):
+    '''
+    a report cell the way the script that owns the column writes it
+    '''
+    if column.endswith('(CREATE)') or column.endswith('(POST-CREATE)'):
+        #pycreate joins the concatenated results char by char
+        return ' '.join(''.join(tokens)) or 'None'
+    return ' '.join(tokens) or None
+
+
+def reportRead(reportFilename, alphabet=DEFAULT_ALPHABET):
+    '''
+    (ResultMatrix, disallowed-chars columns) of a pyschar/pycreate report
+    '''
+    matrix = ResultMatrix(alphabet)
+    with open(reportFilename) as report:
+        reader = csv.reader(report, dialect='singlequote')
+        header = next(reader)
+        columns = [column for column in header if column.startswith('disallowed-chars')]
+        for row in reader:
+            cells = dict(zip(header, row))
+            for column in columns:
+                matrix.rows[(cells[header[0]], column)] = 0
+                for char, tier in tokensParse(cells.get(column), alphabet):
+                    matrix.record(cells[header[0]], column, char, char + tier)
+    return matrix, columns
+
+
+def runRead(databaseFilename, run, alphabet=DEFAULT_ALPHABET):
+    '''
+    (ResultMatrix, columns) of a --results run, with the columns of the
+    report of its script
+    '''
+    connection = pyresults.databaseOpen(databaseFilename)
+    script = connection.execute('SELECT script FROM runs WHERE id = ?', (run,)).fetchone()
+    if script is None:
+        raise ValueError('no run %s in %s' % (run, databaseFilename))
+    if script[0] == 'pycreate':
+        columns = {'create': 'disallowed-chars(CREATE)', 'post-create': 'disallowed-chars(POST-CREATE)'}
+    else:
+        columns = {'set': 'disallowed-chars'}
+
+    matrix = ResultMatrix(alphabet)
+    for module, leaf, char, phase, tier in connection.execute(
+            'SELECT module, leaf, char, phase, tier FROM outcomes WHERE run = ? ORDER BY rowid', (run,)):
+        if phase in columns and char in matrix.positions:
+            matrix.record('%s::%s' % (module, leaf), columns[phase], char, tier and '%s%d' % (char, tier))
+    connection.close()
+    return matrix, sorted(columns.values())
+
+
+def reportWrite(matrix, columns, out):
+    writer = csv.writer(out, dialect='singlequote')
+    writer.writerow(['MODULE::leafName'] + columns)
+    for leaf in matrix.leavesGet():
+        writer.writerow([leaf] + [cellFormat(matrix.tokensGet(leaf, column), column) for column in columns])
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pymatrix.py union|intersect|diff report [report ...] [--out=outputFilename]'''
+    operations = {'union': ResultMatrix.union, 'intersect': ResultMatrix.intersection,
+                  'diff': ResultMatrix.difference}
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if len(args) < 3:
+        print("ERROR: missing required argument\n%s" % usage)
+        sys.exit()
+    if args[1] not in operations:
+        print("ERROR: unknown operation %s\n%s" % (args[1], usage))
+        sys.exit()
+
+    csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True,
+                         quoting=csv.QUOTE_MINIMAL, quotechar="'")
+    matrices = []
+    columns = None
+    try:
+        for name in args[2:]:
+            match = RUN_PATTERN.match(name)
+            if match:
+                matrix, readColumns = runRead(match.group(1), int(match.group(2)))
+            else:
+                matrix, readColumns = reportRead(name)
+            if columns is not None and readColumns != columns:
+                raise ValueError('%s does not have the columns of %s' % (name, args[2]))
+            columns = readColumns
+            matrices.append(matrix)
+    except (IOError, ValueError, pyresults.sqlite3.Error) as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
+
+    merged = operations[args[1]](matrices[0], *matrices[1:])
+    out = open(options['out'], 'w') if options.get('out') else sys.stdout
+    reportWrite(merged, columns, out)
+    if out is not sys.stdout:
+        out.close()
+        print('done. output written to ' + options['out'])
@@ -0,0 +1,668 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pymibparse.py
+
+Usage:
+    $ python pymibparse.py [mibDirectory] [MODULE-NAME ...] [--processes=N]
+
+Description:
+    pure-Python SMIv1/SMIv2 parser for the *.my MIB files, so pyoids does not
+    depend on the text output of snmptranslate -Tp.
+
+    Every file in the directory is parsed on its own in a process pool (a file
+    does not need its imports to be parsed), then the IMPORTS of the modules
+    that were asked for are followed to pull in the modules they depend on,
+    and the OIDs and syntaxes are resolved across modules in the main process.
+
+    The result is a MibIndex with one record per object: name, module, oid,
+    kind (OBJECT-TYPE, OBJECT IDENTIFIER, ...), access, syntax, baseType,
+    sizes and index.  Only the parts of SMI that this tooling needs are
+    understood: macro definitions, DEFVALs, descriptions and so on are skipped.
+
+    Run on its own, it prints the writable string leaves of the given modules
+    (all modules in the directory if none are given) and the time it took.
+
+Parameters:
+    mibDirectory:   directory of *.my files (default ~/.snmp/mibs)
+    MODULE-NAME:    modules to compile, their imports are compiled too
+    --processes:    size of the process pool (default: number of CPUs)
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import multiprocessing
+import time
+import glob
+import sys
+import os
+import re
+
+import pyoidtree
+import pytransport
+
+
+DEFAULT_MIB_DIRECTORY = os.path.expanduser('~/.snmp/mibs')
+MIB_FILE_PATTERNS = ['*.my', '*.mib', '*.txt']
+
+TOKEN_PATTERN = re.compile(r'''
+      (?P<space>\s+)
+    | (?P<comment>--.*?(?:--|$))
+    | (?P<string>"[^"]*")
+    | (?P<assign>::=)
+    | (?P<range>\.\.)
+    | (?P<binhex>'[0-9A-Fa-f]*'[HhBb])
+    | (?P<number>-?\d+)
+    | (?P<word>[A-Za-z](?:\w|-(?!-))*)
+    | (?P<punct>[{}()\[\],;|.:<>])
+    | (?P<other>.)
+''', re.M | re.X)
+
+#macros whose value is an OID
+OID_MACROS = ('OBJECT-TYPE', 'MODULE-IDENTITY', 'OBJECT-IDENTITY', 'NOTIFICATION-TYPE',
+              'OBJECT-GROUP', 'NOTIFICATION-GROUP', 'MODULE-COMPLIANCE', 'AGENT-CAPABILITIES')
+
+BASE_TYPES = ('OCTET STRING', 'OBJECT IDENTIFIER', 'INTEGER', 'BITS', 'Integer32',
+              'Unsigned32', 'Counter32', 'Gauge32', 'TimeTicks', 'IpAddress', 'Opaque',
+              'Counter64', 'Counter', 'Gauge', 'NetworkAddress', 'SEQUENCE', 'SEQUENCE OF',
+              'CHOICE')
+
+#used when SNMPv2-SMI/RFC1155-SMI and friends are not in the MIB directory
+BUILTIN_OIDS = {
+    'ccitt': (0,),
+    'zeroDotZero': (0, 0),
+    'iso': (1,),
+    'joint-iso-ccitt': (2,),
+    'org': (1, 3),
+    'dod': (1, 3, 6),
+    'internet': (1, 3, 6, 1),
+    'directory': (1, 3, 6, 1, 1),
+    'mgmt': (1, 3, 6, 1, 2),
+    'mib-2': (1, 3, 6, 1, 2, 1),
+    'transmission': (1, 3, 6, 1, 2, 1, 10),
+    'experimental': (1, 3, 6, 1, 3),
+    'private': (1, 3, 6, 1, 4),
+    'enterprises': (1, 3, 6, 1, 4, 1),
+    'security': (1, 3, 6, 1, 5),
+    'snmpV2': (1, 3, 6, 1, 6),
+    'snmpDomains': (1, 3, 6, 1, 6, 1),
+    'snmpProxys': (1, 3, 6, 1, 6, 2),
+    'snmpModules': (1, 3, 6, 1, 6, 3),
+}
+
+#(baseType, sizes) of the common textual conventions, same fallback idea
+BUILTIN_TYPES = {
+    'DisplayString': ('OCTET STRING', [(0, 255)]),
+    'SnmpAdminString': ('OCTET STRING', [(0, 255)]),
+    'OwnerString': ('OCTET STRING', [(0, 127)]),
+    'PhysAddress': ('OCTET STRING', []),
+    'MacAddress': ('OCTET STRING', [(6, 6)]),
+    'DateAndTime': ('OCTET STRING', [(8, 8), (11, 11)]),
+    'TAddress': ('OCTET STRING', [(1, 255)]),
+    'SnmpTagValue': ('OCTET STRING', [(0, 255)]),
+    'SnmpEngineID': ('OCTET STRING', [(5, 32)]),
+    'InetAddress': ('OCTET STRING', [(0, 255)]),
+    'TruthValue': ('INTEGER', []),
+    'RowStatus': ('INTEGER', []),
+    'StorageType': ('INTEGER', []),
+    'EntryStatus': ('INTEGER', []),
+    'TestAndIncr': ('INTEGER', []),
+    'TimeStamp': ('TimeTicks', []),
+    'TimeInterval': ('INTEGER', []),
+    'AutonomousType': ('OBJECT IDENTIFIER', []),
+    'RowPointer': ('OBJECT IDENTIFIER', []),
+    'VariablePointer': ('OBJECT IDENTIFIER', []),
+    'TDomain': ('OBJECT IDENTIFIER', []),
+}
+
+#filename: ((mtime, size), modules, error) of every file parsed so far
+parsedFiles = {}
+
+#how pyoids abbreviates access, same as snmptranslate -Tp
+ACCESS_ABBREVIATIONS = {
+    'read-only': 'RO',
+    'read-write': 'RW',
+    'read-create': 'CR',
+    'write-only': 'WO',
+    'not-accessible': 'NoAccess',
+    'accessible-for-notify': 'Notify',
+}
+
+
+class MibParseError(Exception):
+    pass
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind in ('space', 'comment', 'other'):
+            continue
+        tokens.append(match.group(kind))
+    return tokens
+
+
+def groupSkip(tokens, i):
+    '''
+    tokens[i] is an opening bracket, returns the index just past its match
+    '''
+    pairs = {'{': '}', '(': ')', '[': ']'}
+    stack = [pairs[tokens[i]]]
+    i += 1
+    while stack and i < len(tokens):
+        if tokens[i] in pairs:
+            stack.append(pairs[tokens[i]])
+        elif tokens[i] == stack[-1]:
+            stack.pop()
+        i += 1
+    return i
+
+
+def numberParse(token):
+    if token.startswith("'"):
+        digits = token[1:-2]
+        base = 16 if token[-1] in 'Hh' else 2
+        return int(digits or '0', base)
+    return int(token)
+
+
+def rangesParse(tokens, i):
+    '''
+    tokens[i] is '(' of "(0..255 | 300)", returns ([(low, high), ...], nextIndex).
+    MIN/MAX are left as None.
+    '''
+    end = groupSkip(tokens, i)
+    ranges = []
+    low = None
+    pending = None
+    for token in tokens[i + 1:end - 1] + ['|']:
+        if token == '|':
+            if pending is not None:
+                ranges.append((low, pending))
+            elif low is not None:
+                ranges.append((low, low))
+            low = None
+            pending = None
+        elif token == '..':
+            pending = None
+        elif token in ('MIN', 'MAX') or re.match(r"^(-?\d+|'[0-9A-Fa-f]*'[HhBb])$", token):
+            value = None if token in ('MIN', 'MAX') else numberParse(token)
+            if low is None and pending is None:
+                low = value
+                pending = None
+            else:
+                pending = value
+    return ranges, end
+
+
+def typeParse(tokens, i):
+    '''
+    Parses a type such as "DisplayString (SIZE (0..32))" or "INTEGER { up(1) }".
+    Returns ({'syntax', 'sizes', 'ranges'}, nextIndex).
+    '''
+    #tagged types in the SMI modules: [APPLICATION 2] IMPLICIT INTEGER
+    if tokens[i] == '[':
+        i = groupSkip(tokens, i)
+    if tokens[i] in ('IMPLICIT', 'EXPLICIT'):
+        i += 1
+
+    info = {'syntax': tokens[i], 'sizes': [], 'ranges': []}
+    if tokens[i] == 'OCTET' and tokens[i + 1] == 'STRING':
+        info['syntax'] = 'OCTET STRING'
+        i += 2
+    elif tokens[i] == 'OBJECT' and tokens[i + 1] == 'IDENTIFIER':
+        info['syntax'] = 'OBJECT IDENTIFIER'
+        i += 2
+    elif tokens[i] == 'SEQUENCE' and tokens[i + 1] == 'OF':
+        info['syntax'] = 'SEQUENCE OF'
+        info['entry'] = tokens[i + 2]
+        return info, i + 3
+    elif tokens[i] in ('SEQUENCE', 'CHOICE'):
+        return info, groupSkip(tokens, i + 1)
+    else:
+        i += 1
+
+    #enumerations and named bits
+    if i < len(tokens) and tokens[i] == '{':
+        i = groupSkip(tokens, i)
+
+    if i < len(tokens) and tokens[i] == '(':
+        if tokens[i + 1] == 'SIZE':
+            info['sizes'], end = rangesParse(tokens, i + 2)
+            i = groupSkip(tokens, i)
+        else:
+            info['ranges'], i = rangesParse(tokens, i)
+
+    return info, i
+
+
+def oidValueParse(tokens, i):
+    '''
+    tokens[i] is '{' of "{ parent 1 }" or "{ iso org(3) dod(6) 1 }".
+    Returns ([(name, number), ...], nextIndex), either side of a pair may be None.
+    '''
+    end = groupSkip(tokens, i)
+    components = []
+    j = i + 1
+    while j < end - 1:
+        token = tokens[j]
+        if re.match(r'^\d+$', token):
+            components.append((None, int(token)))
+        elif j + 3 < end and tokens[j + 1] == '(':
+            components.append((token, int(tokens[j + 2])))
+            j += 3
+        else:
+            components.append((token, None))
+        j += 1
+    return components, end
+
+
+def objectTypeClausesParse(tokens, i, record):
+    '''
+    reads the clauses of an OBJECT-TYPE (or similar) up to its ::=
+    '''
+    while i < len(tokens) and tokens[i] != '::=':
+        token = tokens[i]
+        if token == 'SYNTAX':
+            typeInfo, i = typeParse(tokens, i + 1)
+            record.update(typeInfo)
+            continue
+        if token in ('MAX-ACCESS', 'ACCESS'):
+            record['access'] = tokens[i + 1]
+            i += 2
+            continue
+        if token == 'INDEX' and tokens[i + 1] == '{':
+            end = groupSkip(tokens, i + 1)
+            index = []
+            implied = False
+            j = i + 2
+            while j < end - 1:
+                if tokens[j] == 'IMPLIED':
+                    implied = True
+                elif tokens[j] == 'OCTET' and tokens[j + 1] == 'STRING':
+                    index.append(('OCTET STRING', implied))
+                    implied = False
+                    j += 1
+                elif tokens[j] != ',':
+                    index.append((tokens[j], implied))
+                    implied = False
+                j += 1
+            record['index'] = index
+            i = end
+            continue
+        if token == 'AUGMENTS' and tokens[i + 1] == '{':
+            record['augments'] = tokens[i + 2]
+            i = groupSkip(tokens, i + 1)
+            continue
+        if token in ('{', '(', '['):
+            i = groupSkip(tokens, i)
+            continue
+        i += 1
+    return i
+
+
+def moduleBodyParse(tokens, i, module):
+    '''
+    Parses the assignments of one module starting after BEGIN, up to its END.
+    '''
+    while i < len(tokens):
+        token = tokens[i]
+
+        if token == 'END':
+            return i + 1
+
+        if token == 'IMPORTS':
+            symbols = []
+            i += 1
+            while i < len(tokens) and tokens[i] != ';':
+                if tokens[i] == 'FROM':
+                    for symbol in symbols:
+                        module['imports'][symbol] = tokens[i + 1]
+                    symbols = []
+                    i += 2
+                    continue
+                if tokens[i] != ',':
+                    symbols.append(tokens[i])
+                i += 1
+            i += 1
+            continue
+
+        if token == 'EXPORTS':
+            while i < len(tokens) and tokens[i] != ';':
+                i += 1
+            i += 1
+            continue
+
+        name = token
+        if i + 1 >= len(tokens):
+            break
+        following = tokens[i + 1]
+
+        if following == 'MACRO':
+            #macro bodies have their own BEGIN ... END
+            while i < len(tokens) and tokens[i] != 'END':
+                i += 1
+            i += 1
+            continue
+
+        if following == 'OBJECT' and tokens[i + 2] == 'IDENTIFIER' and tokens[i + 3] == '::=':
+            components, i = oidValueParse(tokens, i + 4)
+            module['objects'][name] = {'name': name, 'kind': 'OBJECT IDENTIFIER',
+                                       'value': components}
+            continue
+
+        if following == '::=':
+            if tokens[i + 2] == 'TEXTUAL-CONVENTION':
+                j = i + 3
+                while j < len(tokens) and tokens[j] != 'SYNTAX':
+                    j += 1
+                typeInfo, i = typeParse(tokens, j + 1)
+            else:
+                typeInfo, i = typeParse(tokens, i + 2)
+            module['types'][name] = typeInfo
+            continue
+
+        if following in OID_MACROS or following == 'TRAP-TYPE':
+            record = {'name': name, 'kind': following}
+            i = objectTypeClausesParse(tokens, i + 2, record)
+            i += 1
+            if i < len(tokens) and tokens[i] == '{':
+                record['value'], i = oidValueParse(tokens, i)
+                module['objects'][name] = record
+            else:
+                #TRAP-TYPE values are plain numbers
+                i += 1
+            continue
+
+        #anything else (value assignments...) is skipped up to its value
+        while i < len(tokens) and tokens[i] not in ('::=', 'END'):
+            i += 1
+        if i < len(tokens) and tokens[i] == '::=':
+            i += 1
+            if i < len(tokens) and tokens[i] in ('{', '('):
+                i = groupSkip(tokens, i)
+            else:
+                i += 1
+
+    return i
+
+
+def textParse(text):
+    '''
+    Returns the list of modules defined in one MIB file's text.  Each module is
+    a dictionary of its name, imports, objects and types.
+    '''
+    tokens = tokenize(text)
+    modules = []
+    i = 0
+    while i < len(tokens):
+        if i + 1 < len(tokens) and tokens[i + 1] == 'DEFINITIONS':
+            module = {'name': tokens[i], 'imports': {}, 'objects': OrderedDict(), 'types': {}}
+            while i < len(tokens) and tokens[i] != 'BEGIN':
+                i += 1
+            i = moduleBodyParse(tokens, i + 1, module)
+            modules.append(module)
+        else:
+            i += 1
+    return modules
+
+
+def fileParse(filename):
+    '''
+    process pool worker: parse one file, errors are returned rather than raised
+    so one broken vendor MIB does not stop the whole directory
+    '''
+    try:
+        with open(filename) as mibFile:
+            text = mibFile.read()
+        if not isinstance(text, str):
+            text = text.decode('latin-1')
+        modules = textParse(text)
+    except (IOError, IndexError, ValueError) as err:
+        return filename, [], '%s: %s' % (filename, err)
+    for module in modules:
+        module['filename'] = filename
+    return filename, modules, None
+
+
+class MibIndex(object):
+    '''
+    Compiled view of a set of modules.  objects maps (module, name) to a record:
+        {'name', 'module', 'kind', 'oid', 'access', 'syntax', 'baseType',
+         'sizes', 'index', 'augments'}
+    and tree holds the OBJECT-TYPEs by OID, named MODULE::name with their
+    access and baseType.
+    '''
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.oidMemo = {}
+        self.typeMemo = {}
+        self.objects = OrderedDict()
+        self.tree = pyoidtree.OidTree()
+
+        for moduleName, module in modules.items():
+            for name, parsed in module['objects'].items():
+                record = {'name': name, 'module': moduleName, 'kind': parsed['kind'],
+                          'oid': self.oidResolve(moduleName, name),
+                          'access': parsed.get('access'), 'syntax': parsed.get('syntax'),
+                          'index': parsed.get('index'), 'augments': parsed.get('augments')}
+                baseType, sizes = self.typeResolve(moduleName, parsed.get('syntax'))
+                record['baseType'] = baseType
+                record['sizes'] = parsed.get('sizes') or sizes
+                self.objects[(moduleName, name)] = record
+                if record['kind'] == 'OBJECT-TYPE' and record['oid']:
+                    self.tree.insert(record['oid'], '%s::%s' % (moduleName, name),
+                                     access=record['access'], syntax=baseType)
+
+    def definingModuleGet(self, moduleName, name, table):
+        '''
+        follows IMPORTS to the module that defines name in table ('objects'/'types')
+        '''
+        seen = set()
+        while moduleName in self.modules and (moduleName, name) not in seen:
+            seen.add((moduleName, name))
+            module = self.modules[moduleName]
+            if name in module[table]:
+                return moduleName
+            if name not in module['imports']:
+                break
+            moduleName = module['imports'][name]
+        #v1 MIBs sometimes use names they never import
+        for otherName, other in self.modules.items():
+            if name in other[table]:
+                return otherName
+        return None
+
+    def oidResolve(self, moduleName, name, depth=0):
+        key = (moduleName, name)
+        if key in self.oidMemo:
+            return self.oidMemo[key]
+        if depth > 64:
+            return None
+
+        definedIn = self.definingModuleGet(moduleName, name, 'objects')
+        oid = None
+        if definedIn is None:
+            oid = BUILTIN_OIDS.get(name)
+        else:
+            components = self.modules[definedIn]['objects'][name]['value']
+            oid = ()
+            for position, (componentName, number) in enumerate(components):
+                if number is not None and (position > 0 or componentName is None):
+                    oid = oid + (number,)
+                elif componentName in BUILTIN_OIDS and position == 0 and number is None:
+                    oid = BUILTIN_OIDS[componentName]
+                elif number is not None:
+                    oid = (number,)
+                else:
+                    parent = self.oidResolve(definedIn, componentName, depth + 1)
+                    if parent is None:
+                        oid = None
+                        break
+                    oid = parent
+
+        self.oidMemo[key] = oid
+        return oid
+
+    def typeResolve(self, moduleName, syntax, depth=0):
+        '''
+        Returns (baseType, sizes) for a syntax name, following textual conventions
+        and type assignments through the imports.
+        '''
+        if syntax is None:
+            return None, []
+        if syntax in BASE_TYPES:
+            return syntax, []
+        key = (moduleName, syntax)
+        if key in self.typeMemo:
+            return self.typeMemo[key]
+
+        definedIn = self.definingModuleGet(moduleName, syntax, 'types')
+        if definedIn is None or depth > 32:
+            resolved = BUILTIN_TYPES.get(syntax, (None, []))
+        else:
+            typeInfo = self.modules[definedIn]['types'][syntax]
+            baseType, sizes = self.typeResolve(definedIn, typeInfo['syntax'], depth + 1)
+            resolved = (baseType, typeInfo['sizes'] or sizes)
+
+        self.typeMemo[key] = resolved
+        return resolved
+
+    def objectGet(self, moduleName, name):
+        definedIn = self.definingModuleGet(moduleName, name, 'objects')
+        return self.objects.get((definedIn, name))
+
+    def rootOidGet(self, moduleName, root):
+        '''
+        a pyoids rootOid is either numeric or an object name of the module
+        '''
+        if re.match(r'^\.?\d+(\.\d+)*$', root):
+            return tuple(int(arc) for arc in root.strip('.').split('.'))
+        record = self.objectGet(moduleName, root)
+        return record['oid'] if record else None
+
+    def objectsUnder(self, rootOid):
+        '''
+        OBJECT-TYPEs at or below rootOid in OID order, like snmptranslate -Tp walks them
+        '''
+        for oid, node in self.tree.subtreeIterate(rootOid):
+            yield self.objects[tuple(node.name.split('::', 1))]
+
+
+def moduleFilesParse(filenames, processes=None):
+    '''
+    Parses the files in a process pool, returns ({moduleName: module}, errors).
+    Files parsed earlier by this process are only parsed again when they
+    changed, which is what keeps a pyprobed.py daemon's MIBs warm.
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    stale = []
+    signatures = {}
+    for filename in filenames:
+        stat = os.stat(filename)
+        signatures[filename] = (stat.st_mtime, stat.st_size)
+        if filename not in parsedFiles or parsedFiles[filename][0] != signatures[filename]:
+            stale.append(filename)
+
+    if processes > 1 and len(stale) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(fileParse, stale, chunksize=max(1, len(stale) // (processes * 4)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [fileParse(filename) for filename in stale]
+    for filename, fileModules, error in results:
+        parsedFiles[filename] = (signatures[filename], fileModules, error)
+
+    modules = {}
+    errors = []
+    for filename in filenames:
+        signature, fileModules, error = parsedFiles[filename]
+        if error:
+            errors.append(error)
+        for module in fileModules:
+            modules.setdefault(module['name'], module)
+    return modules, errors
+
+
+def importsClosureGet(modules, wanted):
+    '''
+    wanted modules plus everything they import, directly or not
+    '''
+    closure = OrderedDict()
+    pending = list(wanted)
+    while pending:
+        moduleName = pending.pop()
+        if moduleName in closure or moduleName not in modules:
+            continue
+        closure[moduleName] = modules[moduleName]
+        pending.extend(set(modules[moduleName]['imports'].values()))
+    return closure
+
+
+def mibIndexBuild(mibDirectory=DEFAULT_MIB_DIRECTORY, wanted=None, processes=None):
+    '''
+    Parses every MIB file in mibDirectory and compiles the wanted modules (all
+    of them when wanted is None) together with their imports.
+    Returns (MibIndex, errors).
+    '''
+    filenames = []
+    for pattern in MIB_FILE_PATTERNS:
+        filenames.extend(glob.glob(os.path.join(mibDirectory, pattern)))
+    if not filenames:
+        raise MibParseError('no MIB files found in %s' % mibDirectory)
+
+    modules, errors = moduleFilesParse(sorted(filenames), processes)
+    if wanted:
+        for moduleName in wanted:
+            if moduleName not in modules:
+                errors.append('module %s not found in %s' % (moduleName, mibDirectory))
+        modules = importsClosureGet(modules, wanted)
+    return MibIndex(modules), errors
+
+
+def writableStringLeaf(record):
+    '''
+    what pyoids looks for: read-write/read-create OCTET STRING based leaves
+    '''
+    return (record['kind'] == 'OBJECT-TYPE' and record['access'] in ('read-write', 'read-create')
+            and record['baseType'] == 'OCTET STRING')
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pymibparse.py [mibDirectory] [MODULE-NAME ...] [--processes=N]'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+
+    mibDirectory = args[1] if len(args) > 1 else DEFAULT_MIB_DIRECTORY
+    wanted = args[2:] or None
+    processes = int(options['processes']) if 'processes' in options else None
+
+    start = time.time()
+    try:
+        index, errors = mibIndexBuild(mibDirectory, wanted, processes)
+    except MibParseError as err:
+        print("ERROR: %s\n%s" % (err, usage))
+        sys.exit(1)
+
+    for error in errors:
+        print('WARNING: %s' % error, file=sys.stderr)
+    for record in index.objects.values():
+        if writableStringLeaf(record) and (wanted is None or record['module'] in wanted):
+            print('%s\t%s::%s\t%s' % (ACCESS_ABBREVIATIONS[record['access']], record['module'],
+                                      record['name'], '.' + '.'.join(str(arc) for arc in record['oid'] or ())))
+    print('compiled %d modules, %d objects in %.2fs' % (len(index.modules), len(index.objects),
+                                                        time.time() - start), file=sys.stderr)
@@ -20,7 +20,40 @@ How to use:
     Each module listed in the .csv must be available in the net-snmp search path.
     This is usually in /home/username/.snmp/mibs
 
-    3. $ python pyoids.py
+    3. $ python pyoids.py [--record=traceFile | --replay=traceFile] [--native[=mibDirectory]]
+                          [--include=PATTERN,...] [--exclude=PATTERN,...]
+
+    With --native the MIB files are compiled by pymibparse.py instead of
+    running snmptranslate for every root OID and leaf; the directory defaults
+    to /home/username/.snmp/mibs.  Only the modules in the .csv and the modules
+    they import are compiled.
+
+    --include and --exclude pick the leaves with shell patterns, a pattern
+    with '::' matches MODULE::leafName (*::*Password*), one without matches
+    the module name (WWP-LEOS-*).  A leaf under overlapping root OIDs is
+    listed once.
+
+    The leaves are produced one at a time by leavesIterate(), which
+    pyschar.py --inventory probes straight from, without mibLeaves.csv or a
+    hand-edited pyschar.conf in between.
+
+    4. $ python pyoids.py --diff oldLeaves.csv newLeaves.csv [--conf=pyschar.conf]
+                          [--chunk-rows=N]
+
+    compares two mibLeaves.csv outputs, e.g. from the MIBs of two firmware
+    versions.  Both are sorted by OID (in chunks of --chunk-rows rows spilled to
+    temporary files, default 100000, so very large inventories do not have to
+    fit in memory) and merge-joined as streams.  Added, removed, renamed and
+    access-changed leaves are written to mibLeaves.diff.csv.  With --conf, a
+    pyschar.conf covering only the added and changed leaves is written too, so
+    a regression run only probes what changed.
+
+    With --daemon[=socketFile] the run happens in a pyprobed.py daemon; pipe
+    the input .csv filename in (echo rootOids.csv | python pyoids.py --daemon).
+
+    With --profile[=file.pstats] the run is profiled: cProfile stats for
+    snakeviz and a Python CPU / child CPU / network wait breakdown at exit,
+    see pytransport.py.
 
 Author:
     Jeremy Mattfeld, jmattfel@ciena.com
@@ -28,12 +61,19 @@ Author:
 
     
 from __future__ import print_function
-from subprocess import Popen, PIPE, check_output
 from string import split, rstrip
+from collections import OrderedDict
+import tempfile
+import fnmatch
+import heapq
+import json
 import re
 import csv
 import sys
 
+import pymibparse
+import pytransport
+
 
 class callonce(object):
 # this is a decorator for functions we only want to execute once
@@ -56,34 +96,45 @@ def csvHeaderWrite(writer, fieldnames, out):
     return
 
 
-def mibTreeParse(entry, out):
+def mibTreeIterate(entry):
+    '''
+    yields the (access, module, leafName, oid) rows of the writable string
+    leaves under the root OID of a .csv entry, one leaf at a time
+    '''
     module = entry['moduleName']
     rootOid = str(entry['rootOid'])
     
-    p1 = Popen(["snmptranslate -m +" + module + " -Tp " + rootOid + " 2>/dev/null"], 
-               shell=True, stdout=PIPE)
-    
-    # sub-processes to filter for read-create and read-write string type nodes
-    p2 = Popen(["egrep 'CR|RW'"], shell=True, stdin=p1.stdout, stdout=PIPE)
-    p1.stdout.close()
-    p3 = Popen(["grep 'String'"], shell=True, stdin=p2.stdout, stdout=PIPE)
-    p2.stdout.close()
+    tree = pytransport.snmpRun("snmptranslate -m +" + module + " -Tp " + rootOid + " 2>/dev/null",
+                               check=False)
     
-    output = str.splitlines(p3.communicate()[0])
+    # filter for read-create and read-write string type nodes
+    # (this used to be "| egrep 'CR|RW' | grep 'String'")
+    output = [row for row in str.splitlines(tree)
+              if re.search(r'CR|RW', row) and 'String' in row]
     
     for row in output:
-        csvLineWrite(row, module, out)
+        yield leafRowGet(row, module)
 
-    return
 
+def mibTreeNativeIterate(entry, index):
+    '''
+    mibTreeIterate() from the pymibparse.py index instead of snmptranslate
+    '''
+    module = entry['moduleName']
+    rootOid = index.rootOidGet(module, str(entry['rootOid']))
+    if rootOid is None:
+        print('WARNING: could not resolve root OID %s of %s' % (entry['rootOid'], module))
+        return
+
+    # same read-create and read-write string filter as mibTreeIterate
+    for record in index.objectsUnder(rootOid):
+        if pymibparse.writableStringLeaf(record):
+            oid = '.' + '.'.join(str(arc) for arc in record['oid'])
+            yield pymibparse.ACCESS_ABBREVIATIONS[record['access']], module, record['name'], oid
 
-def csvLineWrite(line, module, out):
-    
-    # initialize csv dictwriter
-    fieldnames = ['access', 'module', 'leafName', 'oid']
-    writer = csv.DictWriter(out, fieldnames=fieldnames)
-    csvHeaderWrite(writer, fieldnames, out)
 
+def leafRowGet(line, module):
+    
     # field string formatting
     newOutput = split(line)
     l = len(newOutput)
@@ -91,9 +142,82 @@ def csvLineWrite(line, module, out):
     leafName = re.sub(r'(\(\d+\))','',newOutput[l-1])
 
     # get oid
-    p1 = Popen(["snmptranslate -On " + module + "::" + leafName + " 2>/dev/null"],
-               shell=True, stdout=PIPE)
-    oid = rstrip(p1.communicate()[0], '\n')
+    oid = pytransport.snmpRun("snmptranslate -On " + module + "::" + leafName + " 2>/dev/null",
+                              check=False)
+    oid = rstrip(oid, '\n')
+
+    return access, module, leafName, oid
+
+
+def patternsMatch(patterns, module, leafName):
+    '''
+    True when one of the comma separated shell patterns matches: a pattern
+    with '::' in it is matched against MODULE::leafName, one without against
+    the module name
+    '''
+    for pattern in patterns.split(','):
+        if '::' in pattern:
+            if fnmatch.fnmatchcase(module + '::' + leafName, pattern):
+                return True
+        elif fnmatch.fnmatchcase(module, pattern):
+            return True
+    return False
+
+
+def leavesIterate(entries, index=None, include=None, exclude=None):
+    '''
+    Yields the (access, module, leafName, oid) rows of the writable string
+    leaves under every root OID, as they are found, keeping the leaves
+    --include picks (all of them when not given) that --exclude does not
+    drop.  A leaf under overlapping root OIDs is only yielded once.
+    '''
+    seen = set()
+    for entry in entries:
+        if index:
+            rows = mibTreeNativeIterate(entry, index)
+        else:
+            rows = mibTreeIterate(entry)
+        for access, module, leafName, oid in rows:
+            if (module, leafName) in seen:
+                continue
+            seen.add((module, leafName))
+            if include and include is not True and not patternsMatch(include, module, leafName):
+                continue
+            if exclude and exclude is not True and patternsMatch(exclude, module, leafName):
+                continue
+            yield access, module, leafName, oid
+
+
+def rootOidsRead(inFilename):
+    '''
+    the entries of a root OID .csv (moduleName, rootOid), raises IOError
+    '''
+    with open(inFilename) as rootOidsFile:
+        return list(csv.DictReader(rootOidsFile))
+
+
+def mibIndexGet(options, entries):
+    '''
+    the pymibparse.py index of the modules of the entries with --native, None
+    without it.  Raises pymibparse.MibParseError.
+    '''
+    if 'native' not in options:
+        return None
+    mibDirectory = options['native']
+    if mibDirectory is True:
+        mibDirectory = pymibparse.DEFAULT_MIB_DIRECTORY
+    index, errors = pymibparse.mibIndexBuild(mibDirectory, [entry['moduleName'] for entry in entries])
+    for error in errors:
+        print('WARNING: %s' % error)
+    return index
+
+
+def csvRowWrite(access, module, leafName, oid, out):
+
+    # initialize csv dictwriter
+    fieldnames = ['access', 'module', 'leafName', 'oid']
+    writer = csv.DictWriter(out, fieldnames=fieldnames)
+    csvHeaderWrite(writer, fieldnames, out)
 
     # write the csv line
     writer.writerow({'access':access, 'module':module, 'leafName':leafName , 'oid':oid})
@@ -101,20 +225,172 @@ def csvLineWrite(line, module, out):
     return
     
 
-# execution starts here
+def oidKeyGet(oid):
+    # numeric order, so .1.3.6.1.10 sorts after .1.3.6.1.9
+    return tuple(int(arc) for arc in oid.strip('.').split('.'))
+
+
+def leavesSortedIterate(filename, chunkRows=100000):
+    '''
+    yields the rows of a mibLeaves.csv in OID order.  Rows are sorted in chunks
+    of chunkRows, chunks are spilled to temporary files and merged back, so
+    only one chunk is ever held in memory.  Rows without an oid are skipped.
+    '''
+    chunkFiles = []
+    leavesFile = open(filename)
+    rows = csv.DictReader(leavesFile)
+    fieldnames = None
+    while True:
+        chunk = []
+        for row in rows:
+            if row['oid']:
+                chunk.append((oidKeyGet(row['oid']), row))
+            if len(chunk) >= chunkRows:
+                break
+        fieldnames = rows.fieldnames
+        if not chunk:
+            break
+        chunk.sort(key=lambda keyRow: keyRow[0])
+        if not chunkFiles and len(chunk) < chunkRows:
+            # the whole file fit in one chunk
+            leavesFile.close()
+            for key, row in chunk:
+                yield row
+            return
+        chunkFile = tempfile.TemporaryFile('w+b')
+        writer = csv.DictWriter(chunkFile, fieldnames=fieldnames)
+        for key, row in chunk:
+            writer.writerow(row)
+        chunkFile.seek(0)
+        chunkFiles.append(chunkFile)
+    leavesFile.close()
+
+    def chunkIterate(chunkNumber, chunkFile):
+        for sequence, row in enumerate(csv.DictReader(chunkFile, fieldnames=fieldnames)):
+            yield oidKeyGet(row['oid']), chunkNumber, sequence, row
+
+    for key, chunkNumber, sequence, row in heapq.merge(
+            *[chunkIterate(number, chunkFile) for number, chunkFile in enumerate(chunkFiles)]):
+        yield row
+    for chunkFile in chunkFiles:
+        chunkFile.close()
+
+
+def leavesDiff(oldRows, newRows):
+    '''
+    merge-join of two OID ordered row streams, yields (change, oldRow, newRow)
+    with change one of added, removed, renamed or access-changed
+    '''
+    def uniqueIterate(rows):
+        # overlapping root OIDs list the same leaf more than once
+        lastKey = None
+        for row in rows:
+            key = oidKeyGet(row['oid'])
+            if key != lastKey:
+                yield key, row
+            lastKey = key
+
+    done = (None, None)
+    oldIter = uniqueIterate(oldRows)
+    newIter = uniqueIterate(newRows)
+    oldKey, oldRow = next(oldIter, done)
+    newKey, newRow = next(newIter, done)
+    while oldRow is not None or newRow is not None:
+        if newRow is None or (oldRow is not None and oldKey < newKey):
+            yield 'removed', oldRow, None
+            oldKey, oldRow = next(oldIter, done)
+        elif oldRow is None or newKey < oldKey:
+            yield 'added', None, newRow
+            newKey, newRow = next(newIter, done)
+        else:
+            if (oldRow['module'], oldRow['leafName']) != (newRow['module'], newRow['leafName']):
+                yield 'renamed', oldRow, newRow
+            elif oldRow['access'] != newRow['access']:
+                yield 'access-changed', oldRow, newRow
+            oldKey, oldRow = next(oldIter, done)
+            newKey, newRow = next(newIter, done)
+
+
+def leavesDiffRun(oldFilename, newFilename, options):
+    chunkRows = int(options.get('chunk-rows', 100000))
+    diffFilename = 'mibLeaves.diff.csv'
+    counts = OrderedDict((change, 0) for change in ['added', 'removed', 'renamed', 'access-changed'])
+    changedLeaves = OrderedDict()
+
+    print('comparing ' + oldFilename + ' with ' + newFilename + '...')
+    with open(diffFilename, 'w') as diffOut:
+        fieldnames = ['change', 'module', 'leafName', 'oid', 'oldAccess', 'newAccess']
+        writer = csv.DictWriter(diffOut, fieldnames=fieldnames)
+        writer.writeheader()
+        for change, oldRow, newRow in leavesDiff(leavesSortedIterate(oldFilename, chunkRows),
+                                                 leavesSortedIterate(newFilename, chunkRows)):
+            counts[change] += 1
+            row = newRow or oldRow
+            writer.writerow({'change': change, 'module': row['module'],
+                             'leafName': row['leafName'], 'oid': row['oid'],
+                             'oldAccess': oldRow['access'] if oldRow else '',
+                             'newAccess': newRow['access'] if newRow else ''})
+            # removed leaves are gone from the new firmware, nothing to probe
+            if newRow:
+                changedLeaves.setdefault(newRow['module'], []).append(newRow['leafName'])
+
+    for change, count in counts.items():
+        print('%-15s %d' % (change, count))
+
+    if 'conf' in options:
+        confFilename = options['conf']
+        if confFilename is True:
+            confFilename = 'pyschar.conf'
+        with open(confFilename, 'w') as confOut:
+            json.dump(changedLeaves, confOut, indent=4)
+        print('pyschar conf with %d changed leaves written to %s' % (
+            sum(len(leaves) for leaves in changedLeaves.values()), confFilename))
+
+    print('done. output written to ' + diffFilename)
+    return
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    # with --daemon the run happens in a pyprobed.py daemon, see pytransport.daemonForward()
+    returncode = pytransport.daemonForward(sys.argv)
+    if returncode is not None:
+        sys.exit(returncode)
+
+    # --record/--replay trace the snmptranslate calls
+    options, args = pytransport.optionsParse(sys.argv)
+
+    if 'diff' in options:
+        if len(args) != 3:
+            print('Usage: $ python pyoids.py --diff oldLeaves.csv newLeaves.csv [--conf=pyschar.conf] [--chunk-rows=N]')
+            sys.exit()
+        try:
+            leavesDiffRun(args[1], args[2], options)
+        except IOError as err:
+            print('Error: %s' % err)
+        sys.exit()
+
+    # file I/O
+    inFilename = raw_input('Enter the input .csv file: ')
+    rootOidsDictionary = rootOidsRead(inFilename)
+    outFilename = 'mibLeaves.csv'
+    csvOut = open(outFilename, 'w')
 
-# file I/O
-inFilename = raw_input('Enter the input .csv file: ')
-rootOidsFile = open(inFilename)
-rootOidsDictionary = csv.DictReader(rootOidsFile)
-outFilename = 'mibLeaves.csv'
-csvOut = open(outFilename, 'w')
+    print('reading ' + inFilename + '...')
+    print('parsing local MIB trees...')
 
-print('reading ' + inFilename + '...')
-print('parsing local MIB trees...')
+    try:
+        index = mibIndexGet(options, rootOidsDictionary)
+    except pymibparse.MibParseError as err:
+        print('ERROR: %s' % err)
+        sys.exit(1)
 
-# parse the MIB tree for each entry in input csv file
-for entry in rootOidsDictionary:
-    mibTreeParse(entry, csvOut)
+    # parse the MIB tree for each entry in input csv file
+    for access, module, leafName, oid in leavesIterate(rootOidsDictionary, index,
+                                                       options.get('include'), options.get('exclude')):
+        csvRowWrite(access, module, leafName, oid, csvOut)
 
-print('done. output written to ' + outFilename)
+    print('done. output written to ' + outFilename)
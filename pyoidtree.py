@@ -0,0 +1,318 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyoidtree.py
+
+Usage:
+    $ python pyoidtree.py [mibLeaves.csv]
+
+Description:
+    compact in-memory OID tree for large leaf inventories.  When pyoids is run
+    over every enterprise root, the leaves number in the hundreds of thousands
+    and a dict row plus an OID string per leaf adds up quickly.
+
+    The tree is path compressed, so a chain of single-child nodes costs one
+    node, and it is kept in packed arrays rather than objects: the arcs of all
+    edges share one array('I'), the names share one buffer and the per-node
+    fields are parallel arrays indexed by node number.  Children are found with
+    a bisect over an array of their first arcs.  Lookups hand out small
+    __slots__ OidNode views with the name, access and syntax of a node.
+
+    Supports exact lookup, longest-prefix match (object + instance index from
+    a full instance OID), subtree iteration in OID order and filtering by
+    access and syntax.
+
+    Run on its own, it loads a pyoids mibLeaves.csv and compares the memory it
+    takes in the tree with the list of csv rows.
+
+Parameters:
+    mibLeaves.csv:  pyoids output to load (default mibLeaves.csv)
+==================================================================================="""
+
+from __future__ import print_function
+from array import array
+from bisect import bisect_left
+import csv
+import sys
+
+import pyber
+
+
+class OidNode(object):
+    '''
+    lightweight view of one node, only made for the nodes handed out
+    '''
+    __slots__ = ('tree', 'nodeId')
+
+    def __init__(self, tree, nodeId):
+        self.tree = tree
+        self.nodeId = nodeId
+
+    @property
+    def name(self):
+        return self.tree.nameGet(self.nodeId)
+
+    @property
+    def access(self):
+        return self.tree.codes[self.tree.accessCodes[self.nodeId]]
+
+    @property
+    def syntax(self):
+        return self.tree.codes[self.tree.syntaxCodes[self.nodeId]]
+
+
+class OidTree(object):
+    '''
+    OIDs are tuples of ints or dotted strings ('.1.3.6.1' and '1.3.6.1' are the same).
+
+    Node n is an index into the parallel arrays: its edge is
+    arcs[edgeStarts[n]:edgeStarts[n] + edgeLengths[n]], its name is a slice of
+    the names buffer (length 0 for unnamed nodes), access and syntax are codes
+    into the shared codes list.  Only nodes with children have an entry in
+    children: (first arcs of the children, their node numbers), both sorted.
+    '''
+
+    def __init__(self):
+        self.arcs = array('I')
+        self.edgeStarts = array('I', [0])
+        #an edge can be a whole OID, longer than 255 arcs
+        self.edgeLengths = array('I', [0])
+        self.names = bytearray()
+        self.nameStarts = array('I', [0])
+        self.nameLengths = array('H', [0])
+        self.accessCodes = array('B', [0])
+        self.syntaxCodes = array('B', [0])
+        self.codes = [None]
+        self.codeIndex = {None: 0}
+        self.children = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def codeGet(self, value):
+        if value not in self.codeIndex:
+            self.codeIndex[value] = len(self.codes)
+            self.codes.append(value)
+        return self.codeIndex[value]
+
+    def nameGet(self, nodeId):
+        length = self.nameLengths[nodeId]
+        if not length:
+            return None
+        start = self.nameStarts[nodeId]
+        return str(self.names[start:start + length].decode('utf-8'))
+
+    def nodeAdd(self, edgeStart, edgeLength):
+        self.edgeStarts.append(edgeStart)
+        self.edgeLengths.append(edgeLength)
+        self.nameStarts.append(0)
+        self.nameLengths.append(0)
+        self.accessCodes.append(0)
+        self.syntaxCodes.append(0)
+        return len(self.edgeStarts) - 1
+
+    def edgeGet(self, nodeId):
+        start = self.edgeStarts[nodeId]
+        return self.arcs[start:start + self.edgeLengths[nodeId]]
+
+    def childFind(self, nodeId, arc):
+        '''
+        returns (child, position), child is None when there is no child on arc
+        and position is where it would go
+        '''
+        if nodeId not in self.children:
+            return None, 0
+        keys, ids = self.children[nodeId]
+        position = bisect_left(keys, arc)
+        if position < len(keys) and keys[position] == arc:
+            return ids[position], position
+        return None, position
+
+    def insert(self, oid, name, access=None, syntax=None):
+        if isinstance(oid, str):
+            oid = pyber.oidParse(oid)
+        nodeId = 0
+        i = 0
+        while i < len(oid):
+            child, position = self.childFind(nodeId, oid[i])
+            if child is None:
+                child = self.nodeAdd(len(self.arcs), len(oid) - i)
+                self.arcs.extend(oid[i:])
+                keys, ids = self.children.setdefault(nodeId, (array('I'), array('I')))
+                keys.insert(position, oid[i])
+                ids.insert(position, child)
+                nodeId = child
+                break
+
+            edgeStart = self.edgeStarts[child]
+            edgeLength = self.edgeLengths[child]
+            matched = 0
+            while (matched < edgeLength and i + matched < len(oid)
+                   and self.arcs[edgeStart + matched] == oid[i + matched]):
+                matched += 1
+            if matched < edgeLength:
+                #split the edge where the new OID leaves it, the arcs stay put
+                middle = self.nodeAdd(edgeStart, matched)
+                self.edgeStarts[child] = edgeStart + matched
+                self.edgeLengths[child] = edgeLength - matched
+                self.children[middle] = (array('I', [self.arcs[edgeStart + matched]]),
+                                         array('I', [child]))
+                self.children[nodeId][1][position] = middle
+                child = middle
+            nodeId = child
+            i += matched
+
+        if not self.nameLengths[nodeId]:
+            self.size += 1
+        encoded = name.encode('utf-8')
+        #the same OID and name again (pyschar inserts its leaves on every probe) keeps the name bytes
+        if self.nameGet(nodeId) != name:
+            self.nameStarts[nodeId] = len(self.names)
+            self.nameLengths[nodeId] = len(encoded)
+            self.names.extend(encoded)
+        self.accessCodes[nodeId] = self.codeGet(access)
+        self.syntaxCodes[nodeId] = self.codeGet(syntax)
+        return OidNode(self, nodeId)
+
+    def nodeWalk(self, oid):
+        '''
+        yields (nodeId, depth) for every node on the path of oid, depth being
+        the number of arcs of oid consumed at that node
+        '''
+        nodeId = 0
+        i = 0
+        yield nodeId, i
+        while i < len(oid):
+            child, position = self.childFind(nodeId, oid[i])
+            if child is None:
+                return
+            edge = self.edgeGet(child)
+            if tuple(oid[i:i + len(edge)]) != tuple(edge):
+                return
+            nodeId = child
+            i += len(edge)
+            yield nodeId, i
+
+    def get(self, oid):
+        if isinstance(oid, str):
+            oid = pyber.oidParse(oid)
+        for nodeId, depth in self.nodeWalk(oid):
+            if depth == len(oid) and self.nameLengths[nodeId]:
+                return OidNode(self, nodeId)
+        return None
+
+    def longestPrefixMatch(self, oid):
+        '''
+        Returns (node, suffix) for the deepest named node that is a prefix of
+        oid, e.g. the column object and the instance index of a varbind OID.
+        Returns (None, oid) when nothing matches.
+        '''
+        if isinstance(oid, str):
+            oid = pyber.oidParse(oid)
+        best = None
+        bestDepth = 0
+        for nodeId, depth in self.nodeWalk(oid):
+            if self.nameLengths[nodeId]:
+                best = nodeId
+                bestDepth = depth
+        return (OidNode(self, best) if best is not None else None), tuple(oid[bestDepth:])
+
+    def subtreeIterate(self, root=()):
+        '''
+        yields (oid, node) for the named nodes at or below root, in OID order
+        '''
+        if isinstance(root, str):
+            root = pyber.oidParse(root)
+        root = tuple(root)
+
+        #find the node whose path covers root, root may end inside an edge
+        nodeId = 0
+        prefix = ()
+        while len(prefix) < len(root):
+            child, position = self.childFind(nodeId, root[len(prefix)])
+            if child is None:
+                return
+            path = prefix + tuple(self.edgeGet(child))
+            common = min(len(path), len(root))
+            if path[:common] != root[:common]:
+                return
+            nodeId = child
+            prefix = path
+
+        stack = [(nodeId, prefix)]
+        while stack:
+            nodeId, prefix = stack.pop()
+            if self.nameLengths[nodeId]:
+                yield prefix, OidNode(self, nodeId)
+            if nodeId in self.children:
+                for child in reversed(self.children[nodeId][1]):
+                    stack.append((child, prefix + tuple(self.edgeGet(child))))
+
+    def leavesFilter(self, root=(), access=None, syntax=None):
+        '''
+        subtreeIterate restricted to the given access and syntax values (any
+        iterable of strings, None for no restriction)
+        '''
+        for oid, node in self.subtreeIterate(root):
+            if access is not None and node.access not in access:
+                continue
+            if syntax is not None and node.syntax not in syntax:
+                continue
+            yield oid, node
+
+    def nodesCount(self):
+        return len(self.edgeStarts)
+
+    def bytesGet(self):
+        '''
+        approximate memory held by the tree
+        '''
+        total = sum(sys.getsizeof(buf) for buf in (
+            self.arcs, self.edgeStarts, self.edgeLengths, self.names, self.nameStarts,
+            self.nameLengths, self.accessCodes, self.syntaxCodes, self.children))
+        for keys, ids in self.children.values():
+            total += sys.getsizeof(keys) + sys.getsizeof(ids)
+        return total
+
+
+def leavesCsvLoad(filename, tree=None):
+    '''
+    loads a pyoids mibLeaves.csv (access, module, leafName, oid) into a tree
+    '''
+    if tree is None:
+        tree = OidTree()
+    with open(filename) as leavesFile:
+        for row in csv.DictReader(leavesFile):
+            if not row['oid']:
+                continue
+            tree.insert(row['oid'], '%s::%s' % (row['module'], row['leafName']),
+                        access=row['access'])
+    return tree
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    if (len(sys.argv) == 2) and ((sys.argv[1] == '-h') or (sys.argv[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+
+    leavesFilename = sys.argv[1] if len(sys.argv) > 1 else 'mibLeaves.csv'
+    try:
+        tree = leavesCsvLoad(leavesFilename)
+        with open(leavesFilename) as leavesFile:
+            rows = list(csv.DictReader(leavesFile))
+    except IOError:
+        print("Error: could not find file %s" % (leavesFilename))
+        sys.exit()
+
+    rowsBytes = sys.getsizeof(rows)
+    for row in rows:
+        rowsBytes += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+    print('%d leaves in %d nodes' % (len(tree), tree.nodesCount()))
+    print('csv rows: %10d bytes' % rowsBytes)
+    print('oid tree: %10d bytes' % tree.bytesGet())
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pypipeline.py
+
+Description:
+    pipelined execution of work units made of stages that must run in order,
+    for pycreate.py --pipeline.  Every stage runs in its own thread and hands
+    the unit to the next stage through a short queue, so while the second
+    stage works on one unit the first stage already works on the next one:
+    the POST create sweep of alarmEntry runs while the DURING create sweep of
+    eventEntry does, instead of the agent waiting on one row at a time.
+
+    Each stage sees the units one at a time and in order, so the stages of
+    one unit never overlap and the first stage of unit n+1 only starts once
+    the first stage of unit n is done (entries that need an earlier entry to
+    exist are still created after it).  The units are pulled from their
+    iterable lazily, a --time-budget schedule decides on each entry just
+    before it starts.
+
+    The stages share the process: they must not touch anything that follows
+    the commands of a single thread (--record, --replay, --timeline,
+    --profile).  The results come back to the thread that called
+    pipelineRun() in unit order, so it can record and write them like a
+    serial run would.
+==================================================================================="""
+
+from __future__ import print_function
+import traceback
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+#units waiting between two stages, how far a stage can run ahead of the next one
+STAGE_QUEUE_SIZE = 1
+#python 2 does not interrupt a blocking Queue.get(), the caller polls instead
+RESULT_POLL_SECONDS = 1.0
+
+
+def unitsFeed(units, unitQueue):
+    '''
+    puts the (key, payload) units on the queue of the first stage, a None
+    unit is the end of the queue
+    '''
+    try:
+        for key, payload in units:
+            unitQueue.put((key, payload, [], None, 0.0))
+    except Exception:
+        print("ERROR: no more units, %s" % traceback.format_exc())
+    finally:
+        unitQueue.put(None)
+
+
+def stageRun(stage, inQueue, outQueue):
+    '''
+    the loop of one stage thread, units that failed in an earlier stage are
+    passed on untouched
+    '''
+    while True:
+        unit = inQueue.get()
+        if unit is None:
+            outQueue.put(None)
+            break
+        key, payload, values, error, seconds = unit
+        if error is None:
+            start = time.time()
+            try:
+                values = values + [stage(*payload)]
+            except Exception:
+                error = traceback.format_exc()
+            seconds += time.time() - start
+        outQueue.put((key, payload, values, error, seconds))
+
+
+def pipelineRun(units, stages):
+    '''
+    Runs every stage on every (key, payload) unit, stage(*payload) in stage
+    order for each unit, and yields (key, values, error, seconds) as the
+    units leave the last stage: values holds what each stage returned,
+    error the traceback of the stage that raised (the later stages are
+    skipped) and seconds the time spent in the stages of the unit.
+    '''
+    queues = [queue.Queue(STAGE_QUEUE_SIZE) for stage in stages] + [queue.Queue()]
+    threads = [threading.Thread(target=unitsFeed, args=(units, queues[0]))]
+    threads += [threading.Thread(target=stageRun, args=(stage, queues[position], queues[position + 1]))
+                for position, stage in enumerate(stages)]
+    for thread in threads:
+        #an interrupted run does not wait for the stages
+        thread.daemon = True
+        thread.start()
+
+    while True:
+        try:
+            unit = queues[-1].get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            continue
+        if unit is None:
+            break
+        key, payload, values, error, seconds = unit
+        yield key, values, error, seconds
+
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,307 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyprobed.py
+
+Usage:
+    $ python pyprobed.py [--socket=socketFile] [--numeric[=oidmap.json]]
+                         [--mibs=mibDirectory] [--confs=a.conf,b.conf]
+    $ python pyprobed.py --status [--socket=socketFile]
+    $ python pyprobed.py --shutdown [--socket=socketFile]
+
+Description:
+    long-running probe daemon for CI, where the scripts are run dozens of
+    times per build and every run pays for Python startup, the conf parsing,
+    the MIB loading and the agent setup again.
+
+    The daemon listens on a local Unix socket and runs jobs one at a time in
+    its own process: the scripts are executed there (runpy) with the job's
+    arguments, working directory and stdin, and their output is streamed back.
+    What a run leaves behind in pytransport stays warm for the next job: the
+    --numeric OID map, the parsed conf files, the AgentSession of every agent,
+    and the parsed MIB files of pyoids --native.
+
+    The scripts become thin clients with --daemon (see
+    pytransport.daemonForward()), e.g.
+        $ python pyschar.py 10.0.0.1 report.csv --daemon
+    probes the pyschar.conf leaves, pycreate.py/makemeone.py provision their
+    conf the same way and pysnapshot.py restores the switch between runs.
+    --shutdown tears the daemon down.
+
+Jobs (one JSON line per request and per answer):
+    {"job": "run", "script": "pyschar", "argv": [...], "cwd": "...", "stdin": "..."}
+        answered with {"out": text} lines and a last {"exit": code} line
+    {"job": "status"}
+        answered with {"status": {...}}: uptime, jobs, sessions, caches
+    {"job": "shutdown"}
+        answered with {"exit": 0}, then the daemon stops
+
+Parameters:
+    --socket:   Unix socket to listen on or talk to (default ~/.pyprobed.sock)
+    --numeric:  run every job with --numeric using this map unless the job
+                gives its own, the map stays loaded between jobs
+    --mibs:     parse this MIB directory up front for pyoids --native
+    --confs:    conf files to load (and, with --numeric, resolve) up front
+    --status:   print the status of a running daemon
+    --shutdown: stop a running daemon
+==================================================================================="""
+
+from __future__ import print_function
+import traceback
+import socket
+import signal
+import runpy
+import json
+import time
+import sys
+import os
+
+import pymibparse
+import pytransport
+import pyindex
+
+
+SCRIPTS = ['pyoids', 'pyschar', 'pycreate', 'makemeone', 'pysnapshot']
+
+
+class JobOutput(object):
+    '''
+    stdout/stderr of a job, every write goes to the client as an {"out": ...} line
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write(self, text):
+        if isinstance(text, bytes):
+            text = text.decode('latin-1')
+        messageSend(self.connection, {'out': text})
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class StdinText(object):
+    '''
+    the stdin piped to the client, for pyoids' raw_input()
+    '''
+
+    def __init__(self, text):
+        self.lines = text.splitlines(True)
+
+    def readline(self):
+        if not self.lines:
+            return ''
+        return self.lines.pop(0)
+
+    def read(self):
+        text = ''.join(self.lines)
+        self.lines = []
+        return text
+
+    def isatty(self):
+        return False
+
+
+def messageSend(connection, message):
+    connection.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+
+def jobArgvGet(request, defaults):
+    '''
+    the job's arguments plus the daemon wide options the job did not set
+    '''
+    argv = [str(arg) for arg in request.get('argv', [])]
+    for name, value in defaults.items():
+        if not [arg for arg in argv if arg == '--' + name or arg.startswith('--%s=' % name)]:
+            argv.append('--%s=%s' % (name, value))
+    return argv
+
+
+def jobRun(connection, request, defaults):
+    '''
+    runs one script in this process and returns its exit code
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    scriptFilename = os.path.join(here, '%s.py' % request['script'])
+
+    #the index specs come from snmptranslate of the job's MIBs and the suffixes
+    #from its conf, an earlier job must not answer for them
+    pyindex.indexSpecs.clear()
+    pyindex.suffixes.clear()
+
+    saved = (os.getcwd(), sys.argv, sys.stdin, sys.stdout, sys.stderr)
+    output = JobOutput(connection)
+    returncode = 0
+    try:
+        os.chdir(request.get('cwd') or saved[0])
+        sys.argv = [scriptFilename] + jobArgvGet(request, defaults)
+        sys.stdin = StdinText(request.get('stdin', ''))
+        sys.stdout = output
+        sys.stderr = output
+        runpy.run_path(scriptFilename, run_name='__main__')
+    except SystemExit as err:
+        if err.code is None:
+            returncode = 0
+        elif isinstance(err.code, int):
+            returncode = err.code
+        else:
+            print(err.code)
+            returncode = 1
+    except Exception:
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        pytransport.transportClose()
+        os.chdir(saved[0])
+        sys.argv, sys.stdin, sys.stdout, sys.stderr = saved[1:]
+    return returncode
+
+
+def statusGet(started, jobs):
+    return {'pid': os.getpid(),
+            'uptime': round(time.time() - started, 1),
+            'jobs': jobs,
+            'sessions': [session.statusGet() for session in pytransport.sessions.values()],
+            'confs': sorted(pytransport.confCache),
+            'oidmap': len(pytransport.OidMap.instance.oids) if pytransport.OidMap.instance else 0,
+            'mibFiles': len(pymibparse.parsedFiles)}
+
+
+def warmUp(defaults, options):
+    '''
+    loads what the jobs will ask for before the first one arrives
+    '''
+    if 'numeric' in defaults:
+        pytransport.optionsParse(['pyprobed', '--numeric=%s' % defaults['numeric']])
+
+    for configFilename in options.get('confs', '').split(','):
+        if not configFilename:
+            continue
+        configData = pytransport.confLoad(configFilename)
+        if pytransport.OidMap.instance:
+            for name in pytransport.confObjectNamesGet(configData):
+                pytransport.OidMap.instance.oidGet(name)
+        print('loaded %s' % configFilename)
+
+    if options.get('mibs'):
+        index, errors = pymibparse.mibIndexBuild(options['mibs'])
+        print('parsed %d MIB modules from %s' % (len(index.modules), options['mibs']))
+
+    pytransport.transportClose()
+
+
+def daemonRun(socketFilename, defaults):
+    if os.path.exists(socketFilename):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socketFilename)
+            probe.close()
+            raise SystemExit('ERROR: a daemon is already listening on %s' % socketFilename)
+        except socket.error:
+            os.unlink(socketFilename)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    #created owner-only, a chmod() after bind() leaves the socket open to others until then
+    umask = os.umask(0o177)
+    try:
+        server.bind(socketFilename)
+    finally:
+        os.umask(umask)
+    server.listen(8)
+    print('listening on %s' % socketFilename)
+
+    started = time.time()
+    jobs = 0
+    running = True
+    try:
+        while running:
+            connection, address = server.accept()
+            try:
+                request = json.loads(connection.makefile('rb').readline().decode('utf-8'))
+                job = request.get('job')
+                if job == 'run' and request.get('script') in SCRIPTS:
+                    jobs += 1
+                    start = time.time()
+                    returncode = jobRun(connection, request, defaults)
+                    messageSend(connection, {'exit': returncode})
+                    print('%s %s -> %d in %.2fs' % (request['script'], ' '.join(request.get('argv', [])),
+                                                   returncode, time.time() - start))
+                elif job == 'status':
+                    messageSend(connection, {'status': statusGet(started, jobs)})
+                elif job == 'shutdown':
+                    messageSend(connection, {'exit': 0})
+                    running = False
+                else:
+                    messageSend(connection, {'out': 'unknown job %s\n' % job})
+                    messageSend(connection, {'exit': 1})
+            except (ValueError, socket.error) as err:
+                print('WARNING: dropped a request: %s' % err)
+            finally:
+                connection.close()
+    finally:
+        server.close()
+        os.unlink(socketFilename)
+        print('stopped after %d jobs' % jobs)
+
+
+def requestSend(socketFilename, request):
+    '''
+    client side for --status/--shutdown, returns the answers
+    '''
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socketFilename)
+    except socket.error as err:
+        raise SystemExit('ERROR: no daemon on %s (%s)' % (socketFilename, err))
+    messageSend(client, request)
+    answers = [json.loads(line.decode('utf-8')) for line in client.makefile('rb')]
+    client.close()
+    return answers
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pyprobed.py [--socket=socketFile] [--numeric[=oidmap.json]] [--mibs=mibDirectory] [--confs=a.conf,b.conf] | --status | --shutdown'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if len(args) > 1:
+        print("ERROR: unexpected argument %s\n%s" % (args[1], usage))
+        sys.exit()
+
+    socketFilename = os.path.abspath(os.path.expanduser(options.get('socket', pytransport.DAEMON_SOCKET)))
+
+    if options.get('status'):
+        for answer in requestSend(socketFilename, {'job': 'status'}):
+            print(json.dumps(answer.get('status', answer), indent=4, sort_keys=True))
+        sys.exit()
+    if options.get('shutdown'):
+        requestSend(socketFilename, {'job': 'shutdown'})
+        print('daemon on %s stopped' % socketFilename)
+        sys.exit()
+
+    defaults = {}
+    if options.get('numeric'):
+        defaults['numeric'] = os.path.abspath(pytransport.OIDMAP_FILENAME if options['numeric'] is True
+                                              else options['numeric'])
+
+    #SIGTERM from CI cleans up the socket like ^C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        warmUp(defaults, options)
+        daemonRun(socketFilename, defaults)
+    except (IOError, ValueError, pymibparse.MibParseError) as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
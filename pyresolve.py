@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyresolve.py
+
+Usage:
+    $ python pyresolve.py [confFile ...] [--out=oidmap.json]
+
+Description:
+    pre-resolution pass for the --numeric option of the scripts.  Every
+    MODULE::leaf in the conf files is turned into its numeric OID, with one
+    snmptranslate per MIB module, and saved to a JSON map.  The scripts then
+    send numeric OIDs with MIB loading turned off (-m '') instead of making
+    every snmpset/snmpget parse the whole MIB directory before sending a packet.
+
+    Entries already in the map are kept, so the pass only pays for new names.
+
+Prerequisites:
+    Net-SNMP suite of command-line tools and the MIB files, only for this pass.
+
+Parameters:
+    confFile:   conf files to resolve (default pycreate.conf makemeone.conf pyschar.conf)
+    --out:      map file to write (default oidmap.json)
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import json
+import sys
+
+import pytransport
+
+
+DEFAULT_CONFS = ['pycreate.conf', 'makemeone.conf', 'pyschar.conf']
+
+
+######
+# main
+######
+
+usage = '''Usage: $ python pyresolve.py [confFile ...] [--out=oidmap.json]'''
+options, args = pytransport.optionsParse(sys.argv)
+
+if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+    print(__doc__)
+    sys.exit()
+
+configFilenames = args[1:] or DEFAULT_CONFS
+outFilename = options.get('out', pytransport.OIDMAP_FILENAME)
+
+names = []
+for configFilename in configFilenames:
+    try:
+        with open(configFilename) as jsonConfigFile:
+            configData = json.load(jsonConfigFile, object_pairs_hook=OrderedDict)
+    except IOError:
+        print("Error: could not find file %s" % (configFilename))
+        sys.exit()
+    names.extend(pytransport.confObjectNamesGet(configData))
+
+try:
+    with open(outFilename) as oidmapFile:
+        known = json.load(oidmapFile)
+except IOError:
+    known = {}
+
+names = list(OrderedDict.fromkeys(names))
+print('resolving %d objects (%d already in %s)...' % (
+    len(names), len([name for name in names if name in known]), outFilename))
+
+try:
+    resolved = pytransport.oidsResolve(names, known)
+except ValueError as err:
+    print("ERROR: %s" % err)
+    sys.exit(1)
+
+known.update(resolved)
+with open(outFilename, 'w') as oidmapFile:
+    json.dump(known, oidmapFile, indent=4, sort_keys=True)
+
+print('done. output written to ' + outFilename)
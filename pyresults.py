@@ -0,0 +1,387 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyresults.py
+
+Usage:
+    $ python pyresults.py results.db queryName [--name=value ...]
+    $ python pyresults.py results.db export RUN [outputFilename]
+    $ python pyresults.py results.db
+
+Description:
+    SQLite warehouse for the probe outcomes of pyschar and pycreate, for the
+    questions the per-run .csv reports cannot answer without grepping hundreds
+    of files ("which builds started rejecting # on owner strings?").
+
+    With --results=results.db the scripts add one row per leaf and special
+    char to the database (next to their usual report): the run, the module
+    and leaf, the char, the phase (set for pyschar, create/post-create for
+    pycreate), the tier (0 when the plain char was taken, 1 and 2 when the
+    'a'-prefixed or sandwiched format was, 3 when none was) and how long the
+    probe took.  The probes of pyschar --corpus, which are not punctuation
+    chars and have no tiers, go to a table of their own with the corpus
+    class, the probe label, whether the agent took the value and whether it
+    was expected to.  Every run is stamped with the script, agent and firmware, the
+    agent's sysDescr.0 unless --firmware=label is given.  Rows are inserted in
+    batched transactions of BATCH_ROWS rows.
+
+    The same transactions keep two small rollups up to date, per firmware and
+    per month, with one row per module/leaf/char/phase.  The canned queries
+    other than runs and slowest read those, so a year of nightly runs comes
+    back in milliseconds instead of joining millions of outcomes to their runs.
+
+    Run on its own, it runs one of the canned queries below and prints the
+    rows tab separated, or exports one run as the report the script wrote.
+    Without a query it lists the queries.
+
+Queries:
+    runs                                    the runs, latest first
+    first-rejected --char=C [--leaf=PATTERN]
+        per leaf, the firmware builds in which char is rejected, earliest first
+    trend --char=C [--leaf=PATTERN]         per month, leaves taking and rejecting char
+    firmware-diff --old=FW --new=FW         the leaf/char outcomes that changed between two builds
+    slowest [--limit=N]                     leaves with the highest average probe time
+    corpus [--leaf=PATTERN]
+        per leaf, the --corpus probes that went against expectation, per firmware
+    PATTERN is an SQL LIKE pattern on the leaf name, e.g. --leaf=%Owner%
+
+Parameters:
+    results.db:     the database the scripts wrote with --results
+    RUN:            run id, see the runs query
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import sqlite3
+import time
+import csv
+import sys
+
+
+#rows buffered before they are inserted in one transaction
+BATCH_ROWS = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    script TEXT NOT NULL,
+    agent TEXT,
+    firmware TEXT,
+    argv TEXT
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    module TEXT NOT NULL,
+    leaf TEXT NOT NULL,
+    char TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    tier INTEGER NOT NULL,
+    latency REAL
+);
+CREATE TABLE IF NOT EXISTS corpusOutcomes (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    module TEXT NOT NULL,
+    leaf TEXT NOT NULL,
+    class TEXT NOT NULL,
+    probe TEXT NOT NULL,
+    accepted INTEGER NOT NULL,
+    expected INTEGER NOT NULL,
+    latency REAL
+);
+CREATE TABLE IF NOT EXISTS firmwareOutcomes (
+    firmware TEXT NOT NULL,
+    module TEXT NOT NULL,
+    leaf TEXT NOT NULL,
+    char TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    tier INTEGER NOT NULL DEFAULT 0,
+    probes INTEGER NOT NULL DEFAULT 0,
+    rejections INTEGER NOT NULL DEFAULT 0,
+    firstRejected REAL,
+    PRIMARY KEY (firmware, module, leaf, char, phase)
+);
+CREATE TABLE IF NOT EXISTS monthlyOutcomes (
+    month TEXT NOT NULL,
+    module TEXT NOT NULL,
+    leaf TEXT NOT NULL,
+    char TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    taking INTEGER NOT NULL DEFAULT 0,
+    rejecting INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, module, leaf, char, phase)
+);
+CREATE INDEX IF NOT EXISTS outcomesLeaf ON outcomes (leaf, char, tier);
+CREATE INDEX IF NOT EXISTS outcomesRun ON outcomes (run);
+CREATE INDEX IF NOT EXISTS corpusOutcomesLeaf ON corpusOutcomes (leaf, probe);
+CREATE INDEX IF NOT EXISTS runsFirmware ON runs (firmware, started);
+CREATE INDEX IF NOT EXISTS runsStarted ON runs (started);
+CREATE INDEX IF NOT EXISTS firmwareOutcomesLeaf ON firmwareOutcomes (char, leaf, tier);
+CREATE INDEX IF NOT EXISTS monthlyOutcomesChar ON monthlyOutcomes (char, leaf);
+'''
+
+#the rollups are kept with INSERT OR IGNORE + UPDATE rather than an upsert,
+#which older SQLite libraries linked into Python 2.7 do not have
+ROLLUP_STATEMENTS = [
+    '''INSERT OR IGNORE INTO firmwareOutcomes (firmware, module, leaf, char, phase)
+       VALUES (:firmware, :module, :leaf, :char, :phase)''',
+    '''UPDATE firmwareOutcomes SET tier = MAX(tier, :tier), probes = probes + 1,
+           rejections = rejections + (:tier = 3),
+           firstRejected = CASE WHEN :tier = 3 AND firstRejected IS NULL THEN :started
+                                ELSE firstRejected END
+       WHERE firmware = :firmware AND module = :module AND leaf = :leaf AND char = :char
+           AND phase = :phase''',
+    '''INSERT OR IGNORE INTO monthlyOutcomes (month, module, leaf, char, phase)
+       VALUES (:month, :module, :leaf, :char, :phase)''',
+    '''UPDATE monthlyOutcomes SET taking = taking + (:tier < 3), rejecting = rejecting + (:tier = 3)
+       WHERE month = :month AND module = :module AND leaf = :leaf AND char = :char
+           AND phase = :phase''',
+]
+
+#name: (parameters and their defaults, SQL)
+QUERIES = OrderedDict([
+    ('runs', ({'limit': 50}, '''
+        SELECT runs.id, datetime(runs.started, 'unixepoch', 'localtime') AS started, script, agent,
+               firmware, COUNT(outcomes.run) AS outcomes
+        FROM runs LEFT JOIN outcomes ON outcomes.run = runs.id
+        GROUP BY runs.id ORDER BY runs.started DESC LIMIT :limit''')),
+    ('first-rejected', ({'char': None, 'leaf': '%'}, '''
+        SELECT module, leaf, firmware, datetime(MIN(firstRejected), 'unixepoch', 'localtime') AS firstSeen,
+               SUM(rejections) AS rejections
+        FROM firmwareOutcomes
+        WHERE char = :char AND leaf LIKE :leaf AND tier = 3
+        GROUP BY module, leaf, firmware
+        ORDER BY module, leaf, MIN(firstRejected)''')),
+    ('trend', ({'char': None, 'leaf': '%'}, '''
+        SELECT month,
+               COUNT(DISTINCT CASE WHEN taking > 0 THEN module || '::' || leaf END) AS taking,
+               COUNT(DISTINCT CASE WHEN rejecting > 0 THEN module || '::' || leaf END) AS rejecting
+        FROM monthlyOutcomes
+        WHERE char = :char AND leaf LIKE :leaf
+        GROUP BY month ORDER BY month''')),
+    ('firmware-diff', ({'old': None, 'new': None}, '''
+        SELECT old.module, old.leaf, old.char, old.phase, old.tier AS oldTier, new.tier AS newTier
+        FROM firmwareOutcomes AS old JOIN firmwareOutcomes AS new
+            ON new.firmware = :new AND new.module = old.module AND new.leaf = old.leaf
+            AND new.char = old.char AND new.phase = old.phase
+        WHERE old.firmware = :old AND old.tier != new.tier
+        ORDER BY old.module, old.leaf, old.phase, old.char''')),
+    ('slowest', ({'limit': 20}, '''
+        SELECT module, leaf, phase, COUNT(*) AS probes, ROUND(AVG(latency), 3) AS averageLatency
+        FROM outcomes GROUP BY module, leaf, phase
+        ORDER BY AVG(latency) DESC LIMIT :limit''')),
+    ('corpus', ({'leaf': '%'}, '''
+        SELECT module, leaf, class, probe, firmware,
+               CASE WHEN accepted THEN 'accepted' ELSE 'rejected' END AS outcome, COUNT(*) AS probes
+        FROM corpusOutcomes JOIN runs ON runs.id = corpusOutcomes.run
+        WHERE leaf LIKE :leaf AND accepted != expected
+        GROUP BY module, leaf, class, probe, firmware, accepted
+        ORDER BY module, leaf, class, probe, MIN(runs.started)''')),
+])
+
+
+def tierGet(char, returnChar):
+    '''
+    the tier of a charSetTry()-style result: False or '' for the plain char,
+    otherwise char followed by the number of formats that failed
+    '''
+    if not returnChar:
+        return 0
+    return int(returnChar[len(char):])
+
+
+class ResultsStore(object):
+    '''
+    --results: the outcomes of one run, buffered and inserted BATCH_ROWS at a
+    time.  The run row is only written with the first outcome, runInfoGet()
+    is called then for the (agent, firmware) of the run so nothing is asked
+    of the agent by runs that record nothing.
+    '''
+    instance = None
+
+    def __init__(self, databaseFilename, script, argv, runInfoGet):
+        self.connection = databaseOpen(databaseFilename)
+        self.databaseFilename = databaseFilename
+        self.script = script
+        self.argv = argv
+        self.runInfoGet = runInfoGet
+        self.run = None
+        self.pending = []
+        self.pendingCorpus = []
+
+    def runGet(self):
+        if self.run is None:
+            agent, firmware = self.runInfoGet()
+            started = time.time()
+            with self.connection:
+                cursor = self.connection.execute(
+                    'INSERT INTO runs (started, script, agent, firmware, argv) VALUES (?, ?, ?, ?, ?)',
+                    (started, self.script, agent, firmware, ' '.join(self.argv)))
+            self.run = {'run': cursor.lastrowid, 'started': started, 'firmware': firmware,
+                        'month': time.strftime('%Y-%m', time.localtime(started))}
+        return self.run
+
+    def outcomeAdd(self, obj, char, phase, tier, latency):
+        module, sep, leaf = obj.partition('::')
+        outcome = dict(self.runGet(), module=module, char=char, phase=phase, tier=tier, latency=latency,
+                       leaf=leaf.split('.')[0])  #pycreate leaves carry their instance index
+        self.pending.append(outcome)
+        if len(self.pending) + len(self.pendingCorpus) >= BATCH_ROWS:
+            self.flush()
+
+    def corpusOutcomeAdd(self, obj, corpusName, label, accepted, expected, latency):
+        module, sep, leaf = obj.partition('::')
+        outcome = dict(self.runGet(), module=module, leaf=leaf, corpusName=corpusName, label=label,
+                       accepted=int(accepted), expected=int(expected), latency=latency)
+        self.pendingCorpus.append(outcome)
+        if len(self.pending) + len(self.pendingCorpus) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.pending or self.pendingCorpus:
+            with self.connection:
+                self.connection.executemany(
+                    '''INSERT INTO outcomes VALUES (:run, :module, :leaf, :char, :phase, :tier, :latency)''',
+                    self.pending)
+                for statement in ROLLUP_STATEMENTS:
+                    self.connection.executemany(statement, self.pending)
+                self.connection.executemany(
+                    '''INSERT INTO corpusOutcomes VALUES (:run, :module, :leaf, :corpusName, :label,
+                           :accepted, :expected, :latency)''',
+                    self.pendingCorpus)
+            self.pending = []
+            self.pendingCorpus = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+def databaseOpen(databaseFilename):
+    connection = sqlite3.connect(databaseFilename)
+    #the daemon and a query can have the database open at the same time
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def outcomeRecord(obj, char, phase, returnChar, latency):
+    '''
+    adds one probe outcome to the --results database, does nothing without --results
+    '''
+    if ResultsStore.instance:
+        ResultsStore.instance.outcomeAdd(obj, char, phase, tierGet(char, returnChar), latency)
+
+
+def corpusOutcomeRecord(obj, corpusName, label, accepted, expected, latency):
+    '''
+    adds one pyschar --corpus probe outcome to the --results database, does
+    nothing without --results
+    '''
+    if ResultsStore.instance:
+        ResultsStore.instance.corpusOutcomeAdd(obj, corpusName, label, accepted, expected, latency)
+
+
+def probedLeavesGet(connection, firmware, phase):
+    '''
+    the 'MODULE::leaf' names with phase outcomes for a firmware build, from
+    the firmware rollup
+    '''
+    return set('%s::%s' % row for row in connection.execute(
+        'SELECT DISTINCT module, leaf FROM firmwareOutcomes WHERE firmware = ? AND phase = ?',
+        (firmware, phase)))
+
+
+def queryRun(connection, name, options):
+    '''
+    returns (column names, rows) of a canned query, options give its parameters
+    '''
+    defaults, sql = QUERIES[name]
+    parameters = {}
+    for parameter, default in defaults.items():
+        value = options.get(parameter, default)
+        if value is None or value is True:
+            raise ValueError('%s needs --%s=value' % (name, parameter))
+        parameters[parameter] = value
+    cursor = connection.execute(sql, parameters)
+    return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def runExport(connection, runId, out):
+    '''
+    writes a run back out as the report its script wrote, one line per leaf
+    with the chars that were not taken as-is (char followed by the tier)
+    '''
+    script = connection.execute('SELECT script FROM runs WHERE id = ?', (runId,)).fetchone()
+    if script is None:
+        raise ValueError('no run %s' % runId)
+    phases = ['set'] if script[0] != 'pycreate' else ['create', 'post-create']
+
+    leaves = OrderedDict()
+    for module, leaf, char, phase, tier in connection.execute(
+            'SELECT module, leaf, char, phase, tier FROM outcomes WHERE run = ? ORDER BY rowid', (runId,)):
+        disallowed = leaves.setdefault('%s::%s' % (module, leaf), dict((name, []) for name in phases))
+        if tier:
+            disallowed.setdefault(phase, []).append('%s%d' % (char, tier))
+
+    if script[0] == 'pycreate':
+        fieldnames = ['MODULE::leafName', 'disallowed-chars(CREATE)', 'disallowed-chars(POST-CREATE)']
+    else:
+        fieldnames = ['MODULE::leafName', 'disallowed-chars']
+    writer = csv.writer(out, dialect='singlequote')
+    writer.writerow(fieldnames)
+    for name, disallowed in leaves.items():
+        if script[0] == 'pycreate':
+            writer.writerow([name] + [' '.join(disallowed[phase]) or 'None' for phase in phases])
+        else:
+            writer.writerow([name, ' '.join(disallowed['set']) or None])
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    import pytransport
+
+    usage = '''Usage: $ python pyresults.py results.db [queryName [--name=value ...] | export RUN [outputFilename]]'''
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if len(args) < 2:
+        print("ERROR: missing required argument\n%s" % usage)
+        sys.exit()
+
+    csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True,
+                         quoting=csv.QUOTE_MINIMAL, quotechar="'")
+    connection = databaseOpen(args[1])
+
+    if len(args) == 2:
+        for name, (defaults, sql) in QUERIES.items():
+            print('%-16s %s' % (name, ' '.join('--%s' % parameter for parameter in defaults)))
+        sys.exit()
+
+    try:
+        if args[2] == 'export':
+            if len(args) < 4:
+                print("ERROR: missing required argument\n%s" % usage)
+                sys.exit()
+            out = open(args[4], 'w') if len(args) > 4 else sys.stdout
+            runExport(connection, int(args[3]), out)
+            if out is not sys.stdout:
+                out.close()
+                print('done. output written to ' + args[4])
+        elif args[2] in QUERIES:
+            start = time.time()
+            columns, rows = queryRun(connection, args[2], options)
+            writer = csv.writer(sys.stdout, dialect='singlequote')
+            writer.writerow(columns)
+            writer.writerows(rows)
+            print('%d rows in %.1fms' % (len(rows), (time.time() - start) * 1000), file=sys.stderr)
+        else:
+            print("ERROR: unknown query %s\n%s" % (args[2], usage))
+            sys.exit()
+    except (ValueError, IOError, sqlite3.Error) as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
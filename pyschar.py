@@ -4,7 +4,8 @@
 pyschar.py
 
 Usage:
-    $ python pyschar.py [agent-IPv4] [outputFilename]
+    $ python pyschar.py [agent-IPv4] [outputFilename] [options]
+    $ python pyschar.py [agent-IPv4] [outputFilename] --inventory=rootOids.csv [options]
     
 
 Description:
@@ -21,20 +22,109 @@ Parameters:
         the IP address of the SNMP manager agent.
     outputFilename:
         filename of the output .csv to write the special char report to.
+
+Options:
+    --port=N:
+        UDP port of the SNMP agent, default 161.
+    --record=traceFile:
+        save every net-SNMP command with its exit code and output to traceFile.
+    --replay=traceFile:
+        answer the net-SNMP commands from a recorded traceFile, no agent needed.
+    --numeric[=oidmap.json]:
+        send numeric OIDs with MIB loading turned off, see pyresolve.py.
+    --v3-user=name [--v3-auth=MD5|SHA:password] [--v3-priv=DES|AES:password]:
+        SNMPv3 instead of v2c, see pytransport.py.
+    --daemon[=socketFile]:
+        run in a pyprobed.py daemon instead, see pyprobed.py.
+    --profile[=file.pstats]:
+        cProfile stats plus a Python CPU / child CPU / network wait breakdown
+        of the run, see pytransport.py.
+    --timeline=file.json:
+        every SNMP operation as a Chrome trace-event span for chrome://tracing
+        or Perfetto, see pytransport.py.
+    --progress[=SECONDS]:
+        progress of the leaf/char probes with the command rate, latency and
+        an ETA, a status line on a terminal or a line every SECONDS in a log,
+        see pytransport.py.
+    --results=results.db [--firmware=label]:
+        also add every leaf/char outcome to an SQLite database for queries
+        across runs and firmware builds, see pyresults.py.
+    --speculative:
+        send the three formats of each special char (see charPrefix() and
+        charSandwich()) at the same time and keep the first one that worked.
+    --verify:
+        read the accepted values back in batched GETs and add the chars that
+        came back different to the report as an accepted-but-mangled column.
+        The leaves are exercised char by char instead of leaf by leaf, and
+        --speculative is ignored so the value left on each leaf is known.
+    --length-probe:
+        also find the longest string each leaf accepts (see maxLengthProbe())
+        and add it to the report as a max-length column.
+    --corpus[=utf8,control,whitespace,lengths]:
+        also probe each leaf with the extended corpus of pycorpus.py (all of
+        its classes, or the listed ones): multibyte UTF-8, control bytes,
+        leading/trailing whitespace and multibyte strings at the SIZE limit.
+        Each probe is one set of raw bytes, a class stops as soon as its first
+        few probes are all rejected (see pycorpus.classProbe()), probes longer
+        than the SIZE maximum are left out but for the lengths ones, which a
+        conforming agent rejects.  The probes that went against expectation,
+        rejected or taken over SIZE ('+split-at-max'), go to the report as an
+        extended-disallowed column, and every probe to the corpus outcomes of
+        --results.
+    --inventory=rootOids.csv [--native[=mibDirectory]]:
+        probe the writable string leaves under the root OIDs of a pyoids.py
+        .csv instead of the pyschar.conf leaves.  pyoids.leavesIterate()
+        finds them one at a time and each one is probed as soon as it is
+        found, so the first rows come in seconds and there is no
+        mibLeaves.csv or pyschar.conf to write in between.  The leaves
+        without an instance on the agent are skipped, the --progress total
+        grows as the leaves are found.  --native as in pyoids.py.
+    --include=PATTERN,... --exclude=PATTERN,...:
+        with --inventory, only the leaves --include matches and --exclude
+        does not, shell patterns on the module (WWP-LEOS-*) or on
+        MODULE::leafName (*::*Password*), see pyoids.py.
+    --skip-probed:
+        with --inventory and --results, skip the leaves the --results
+        database already has set outcomes for on the firmware of the agent,
+        so an interrupted or extended inventory run only probes what is new.
     
 Author:
     Jeremy Mattfeld, jmattfel@ciena.com
 ==================================================================================="""
 
-from subprocess import Popen, PIPE, check_output, check_call, CalledProcessError, STDOUT
+from subprocess import CalledProcessError, STDOUT
 from collections import OrderedDict
-import json
 import IPy
 import string
 import re
+import time
 import csv
 import sys
 
+import pyber
+import pycorpus
+import pymatrix
+import pymibparse
+import pyoids
+import pyoidtree
+import pyresults
+import pytransport
+
+
+#string leaves without a SIZE clause are probed as DisplayStrings
+DEFAULT_MAX_LENGTH = 255
+#how far past the MIB maximum the length probe keeps looking
+PROBE_LENGTH_CEILING = 4096
+
+#OIDs of the leaves probed so far, splits instance OIDs into leaf and index
+objectTree = pyoidtree.OidTree()
+
+#'MODULE::leaf': OID, from --inventory or from the first snmptranslate of the leaf
+leafOids = {}
+
+#results of the special char sets, only turned into report strings when written
+resultMatrix = pymatrix.ResultMatrix()
+
 
 class Callonce(object):
 # this is a decorator for functions we only want to execute once
@@ -58,25 +148,30 @@ def csvHeaderWrite(writer, fieldnames, out):
 
 
 def instanceIndexGet(agentIp, obj):
-    oid = check_output(['snmptranslate -On %s 2>/dev/null' %obj], shell=True)
-    oid = oid.rstrip('\n')
-    oidPlus = check_output(["snmpgetnext -v 2c -c public -Onq %s %s 2>/dev/null" % (agentIp, obj)],
-                                shell=True)
+    oid = leafOids.get(obj)
+    if oid is None:
+        oid = pytransport.snmpRun('snmptranslate -On %s 2>/dev/null' %obj).rstrip('\n')
+        leafOids[obj] = oid
+    objectTree.insert(oid, obj)
+    oidPlus = pytransport.snmpRun("snmpgetnext -v 2c -c public -Onq %s %s 2>/dev/null" % (agentIp, obj))
     pattern = r'(.\d+)+'
     match = re.match(pattern, oidPlus)
+    if match is None:
+        raise ValueError('no instance of %s found on %s' % (obj, agentIp))
     oidWithIndex = match.group(0)
 
-    index = oidWithIndex.split(oid)[1]
+    #the getnext may have walked past obj (no instances), into another leaf
+    node, index = objectTree.longestPrefixMatch(oidWithIndex)
+    if node is None or node.name != obj:
+        raise ValueError('no instance of %s found on %s' % (obj, agentIp))
 
-    return index
+    return pyber.oidFormat(index)
 
 
 def expectedStringLengthGet(obj):
-    p1 = Popen(["snmptranslate -Td %s" %obj], stderr=STDOUT, shell=True, stdout=PIPE)
-    p2 = Popen(["grep 'SYNTAX'"], shell=True, stdin=p1.stdout, stdout=PIPE)
-    p1.stdout.close()
-
-    output = p2.communicate()[0]
+    output = pytransport.snmpRun("snmptranslate -Td %s" %obj, stderr=STDOUT, check=False)
+    #keep only the SYNTAX line(s), like the old "| grep 'SYNTAX'" did
+    output = ''.join(line for line in output.splitlines(True) if 'SYNTAX' in line)
     truncOutput = output.split('..')[0]
     if '|' in truncOutput:
         minStringLength = truncOutput.split('|')[1]
@@ -86,6 +181,46 @@ def expectedStringLengthGet(obj):
     return int(minStringLength)
 
 
+def stringSizeRangeGet(obj):
+    '''
+    Returns the (minimum, maximum) SIZE of a string leaf from its MIB SYNTAX,
+    e.g. "OCTET STRING (0 | 8..32)" gives (0, 32).  Leaves without a SIZE
+    clause get the DisplayString range.
+    '''
+    output = pytransport.snmpRun("snmptranslate -Td %s" %obj, stderr=STDOUT, check=False)
+    syntax = ''.join(line for line in output.splitlines(True) if 'SYNTAX' in line)
+
+    bounds = [int(bound) for bound in re.findall(r'(\d+)', syntax.split('(', 1)[-1])]
+    if '(' not in syntax or not bounds:
+        return (0, DEFAULT_MAX_LENGTH)
+
+    return (min(bounds), max(bounds))
+
+
+def lengthAccepted(ip, obj, inst, length):
+    '''
+    one snmpset of a string of length 'a' chars, True if the agent took it
+    '''
+    cmd = "snmpset -v 2c -c private %s %s%s s '%s' 2>/dev/null" % (ip, obj, inst, 'a' * length)
+    try:
+        pytransport.snmpRun(cmd, stderr=STDOUT)
+    except CalledProcessError:
+        return False
+    return True
+
+
+def maxLengthProbe(ip, obj, inst):
+    '''
+    Finds the longest string the agent really accepts on this leaf, searching
+    around the MIB SIZE range with pycorpus.maxLengthSearch().  Returns a
+    string for the report: "32", "300 (MIB 255)", ">=4096 (MIB 255)" or
+    "none" when not even the minimum length was accepted.
+    '''
+    sizeMin, sizeMax = stringSizeRangeGet(obj)
+    return pycorpus.maxLengthSearch(lambda length: lengthAccepted(ip, obj, inst, length),
+                                    sizeMin, sizeMax, PROBE_LENGTH_CEILING)
+
+
 def charPrefix(cmd, char):
     '''
     some special chars will not be allowed if they are alone or at the beginning of a string (test 1)
@@ -120,76 +255,218 @@ def charSandwich(cmd, char):
     return newCmd
 
 
-def snmpSetHandler(ip, obj):
-    
-    failedChars = []
+def charSetTry(ip, obj, inst, char):
+    '''
+    Tries one special char on one leaf with up to three formats.
 
-    inst = instanceIndexGet(ip, obj)
+    Returns (returnChar, acceptedCmd):
+        returnChar:     False if the plain char was taken, otherwise the char
+                        followed by the number of formats that failed ("#1").
+        acceptedCmd:    the snmpset command that worked, None if none did.
+    '''
+    returnChar = False
+    acceptedCmd = None
+
+    #get the expected string length
+    minStringLength = expectedStringLengthGet(obj)
+    if minStringLength > 1:
+        #setValue = char * minStringLength
+        setValue = char * 8
+    else:
+        setValue = char
 
-    for index in range(len(string.punctuation)):
-        returnChar = False
-        char = string.punctuation[index]
-        #get the expected string length
-        minStringLength = expectedStringLengthGet(obj)
-        if minStringLength > 1:
-            #setValue = char * minStringLength
-            setValue = char * 8
-        else:
-            setValue = char
-
-        #single/double quote handling
-        if char == "'":
-            setArgs = ' %s%s s "%s"' % (obj, inst, setValue)
-        else:
-            setArgs = " %s%s s '%s'" % (obj, inst, setValue)
-        
-        cmd = 'snmpset -v 2c -c private %s %s 2>/dev/null' %(ip, setArgs)
-
-        '''
-        the nested exception handling here will try setting each char using
-        different formats until we get a successful snmpset packet or we tried
-        all three formats without success.  See docstrings on charPrefix() and
-        charSandwich() for more info
-        '''
-        #print(cmd)
+    #single/double quote handling
+    if char == "'":
+        setArgs = ' %s%s s "%s"' % (obj, inst, setValue)
+    else:
+        setArgs = " %s%s s '%s'" % (obj, inst, setValue)
+    
+    cmd = 'snmpset -v 2c -c private %s %s 2>/dev/null' %(ip, setArgs)
+    tierCmds = [cmd, charPrefix(cmd, char), charSandwich(cmd, char)]
+
+    #--verify needs to know which format is left on the leaf, so no racing then
+    if pytransport.options.get('speculative') and not pytransport.options.get('verify'):
+        #all three formats at once, the leaf already exists so they do not interfere
+        tier = pytransport.tiersRun(tierCmds)
+        if tier is None:
+            return char + "3", None
+        elif tier > 0:
+            return char + str(tier), tierCmds[tier]
+        return False, cmd
+
+    '''
+    the nested exception handling here will try setting each char using
+    different formats until we get a successful snmpset packet or we tried
+    all three formats without success.  See docstrings on charPrefix() and
+    charSandwich() for more info
+    '''
+    #print(cmd)
+    try:
+        output = pytransport.snmpRun(cmd, stderr=STDOUT)
+        acceptedCmd = cmd
+        #print(output)
+    except CalledProcessError:
+        returnChar = char + "1"
+        preCmd = tierCmds[1]
+        #print(preCmd)
         try:
-            output = check_output(cmd, stderr=STDOUT, shell=True)
+            output = pytransport.snmpRun(preCmd, stderr=STDOUT)
+            acceptedCmd = preCmd
             #print(output)
         except CalledProcessError:
-            returnChar = char + "1"
-            preCmd = charPrefix(cmd, char)
-            #print(preCmd)
+            returnChar = char + "2"
+            swCmd = tierCmds[2]
+            #print(swCmd)
             try:
-                output = check_output(preCmd, stderr=STDOUT, shell=True)
+                output = pytransport.snmpRun(swCmd, stderr=STDOUT)
+                acceptedCmd = swCmd
                 #print(output)
             except CalledProcessError:
-                returnChar = char + "2"
-                swCmd = charSandwich(cmd, char)
-                #print(swCmd)
-                try:
-                    output = check_output(swCmd, stderr=STDOUT, shell=True)
-                    #print(output)
-                except CalledProcessError:
-                    returnChar = char + "3"
-
-        if returnChar:
-            failedChars.append(returnChar)
-
-    if not failedChars:
+                returnChar = char + "3"
+
+    return returnChar, acceptedCmd
+
+
+def bytesSetTry(ip, obj, inst, value):
+    '''
+    one snmpset of raw bytes (hex, 'x' type) on the leaf, True if the agent took it
+    '''
+    cmd = "snmpset -v 2c -c private %s %s%s x '%s' 2>/dev/null" % (ip, obj, inst, pycorpus.hexFormat(value))
+    try:
+        pytransport.snmpRun(cmd, stderr=STDOUT)
+    except CalledProcessError:
+        return False
+    return True
+
+
+def corpusSetHandler(ip, obj, inst, classes):
+    '''
+    Probes the leaf with the extended corpus classes, each one only until it
+    is conclusive.  Returns the probes that went against expectation per
+    class for the report, None if there were none.
+    '''
+    sizeMin, sizeMax = stringSizeRangeGet(obj)
+
+    summaries = []
+    for corpus in classes:
+        def probe(label, value, expected, corpusName=corpus.name):
+            start = time.time()
+            with pytransport.operation('probe', obj, label):
+                accepted = bytesSetTry(ip, obj, inst, value)
+            pyresults.corpusOutcomeRecord(obj, corpusName, label, accepted, expected, time.time() - start)
+            return accepted
+
+        unexpected, probed, conclusive = pycorpus.classProbe(corpus, sizeMin, sizeMax, probe)
+        summary = pycorpus.classSummaryGet(corpus, unexpected, probed, conclusive)
+        if summary:
+            summaries.append(summary)
+
+    if not summaries:
         return None
-    else:
-        return string.join(failedChars)
+    return string.join(summaries)
+
 
+def snmpSetHandler(ip, obj, inst):
 
-def specialCharReportSingleLineWrite(moduleAndLeaf, chars, out):
+    for index in range(len(string.punctuation)):
+        char = string.punctuation[index]
+        start = time.time()
+        with pytransport.operation('probe', obj, char):
+            returnChar, acceptedCmd = charSetTry(ip, obj, inst, char)
+        pyresults.outcomeRecord(obj, char, 'set', returnChar, time.time() - start)
+        resultMatrix.record(obj, 'set', char, returnChar)
+        pytransport.progressAdvance(1, obj)
+
+    return pymatrix.cellFormat(resultMatrix.tokensGet(obj, 'set'), 'disallowed-chars')
+
+
+def snmpSetHandlerVerified(ip, insts):
+    '''
+    Same sets as snmpSetHandler() but char by char across all of the leaves
+    instead of leaf by leaf.  After every char the values the agent accepted
+    are read back with a few multi-varbind GETs (pytransport.snmpGetBatch())
+    while they are still on the leaves, which costs a small fraction of one
+    snmpget per probe.
+
+    insts are the leaves and their instance suffix, in probe order.  Returns
+    a dictionary of obj: (disallowedChars, mangledChars) where mangledChars
+    are the chars the agent took but read back differently (truncated,
+    transcoded...).
+    '''
+    mangledChars = dict((obj, []) for obj in insts)
+
+    for index in range(len(string.punctuation)):
+        char = string.punctuation[index]
+        written = []
+        for obj, inst in insts.items():
+            start = time.time()
+            with pytransport.operation('probe', obj, char):
+                returnChar, acceptedCmd = charSetTry(ip, obj, inst, char)
+            pyresults.outcomeRecord(obj, char, 'set', returnChar, time.time() - start)
+            resultMatrix.record(obj, 'set', char, returnChar)
+            pytransport.progressAdvance(1, obj)
+            if acceptedCmd:
+                written.append((obj, pytransport.setValueGet(acceptedCmd, obj + inst)))
+
+        with pytransport.operation('read-back', char=char):
+            readBack = pytransport.snmpGetBatch(ip, [obj + insts[obj] for obj, value in written])
+        for (obj, value), printed in zip(written, readBack):
+            if printed is None or pytransport.hexStringDecode(printed) != value:
+                mangledChars[obj].append(char)
+
+    results = {}
+    for obj in insts:
+        results[obj] = (pymatrix.cellFormat(resultMatrix.tokensGet(obj, 'set'), 'disallowed-chars'),
+                        string.join(mangledChars[obj]) if mangledChars[obj] else None)
+    return results
+
+
+def inventoryLeavesIterate(entries, index, options):
+    '''
+    --inventory: yields the 'MODULE::leaf' names of the writable string leaves
+    under the root OIDs of a pyoids.py .csv as pyoids finds them (see
+    pyoids.leavesIterate()), without the leaves --skip-probed finds in the
+    --results database for the firmware of the agent
+    '''
+    probed = set()
+    if options.get('skip-probed'):
+        firmware = pytransport.runInfoGet()[1]
+        probed = pyresults.probedLeavesGet(pyresults.ResultsStore.instance.connection, firmware, 'set')
+        print('%d leaves already probed on %s' % (len(probed), firmware))
+
+    for access, module, leafName, oid in pyoids.leavesIterate(entries, index, options.get('include'),
+                                                              options.get('exclude')):
+        obj = module + "::" + leafName
+        if obj in probed:
+            continue
+        if oid:
+            leafOids[obj] = oid
+        yield obj
+
+
+def specialCharReportSingleLineWrite(moduleAndLeaf, chars, out, maxLength=None, mangledChars=None,
+                                     extendedChars=None):
 
     # initialize csv dictwriter
     fieldnames = ['MODULE::leafName', 'disallowed-chars']
+    if pytransport.options.get('length-probe'):
+        fieldnames.append('max-length')
+    if pytransport.options.get('verify'):
+        fieldnames.append('accepted-but-mangled')
+    if pytransport.options.get('corpus'):
+        fieldnames.append('extended-disallowed')
     writer = csv.DictWriter(out, fieldnames=fieldnames, dialect='singlequote') 
     csvHeaderWrite(writer, fieldnames, out)
 
     # write the csv line
-    writer.writerow({'MODULE::leafName':moduleAndLeaf, 'disallowed-chars':chars})
+    row = {'MODULE::leafName':moduleAndLeaf, 'disallowed-chars':chars}
+    if pytransport.options.get('length-probe'):
+        row['max-length'] = maxLength
+    if pytransport.options.get('verify'):
+        row['accepted-but-mangled'] = mangledChars
+    if pytransport.options.get('corpus'):
+        row['extended-disallowed'] = extendedChars
+    writer.writerow(row)
 
     return
     
@@ -200,60 +477,132 @@ def specialCharReportSingleLineWrite(moduleAndLeaf, chars, out):
 
 #csv writer definitions
 csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True, quoting=csv.QUOTE_MINIMAL, quotechar="'")
-usage = '''$ python pyschar.py [agent-IPv4] [outputFilename]'''
+usage = '''$ python pyschar.py [agent-IPv4] [outputFilename] [options]'''
+#with --daemon the run happens in a pyprobed.py daemon, see pytransport.daemonForward()
+returncode = pytransport.daemonForward(sys.argv)
+if returncode is not None:
+    sys.exit(returncode)
+options, args = pytransport.optionsParse(sys.argv)
 
 #command line arguments error checking
-if (len(sys.argv) < 3):
-    if ((len(sys.argv) == 2) and ((sys.argv[1] == '-h') or (sys.argv[1] == '--help'))):
+if (len(args) < 3):
+    if ((len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help'))):
         print(__doc__)
     else:
         print("ERROR: missing required argument")
         print(usage)
     sys.exit()
 
-if (len(sys.argv) > 3):
-    print("ERROR: unexpected argument " + sys.argv[3])
+if (len(args) > 3):
+    print("ERROR: unexpected argument " + args[3])
     print(usage)
     sys.exit()
 
 #check IPv4 address
-agentIp = str(sys.argv[1])
+agentIp = str(args[1])
 try:
     IPy.IP(agentIp)
 except:
     print("ERROR: you must use a valid SNMP-agent IPv4")
     print(usage)
     sys.exit()
+agentIp = pytransport.agentAddress(agentIp)
 
 #report file I/O
-outFilename = str(sys.argv[2])
+outFilename = str(args[2])
 try:
     specialCharReport = open(outFilename, 'w')
 except IOError:
     print("Error: %s cannot be opened for writing." % (outFilename))
     sys.exit()
 
-configFilename = 'pyschar.conf'
-
-print('parsing %s for OIDs...\n' %configFilename)
-
-try:
-    with open(configFilename) as jsonConfigFile:
-        configData = json.load(jsonConfigFile, object_pairs_hook=OrderedDict)
-except IOError:
-    print("Error: could not find file %s" % (configFilename))
-    sys.exit()
-
-for key, val in configData.iteritems():
-    module = key
-    leaves = val
-    for leaf in leaves:
-        obj = module + "::" + leaf
-        print(obj)
-        disallowedChars = snmpSetHandler(agentIp, obj)
-        print('disallowed chars: %s\n' %disallowedChars)
+corpusClasses = []
+if options.get('corpus'):
+    try:
+        corpusClasses = pycorpus.classesGet(options['corpus'])
+    except ValueError as err:
+        print("ERROR: %s" % err)
+        print(usage)
+        sys.exit()
+
+verifiedResults = {}
+#obj: instance suffix of the leaves looked up before the probe loop
+insts = OrderedDict()
+if options.get('inventory'):
+    if options.get('skip-probed') and not options.get('results'):
+        print("ERROR: --skip-probed needs --results")
+        print(usage)
+        sys.exit()
+    print('probing the leaves of %s as they are found...\n' %options['inventory'])
+    try:
+        entries = pyoids.rootOidsRead(str(options['inventory']))
+        index = pyoids.mibIndexGet(options, entries)
+    except (IOError, pymibparse.MibParseError) as err:
+        print("Error: %s" % err)
+        sys.exit()
+    leaves = inventoryLeavesIterate(entries, index, options)
+else:
+    configFilename = 'pyschar.conf'
+
+    print('parsing %s for OIDs...\n' %configFilename)
+
+    try:
+        configData = pytransport.confLoad(configFilename)
+    except IOError:
+        print("Error: could not find file %s" % (configFilename))
+        sys.exit()
+    leaves = [module + "::" + leaf for module, moduleLeaves in configData.iteritems() for leaf in moduleLeaves]
+
+    #one progress unit per special char on a leaf
+    pytransport.progressPlan(len(leaves) * len(string.punctuation))
+
+    #with --verify every leaf is exercised up front, char by char
+    if options.get('verify'):
+        print('exercising special chars on all leaves with read-back...\n')
+        for obj in leaves:
+            insts[obj] = instanceIndexGet(agentIp, obj)
+        verifiedResults = snmpSetHandlerVerified(agentIp, insts)
+
+for obj in leaves:
+    print(obj)
+    if options.get('inventory'):
+        #the inventory lists every writable string column, not only the ones with rows
+        try:
+            inst = instanceIndexGet(agentIp, obj)
+        except (ValueError, CalledProcessError) as err:
+            print('skipped, %s\n' %err)
+            continue
+        #the total grows as the leaves are found
+        pytransport.progressPlan(len(string.punctuation))
+        if options.get('verify'):
+            verifiedResults.update(snmpSetHandlerVerified(agentIp, {obj: inst}))
+    else:
+        #one snmpgetnext per leaf, shared by all of its probes
+        inst = insts[obj] if obj in insts else instanceIndexGet(agentIp, obj)
 
-        specialCharReportSingleLineWrite(obj, disallowedChars, specialCharReport)
+    mangledChars = None
+    if options.get('verify'):
+        disallowedChars, mangledChars = verifiedResults[obj]
+        print('accepted but mangled: %s' %mangledChars)
+    else:
+        disallowedChars = snmpSetHandler(agentIp, obj, inst)
+    print('disallowed chars: %s' %disallowedChars)
+
+    maxLength = None
+    if options.get('length-probe'):
+        with pytransport.operation('length-probe', obj):
+            maxLength = maxLengthProbe(agentIp, obj, inst)
+        print('max length: %s' %maxLength)
+
+    extendedChars = None
+    if corpusClasses:
+        extendedChars = corpusSetHandler(agentIp, obj, inst, corpusClasses)
+        print('extended disallowed: %s' %extendedChars)
+    print('')
+
+    specialCharReportSingleLineWrite(obj, disallowedChars, specialCharReport, maxLength,
+                                     mangledChars, extendedChars)
+    #--inventory runs can be long, the rows are there as soon as the leaf is done
+    specialCharReport.flush()
 
-jsonConfigFile.close()
 specialCharReport.close()
@@ -0,0 +1,246 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyschedule.py
+
+Usage:
+    $ python pyschedule.py [scheduleFile]
+
+Description:
+    deadline-aware ordering of the probe work for --time-budget.  The nightly
+    lab window is fixed and a full pycreate run over every entry does not
+    always fit, so with --time-budget the entries are picked by what they are
+    expected to teach us:
+        1. entries that were never tested,
+        2. entries whose MIB definition changed since they were last tested,
+        3. the rest, the ones tested longest ago first.
+    Within the first two groups the cheapest entries go first, so more of
+    them fit.  The cost of an entry is what it took last time (averaged over
+    the runs), or for a new entry its number of string leaves times the
+    average cost of a string leaf so far.  An entry whose estimate does not
+    fit in what is left of the budget is left for the next window.
+
+    An item is whatever the caller has to run in one go: pycreate gives a
+    create-only entry and the entries that need its row as one item, so
+    they are picked, skipped and done together, always run in conf order,
+    and the parent row is created again whenever its children run.
+
+    Progress is checkpointed to the schedule file after every entry, with
+    the report rows of the entries done so far.  The next run carries on with
+    the entries the last one did not get to and writes the rows it already
+    has to its report first, so the report of the run that finishes a cycle
+    covers the whole conf.  Then a new cycle starts.
+
+    Run on its own, it prints the timings and the state of the cycle kept in
+    scheduleFile.
+
+Parameters:
+    scheduleFile:   schedule file to show (default pycreate.schedule.json)
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import hashlib
+import json
+import time
+import sys
+import os
+import re
+
+
+SCHEDULE_VERSION = 1
+#what a string leaf is guessed to cost before anything was timed
+DEFAULT_UNIT_SECONDS = 60.0
+#weight of the last run in the averaged cost of an entry
+COST_SMOOTHING = 0.5
+
+NEVER_TESTED = 0
+MIB_CHANGED = 1
+TESTED = 2
+PRIORITY_LABELS = {NEVER_TESTED: 'never tested', MIB_CHANGED: 'MIB changed', TESTED: 'tested'}
+
+BUDGET_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([smh]?)$')
+BUDGET_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+
+def budgetParse(text):
+    '''
+    '5400', '90m' or '1.5h' to seconds, raises ValueError for anything else
+    '''
+    match = BUDGET_PATTERN.match(str(text).strip())
+    if match is None:
+        raise ValueError('--time-budget must be seconds or a number followed by s, m or h, not %s' % text)
+    return float(match.group(1)) * BUDGET_UNITS[match.group(2)]
+
+
+def definitionHashGet(definition):
+    return hashlib.sha1(definition).hexdigest()
+
+
+class Scheduler(object):
+    '''
+    Orders the work items of one run and keeps their timings and the
+    checkpoint of the cycle in a JSON schedule file:
+        items:  key: {'seconds', 'units', 'runs', 'lastRun', 'mibHash'}
+        cycle:  {'started', 'done': {key: mibHash}, 'results': {key: rows}}
+    Items are (key, units, mibHash, payload) tuples, units being how much
+    work the item is (string leaves), payload anything the caller needs back.
+    '''
+
+    def __init__(self, scheduleFilename, budget):
+        self.scheduleFilename = scheduleFilename
+        self.budget = budget
+        self.started = time.time()
+        self.state = {'schedule': SCHEDULE_VERSION, 'items': {}, 'cycle': None}
+        try:
+            with open(scheduleFilename) as scheduleFile:
+                state = json.load(scheduleFile)
+            if state.get('schedule') == SCHEDULE_VERSION:
+                self.state = state
+        except IOError:
+            pass
+        #key: (units, mibHash) of the items given to plan(), in their order
+        self.current = OrderedDict()
+
+    def unitSecondsGet(self):
+        timed = [item for item in self.state['items'].values() if item['runs']]
+        units = sum(item['units'] for item in timed)
+        if not units:
+            return DEFAULT_UNIT_SECONDS
+        return sum(item['seconds'] for item in timed) / units
+
+    def estimateGet(self, key, units):
+        item = self.state['items'].get(key)
+        if item and item['runs']:
+            return item['seconds']
+        return self.unitSecondsGet() * units
+
+    def priorityGet(self, key, mibHash):
+        item = self.state['items'].get(key)
+        if not item or not item['runs']:
+            return NEVER_TESTED
+        if item['mibHash'] != mibHash:
+            return MIB_CHANGED
+        return TESTED
+
+    def plan(self, items):
+        '''
+        Returns the items still to do in this cycle in the order they should
+        be run, starting a new cycle when the last one is complete.
+        '''
+        cycle = self.state['cycle']
+        if cycle is None or all(cycle['done'].get(key) == mibHash for key, units, mibHash, payload in items):
+            cycle = self.state['cycle'] = {'started': time.time(), 'done': {}, 'results': {}}
+
+        todo = []
+        for key, units, mibHash, payload in items:
+            self.current[key] = (units, mibHash)
+            if cycle['done'].get(key) == mibHash:
+                continue
+            priority = self.priorityGet(key, mibHash)
+            estimate = self.estimateGet(key, units)
+            lastRun = self.state['items'][key]['lastRun'] if priority == TESTED else 0
+            todo.append(((priority, lastRun, estimate), (key, units, mibHash, payload)))
+        todo.sort(key=lambda entry: entry[0])
+        return [item for order, item in todo]
+
+    def remainingGet(self):
+        return self.budget - (time.time() - self.started)
+
+    def itemsFit(self, planned):
+        '''
+        the planned items itemsIterate() runs when every item takes its estimate
+        '''
+        fitting = []
+        remaining = self.remainingGet()
+        for key, units, mibHash, payload in planned:
+            estimate = self.estimateGet(key, units)
+            if estimate <= remaining:
+                fitting.append((key, units, mibHash, payload))
+                remaining -= estimate
+        return fitting
+
+    def itemsIterate(self, planned):
+        '''
+        yields the payloads of the planned items that still fit in the budget,
+        with the time actually used so far taken into account before each one
+        '''
+        estimates = [self.estimateGet(key, units) for key, units, mibHash, payload in planned]
+        print('%d of %d entries left in this cycle, about %ds of work for a %ds budget' % (
+            len(planned), len(self.current), sum(estimates), self.budget))
+        skipped = 0
+        for (key, units, mibHash, payload), estimate in zip(planned, estimates):
+            if estimate > self.remainingGet():
+                skipped += 1
+                continue
+            print('scheduled %s (%s, about %ds, %ds left)' % (
+                key, PRIORITY_LABELS[self.priorityGet(key, mibHash)], estimate, self.remainingGet()))
+            yield payload
+        if skipped:
+            print('%d entries did not fit in the budget, they are left for the next run' % skipped)
+
+    def itemDone(self, key, seconds, rows):
+        '''
+        records the timing and the report rows of an item and checkpoints
+        '''
+        units, mibHash = self.current[key]
+        item = self.state['items'].setdefault(key, {'seconds': seconds, 'units': units, 'runs': 0,
+                                                     'lastRun': None, 'mibHash': None})
+        if item['runs']:
+            item['seconds'] = COST_SMOOTHING * seconds + (1 - COST_SMOOTHING) * item['seconds']
+        else:
+            item['seconds'] = seconds
+        item['units'] = units
+        item['runs'] += 1
+        item['lastRun'] = time.time()
+        item['mibHash'] = mibHash
+        self.state['cycle']['done'][key] = mibHash
+        self.state['cycle']['results'][key] = rows
+        self.save()
+
+    def resultsGet(self):
+        '''
+        report rows of the items done earlier in this cycle that plan() did
+        not schedule again, in the order of the items given to plan()
+        '''
+        cycle = self.state['cycle']
+        rows = []
+        for key, (units, mibHash) in self.current.items():
+            if cycle['done'].get(key) == mibHash:
+                rows.extend(cycle['results'][key])
+        return rows
+
+    def save(self):
+        #write then rename so a run killed mid-write keeps the last checkpoint
+        temporaryFilename = self.scheduleFilename + '.tmp'
+        with open(temporaryFilename, 'w') as scheduleFile:
+            json.dump(self.state, scheduleFile, indent=4, sort_keys=True)
+        os.rename(temporaryFilename, self.scheduleFilename)
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    if (len(sys.argv) == 2) and ((sys.argv[1] == '-h') or (sys.argv[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+
+    scheduleFilename = sys.argv[1] if len(sys.argv) > 1 else 'pycreate.schedule.json'
+    try:
+        with open(scheduleFilename) as scheduleFile:
+            state = json.load(scheduleFile)
+    except (IOError, ValueError):
+        print("Error: could not read schedule file %s" % (scheduleFilename))
+        sys.exit()
+
+    cycle = state.get('cycle') or {'started': None, 'done': {}}
+    for key in sorted(state['items']):
+        item = state['items'][key]
+        lastRun = time.strftime('%Y-%m-%d %H:%M', time.localtime(item['lastRun'])) if item['lastRun'] else '-'
+        print('%-60s %8.1fs %3d runs  last %s %s' % (key, item['seconds'], item['runs'], lastRun,
+                                                    'done' if key in cycle['done'] else ''))
+    if cycle['started']:
+        print('\ncycle started %s, %d entries done' % (
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(cycle['started'])), len(cycle['done'])))
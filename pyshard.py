@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyshard.py
+
+Description:
+    coordinator/worker execution of the work units of a big conf, for
+    pycreate.py --workers.  The coordinator puts the units on a local
+    multiprocessing manager queue and forks one worker per agent it is given,
+    each worker pinned to its agent pulls units until the queue is empty and
+    sends back what each unit returned.  The same agent can be given more
+    than once to work on independent tables of one switch at the same time,
+    and interchangeable lab switches of one model share the queue, so the run
+    takes about as long as the slowest share of the units.
+
+    Workers are forked from the script, they keep its options and caches but
+    get their own agent and their own --results run (see
+    pytransport.workerStart()).  Units are (key, payload) with payload a
+    tuple of arguments, unitRun(agent, *payload) is called for each one in
+    the worker and its return value must be picklable.
+==================================================================================="""
+
+from __future__ import print_function
+import multiprocessing
+import traceback
+import time
+import sys
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import pytransport
+
+
+#seconds the coordinator waits for a result before checking its workers are still alive
+RESULT_POLL_SECONDS = 1.0
+
+
+def workerRun(ip, units, results, unitRun):
+    '''
+    the loop of one worker process, a None unit is the end of the queue
+    '''
+    agent = pytransport.workerStart(ip)
+    try:
+        while True:
+            unit = units.get()
+            if unit is None:
+                break
+            key, payload = unit
+            start = time.time()
+            try:
+                results.put((key, unitRun(agent, *payload), None, agent, time.time() - start))
+            except Exception:
+                results.put((key, None, traceback.format_exc(), agent, time.time() - start))
+            sys.stdout.flush()
+    finally:
+        pytransport.workerEnd()
+
+
+def shardsRun(agents, units, unitRun):
+    '''
+    Runs the units on one worker per agent in agents and returns
+    {key: return value} of the units that completed.  Units that raised are
+    reported and left out, like the units of a worker that died.
+    '''
+    manager = multiprocessing.Manager()
+    unitQueue = manager.Queue()
+    resultQueue = manager.Queue()
+    for unit in units:
+        unitQueue.put(unit)
+    for ip in agents:
+        unitQueue.put(None)
+
+    #buffered output would be printed again by every worker
+    sys.stdout.flush()
+    sys.stderr.flush()
+    workers = [multiprocessing.Process(target=workerRun, args=(ip, unitQueue, resultQueue, unitRun))
+               for ip in agents]
+    for worker in workers:
+        worker.start()
+
+    results = {}
+    perAgent = {}
+    received = 0
+    while received < len(units):
+        try:
+            key, value, error, agent, elapsed = resultQueue.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            if not [worker for worker in workers if worker.is_alive()]:
+                break
+            continue
+        received += 1
+        done, seconds = perAgent.get(agent, (0, 0.0))
+        perAgent[agent] = (done + 1, seconds + elapsed)
+        pytransport.progressAdvance(1, key)
+        if error:
+            print("ERROR: %s failed on %s\n%s" % (key, agent, error))
+            continue
+        results[key] = value
+        print('%s done on %s in %.1fs, %d of %d units' % (key, agent, elapsed, received, len(units)))
+
+    for worker in workers:
+        worker.join()
+    manager.shutdown()
+
+    if received < len(units):
+        print('ERROR: %d units were lost with their workers' % (len(units) - received))
+    for agent in sorted(perAgent):
+        print('%s: %d units, %.1fs of work' % (agent, perAgent[agent][0], perAgent[agent][1]))
+    return results
@@ -0,0 +1,421 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pysnapshot.py
+
+Usage:
+    $ python pysnapshot.py snapshot [agent-IPv4] [snapshotFile] [--confs=a.conf,b.conf]
+    $ python pysnapshot.py restore [agent-IPv4] [snapshotFile] [--dry-run]
+
+Description:
+    puts a switch back the way it was between test runs without rebooting or
+    reprovisioning it.  pyschar leaves its last special char string on every
+    leaf it exercises (RADIUS keys, xgrade paths, the DNS domain...) and
+    pycreate leaves a row behind on purpose for its post-create sweep.
+
+    snapshot walks the subtrees the conf files touch with snmpbulkwalk, all of
+    them at the same time, and saves every leaf in a small gzipped file:
+    numeric OIDs, net-SNMP set type letters and strings in hex.  Leaf confs
+    (pyschar.conf) give one subtree per leaf, table confs (pycreate.conf,
+    makemeone.conf) one per table entry.
+
+    restore walks the same subtrees again and writes back only what changed:
+        rows that were not there at snapshot time are destroyed (rowStatus
+        destroy(6), the rowStatus being the last object of the conf entry),
+        rows that went away are created again with createAndGo(4) and the conf
+        columns they had, and the leaves whose value differs are set in batched
+        SETs of MAX_SET_VARBINDS varbinds, rowStatus columns last.
+    When the agent refuses a varbind the batch goes again without it (the
+    Failed object of the error) and the leaf is reported as not restored.
+
+    Counters and TimeTicks are not saved, they are never written back.  Leaves
+    the agent reads back empty (write-only keys) look the same before and
+    after a run and cannot be restored this way.
+
+Prerequisites:
+    Net-SNMP suite of command-line tools and the MIB files, or --numeric.
+
+Parameters:
+    agent-IPv4:     the IP address of the SNMP manager agent.
+    snapshotFile:   file to save to or restore from (default snapshot.json.gz)
+
+Options:
+    --confs:    conf files whose subtrees are saved
+                (default pyschar.conf,pycreate.conf,makemeone.conf)
+    --dry-run:  restore prints the SETs it would send instead of sending them
+    --port, --record, --replay, --numeric, --v3-*, --daemon, --profile,
+                --timeline: see pytransport.py
+==================================================================================="""
+
+from __future__ import print_function
+from subprocess import CalledProcessError, STDOUT
+from collections import OrderedDict
+import gzip
+import json
+import time
+import sys
+import re
+import IPy
+
+import pyber
+import pytransport
+
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CONFS = ['pyschar.conf', 'pycreate.conf', 'makemeone.conf']
+DEFAULT_SNAPSHOT = 'snapshot.json.gz'
+
+#varbinds per snmpset and max-repetitions per GETBULK
+MAX_SET_VARBINDS = 24
+BULK_REPETITIONS = 50
+
+#rowStatus values written by restore
+ROW_CREATE_AND_GO = '4'
+ROW_DESTROY = '6'
+
+#printed net-SNMP type (-Ox -Oe -Ot) to the snmpset type letter it is written back with,
+#types not in here (Counter32, Counter64, Timeticks, Opaque...) are not saved
+TYPE_LETTERS = {
+    'INTEGER': 'i',
+    'STRING': 'x',
+    'Hex-STRING': 'x',
+    'BITS': 'x',
+    'OID': 'o',
+    'IpAddress': 'a',
+    'Gauge32': 'u',
+    'Unsigned32': 'u',
+}
+WALK_LINE_PATTERN = re.compile(r'^(\.[\d.]+) = ([\w-]+): ?(.*)$')
+HEX_PATTERN = re.compile(r'^[0-9A-Fa-f]{2}$')
+
+
+def subtreesGet(configFilenames):
+    '''
+    The subtrees touched by the conf files, as an OrderedDict of
+    'MODULE::object' to {'name', 'oid', 'columns', 'rowStatus'}: one per leaf
+    of a leaf conf, one per table entry of a table conf with its conf columns
+    and its rowStatus (the last object).
+    '''
+    subtrees = OrderedDict()
+    for configFilename in configFilenames:
+        configData = pytransport.confLoad(configFilename)
+        for module, children in configData.items():
+            if isinstance(children, list):
+                for leaf in children:
+                    name = '%s::%s' % (module, leaf)
+                    subtrees.setdefault(name, {'name': name, 'columns': [], 'rowStatus': None})
+                continue
+            for entry, obj in children.items():
+                name = '%s::%s' % (module, entry)
+                columns = ['%s::%s' % (module, leaf) for leaf in obj if leaf != 'index']
+                subtree = subtrees.setdefault(name, {'name': name, 'columns': [], 'rowStatus': None})
+                subtree['columns'].extend(column for column in columns
+                                          if column not in subtree['columns'])
+                if columns:
+                    subtree['rowStatus'] = columns[-1]
+
+    names = list(subtrees)
+    for subtree in subtrees.values():
+        names.extend(subtree['columns'])
+    known = pytransport.OidMap.instance.oids if pytransport.OidMap.instance else None
+    resolved = pytransport.oidsResolve(list(OrderedDict.fromkeys(names)), known)
+
+    for subtree in subtrees.values():
+        subtree['oid'] = resolved[subtree['name']]
+        subtree['columns'] = [resolved[column] for column in subtree['columns']]
+        if subtree['rowStatus']:
+            subtree['rowStatus'] = resolved[subtree['rowStatus']]
+    return subtrees
+
+
+def valueParse(typeName, text):
+    '''
+    the printed value of a walk line as it is written back with snmpset
+    '''
+    if TYPE_LETTERS[typeName] != 'x':
+        return text.strip()
+    if text.strip() == '""':
+        return ''
+    hexTokens = []
+    for token in text.split():
+        if not HEX_PATTERN.match(token):
+            #BITS carry their labels after the hex
+            break
+        hexTokens.append(token)
+    return ''.join(hexTokens).upper()
+
+
+def walkParse(output):
+    '''
+    snmpbulkwalk -On -Ox output to an OrderedDict of OID tuple: (type letter, value)
+    '''
+    printed = []
+    for line in output.decode('latin-1').splitlines():
+        if line.startswith('.'):
+            printed.append(line)
+        elif printed:
+            #long hex strings carry on over the following lines
+            printed[-1] = printed[-1] + ' ' + line
+
+    leaves = OrderedDict()
+    for line in printed:
+        match = WALK_LINE_PATTERN.match(line)
+        if match is None or match.group(2) not in TYPE_LETTERS:
+            continue
+        leaves[pyber.oidParse(match.group(1))] = (TYPE_LETTERS[match.group(2)],
+                                                  valueParse(match.group(2), match.group(3)))
+    return leaves
+
+
+def subtreesWalk(ip, subtrees):
+    '''
+    walks every subtree at the same time, returns one dict of all the leaves
+    and the names of the subtrees that could not be walked
+    '''
+    cmds = ["snmpbulkwalk -v 2c -c public -Cr%d -OentUx %s %s" % (BULK_REPETITIONS, ip, name)
+            for name in subtrees]
+    leaves = {}
+    failed = []
+    with pytransport.operation('walk'):
+        results = pytransport.snmpRunParallel(cmds, stderr=STDOUT)
+    for name, (returncode, output) in zip(subtrees, results):
+        if returncode:
+            print('WARNING: could not walk %s: %s' % (name, output.decode('latin-1').strip()))
+            failed.append(name)
+            continue
+        walked = walkParse(output)
+        print('%-60s %6d leaves' % (name, len(walked)))
+        leaves.update(walked)
+    return leaves, failed
+
+
+def snapshotWrite(snapshotFilename, agentIp, subtrees, leaves):
+    snapshotFile = gzip.open(snapshotFilename, 'wb')
+    header = {'snapshot': SNAPSHOT_VERSION, 'agent': agentIp, 'taken': time.time(),
+              'subtrees': list(subtrees.values())}
+    snapshotFile.write((json.dumps(header) + '\n').encode('utf-8'))
+    for oid in sorted(leaves):
+        line = [pyber.oidFormat(oid)] + list(leaves[oid])
+        snapshotFile.write((json.dumps(line) + '\n').encode('utf-8'))
+    snapshotFile.close()
+
+
+def snapshotRead(snapshotFilename):
+    '''
+    returns (header, subtrees, leaves) of a snapshot file, subtrees as
+    subtreesGet() and leaves as walkParse() give them
+    '''
+    snapshotFile = gzip.open(snapshotFilename, 'rb')
+    try:
+        header = json.loads(snapshotFile.readline().decode('utf-8'))
+        if header.get('snapshot') != SNAPSHOT_VERSION:
+            raise ValueError('%s is not a version %d snapshot' % (snapshotFilename, SNAPSHOT_VERSION))
+        leaves = OrderedDict()
+        for line in snapshotFile:
+            oid, typeLetter, value = json.loads(line.decode('utf-8'))
+            leaves[pyber.oidParse(oid)] = (typeLetter, value)
+    finally:
+        snapshotFile.close()
+    subtrees = OrderedDict((subtree['name'], subtree) for subtree in header['subtrees'])
+    return header, subtrees, leaves
+
+
+def rowsGet(leaves, rowStatusOid):
+    '''
+    the row indexes found under a rowStatus column, as {index tuple: value}
+    '''
+    prefix = pyber.oidParse(rowStatusOid)
+    return dict((oid[len(prefix):], leaves[oid][1]) for oid in leaves
+                if oid[:len(prefix)] == prefix and len(oid) > len(prefix))
+
+
+def restorePlan(subtrees, saved, current):
+    '''
+    Works out what restore has to send.  Returns (destroys, creates, sets, gone):
+    rowStatus varbinds of the extra rows, one varbind list per row to create
+    again, the varbinds of the leaves that changed (rowStatus columns last)
+    and the saved leaves that are no longer there and cannot be put back.
+    Varbinds are (OID tuple, type letter, value).
+    '''
+    destroys = []
+    creates = []
+    skipped = set()
+    rowStatusColumns = set()
+
+    for subtree in subtrees.values():
+        if not subtree['rowStatus']:
+            continue
+        rowStatusOid = pyber.oidParse(subtree['rowStatus'])
+        rowStatusColumns.add(rowStatusOid)
+        savedRows = rowsGet(saved, subtree['rowStatus'])
+        currentRows = rowsGet(current, subtree['rowStatus'])
+        entryOid = pyber.oidParse(subtree['oid'])
+
+        for index in sorted(set(currentRows) - set(savedRows)):
+            destroys.append((rowStatusOid + index, 'i', ROW_DESTROY))
+            skipped.update(oid for oid in current
+                           if oid[:len(entryOid)] == entryOid and oid[len(entryOid) + 1:] == index)
+
+        for index in sorted(set(savedRows) - set(currentRows)):
+            varbinds = []
+            for column in subtree['columns']:
+                oid = pyber.oidParse(column) + index
+                if oid != rowStatusOid + index and oid in saved:
+                    varbinds.append((oid,) + saved[oid])
+            varbinds.append((rowStatusOid + index, 'i', ROW_CREATE_AND_GO))
+            creates.append(varbinds)
+            skipped.update(oid for oid in saved
+                           if oid[:len(entryOid)] == entryOid and oid[len(entryOid) + 1:] == index)
+
+    sets = []
+    rowStatusSets = []
+    gone = []
+    for oid, value in saved.items():
+        if oid in skipped:
+            continue
+        if oid not in current:
+            gone.append(oid)
+        elif current[oid] != value:
+            if [column for column in rowStatusColumns if oid[:len(column)] == column]:
+                rowStatusSets.append((oid,) + value)
+            else:
+                sets.append((oid,) + value)
+    return destroys, creates, sets + rowStatusSets, gone
+
+
+def setCmdGet(ip, varbinds):
+    return "snmpset -v 2c -c private -On %s %s" % (
+        ip, ' '.join('%s %s %s' % (pyber.oidFormat(oid), typeLetter, pytransport.quote(value))
+                     for oid, typeLetter, value in varbinds))
+
+
+def varbindsSet(ip, varbinds, batchSize=MAX_SET_VARBINDS):
+    '''
+    Sends varbinds in batches of batchSize.  A batch the agent refuses goes
+    again without its Failed object, or one varbind at a time when the error
+    does not name one.  Returns [(OID tuple, reason)] of what was not set.
+    '''
+    failed = []
+    pending = [varbinds[start:start + batchSize] for start in range(0, len(varbinds), batchSize)]
+    while pending:
+        batch = pending.pop(0)
+        try:
+            pytransport.snmpRun(setCmdGet(ip, batch), stderr=STDOUT)
+            continue
+        except CalledProcessError as err:
+            output = err.output.decode('latin-1')
+
+        reason = re.search(r'Reason: (.*)', output)
+        reason = reason.group(1).strip() if reason else (output.strip().splitlines() or ['failed'])[-1]
+        failedObject = re.search(r'Failed object: (\.[\d.]+)', output)
+        failedOid = pyber.oidParse(failedObject.group(1)) if failedObject else None
+        rest = [varbind for varbind in batch if varbind[0] != failedOid]
+
+        if len(batch) == 1:
+            failed.append((batch[0][0], reason))
+        elif len(rest) < len(batch):
+            failed.append((failedOid, reason))
+            pending.insert(0, rest)
+        else:
+            pending[0:0] = [[varbind] for varbind in batch]
+    return failed
+
+
+def snapshotTake(agentIp, snapshotFilename, configFilenames):
+    start = time.time()
+    subtrees = subtreesGet(configFilenames)
+    print('walking %d subtrees...\n' % len(subtrees))
+    leaves, failed = subtreesWalk(agentIp, subtrees)
+    #restore would take a subtree saved empty as one to clear
+    for name in failed:
+        del subtrees[name]
+    snapshotWrite(snapshotFilename, agentIp, subtrees, leaves)
+    print('\n%d leaves saved to %s in %.1fs' % (len(leaves), snapshotFilename, time.time() - start))
+
+
+def snapshotRestore(agentIp, snapshotFilename, dryRun=False):
+    start = time.time()
+    header, subtrees, saved = snapshotRead(snapshotFilename)
+    print('restoring %d leaves saved %s from %s...\n' % (
+        len(saved), time.strftime('%Y-%m-%d %H:%M', time.localtime(header['taken'])), header['agent']))
+    current, unwalked = subtreesWalk(agentIp, subtrees)
+    #a subtree that cannot be read now is left alone rather than recreated
+    for name in unwalked:
+        prefix = pyber.oidParse(subtrees.pop(name)['oid'])
+        for oid in [oid for oid in saved if oid[:len(prefix)] == prefix]:
+            del saved[oid]
+    destroys, creates, sets, gone = restorePlan(subtrees, saved, current)
+    print('\n%d rows to destroy, %d rows to create, %d leaves to set' % (
+        len(destroys), len(creates), len(sets)))
+
+    if dryRun:
+        if destroys:
+            print(setCmdGet(agentIp, destroys))
+        for varbinds in creates:
+            print(setCmdGet(agentIp, varbinds))
+        for batch in range(0, len(sets), MAX_SET_VARBINDS):
+            print(setCmdGet(agentIp, sets[batch:batch + MAX_SET_VARBINDS]))
+        return
+
+    with pytransport.operation('destroy'):
+        failed = varbindsSet(agentIp, destroys)
+    for varbinds in creates:
+        #a row goes in one SET, createAndGo needs its columns with it
+        with pytransport.operation('create'):
+            failed.extend(varbindsSet(agentIp, varbinds, batchSize=len(varbinds)))
+    with pytransport.operation('restore'):
+        failed.extend(varbindsSet(agentIp, sets))
+
+    for oid in gone:
+        print('WARNING: %s is gone and cannot be put back' % pyber.oidFormat(oid))
+    for oid, reason in failed:
+        print('WARNING: %s not restored: %s' % (pyber.oidFormat(oid), reason))
+    print('\nrestored in %.1fs, %d varbinds not restored' % (time.time() - start, len(failed) + len(gone)))
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pysnapshot.py snapshot|restore [agent-IPv4] [snapshotFile] [--confs=a.conf,b.conf] [--dry-run]'''
+    #with --daemon the run happens in a pyprobed.py daemon, see pytransport.daemonForward()
+    returncode = pytransport.daemonForward(sys.argv)
+    if returncode is not None:
+        sys.exit(returncode)
+    options, args = pytransport.optionsParse(sys.argv)
+
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+    if (len(args) < 3) or (args[1] not in ('snapshot', 'restore')):
+        print("ERROR: missing required argument")
+        print(usage)
+        sys.exit()
+    if len(args) > 4:
+        print("ERROR: unexpected argument " + args[4])
+        print(usage)
+        sys.exit()
+
+    agentIp = str(args[2])
+    try:
+        IPy.IP(agentIp)
+    except:
+        print("ERROR: you must use a valid SNMP-agent IPv4")
+        print(usage)
+        sys.exit()
+    agentIp = pytransport.agentAddress(agentIp)
+    snapshotFilename = args[3] if len(args) > 3 else DEFAULT_SNAPSHOT
+
+    try:
+        if args[1] == 'snapshot':
+            configFilenames = options['confs'].split(',') if options.get('confs') else DEFAULT_CONFS
+            snapshotTake(agentIp, snapshotFilename, configFilenames)
+        else:
+            snapshotRestore(agentIp, snapshotFilename, options.get('dry-run'))
+    except IOError as err:
+        print("Error: %s" % err)
+        sys.exit(1)
+    except ValueError as err:
+        print("ERROR: %s" % err)
+        sys.exit(1)
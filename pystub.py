@@ -0,0 +1,681 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pystub.py
+
+Usage:
+    $ python pystub.py [--port=1161] [--rules=pystub.conf] [--latency=MS] [--jitter=MS]
+                       [--loss=PCT] [--native[=mibDirectory]] [confFile ...]
+
+Description:
+    loopback SNMPv2c/v3 stub agent that serves the tables and leaves listed in
+    pycreate.conf, makemeone.conf and pyschar.conf so the scripts (and pybench.py)
+    can be run without a lab switch.
+
+    The stub understands GET, GETNEXT, GETBULK and SET.  Table entries follow
+    the rowStatus leaf of their conf entry (always the last object):
+        RowStatus tables:   createAndGo(4), createAndWait(5), active(1),
+                            notInService(2) and destroy(6)
+        EntryStatus tables: createRequest(2), underCreation(3), valid(1) and
+                            invalid(4), used by the RMON tables whose conf
+                            create value is "3"
+        entries whose rowStatus conf value is destroy(6), or that have no
+        rowStatus leaf at all, are treated as rows that always exist.
+
+    Every string leaf is checked against the character rejection rules from
+    the rules file before a SET is accepted.  The "truncate" and "transcode"
+    rules make the stub silently store something other than what was set,
+    like some agents do, to exercise the --verify read-back.
+
+    SNMPv3 requests are answered for the users of the rules file, with
+    noAuthNoPriv or authNoPriv (HMAC-MD5-96/HMAC-SHA-96, see pyusm.py).
+    Discovery, unknown users, wrong digests and requests outside the time
+    window get the usual usmStats Reports.  authPriv is not supported, it is
+    answered with an unsupportedSecLevels Report.
+
+Prerequisites:
+    The symbolic names in the conf files are turned into numeric OIDs once at
+    start-up with snmptranslate, unless they are listed in the "oids" section
+    of the rules file or in the oidmap.json written by pyresolve.py.  On a box
+    without net-snmp, --native compiles the MIB files with pymibparse.py and
+    takes the OIDs and the INDEX clauses of the conf entries from there.
+
+Parameters:
+    --port:     UDP port to listen on, 127.0.0.1 only (default 1161)
+    --rules:    JSON rules file (default pystub.conf)
+    --latency:  milliseconds to wait before answering each request
+    --jitter:   random extra milliseconds added on top of --latency
+    --loss:     percentage of requests, and separately of responses, to drop
+    --native:   resolve the conf names from this MIB directory with pymibparse.py
+                instead of snmptranslate (default ~/.snmp/mibs)
+    confFile:   conf files to serve (default pycreate.conf makemeone.conf pyschar.conf)
+
+Rules file:
+    {
+        "communities":{"public":"ro", "private":"rw"},
+        "oids":{"SOME-MODULE-MIB::someLeaf":".1.3.6.1.4.1..."},
+        "default":{"reject":"", "rejectLeading":"", "rejectTrailing":"",
+                   "minLength":0, "maxLength":255},
+        "leaves":{"SOME-MODULE-MIB::someLeaf":{"reject":"#%", "maxLength":32,
+                                               "truncate":16, "transcode":{"~":"?"}}},
+        "instances":{"SOME-MODULE-MIB::someLeaf":".1"},
+        "statusStyle":{"SOME-MODULE-MIB::someEntry":"RowStatus"},
+        "engineID":"80001f8804707973747562",
+        "users":{"pystub":{"auth":"SHA:pystubpassword", "access":"rw"}}
+    }
+==================================================================================="""
+
+from __future__ import print_function
+from collections import OrderedDict
+import binascii
+import bisect
+import random
+import socket
+import threading
+import json
+import time
+import sys
+
+import pyber
+import pyindex
+import pymibparse
+import pytransport
+import pyusm
+
+
+DEFAULT_CONFS = ['pycreate.conf', 'makemeone.conf', 'pyschar.conf']
+DEFAULT_RULES = {
+    'reject': '',
+    'rejectLeading': '',
+    'rejectTrailing': '',
+    'minLength': 0,
+    'maxLength': 255,
+}
+
+STATUS_ACTIVE = 1
+STATUS_NOTINSERVICE = 2
+STATUS_UNDERCREATION = 3
+STATUS_CREATEANDGO = 4
+STATUS_CREATEANDWAIT = 5
+STATUS_DESTROY = 6
+ENTRY_INVALID = 4
+
+#net-SNMP enterprise, text format, "pystub"
+DEFAULT_ENGINE_ID = '80001f8804707973747562'
+ENGINE_BOOTS = 1
+#RFC 3414 3.2 step 7, seconds
+TIME_WINDOW = 150
+
+
+class StubAgent(object):
+    '''
+    The agent keeps every instance in one dict keyed by OID tuple plus a sorted
+    list of those OIDs for GETNEXT/GETBULK.  Columns and scalars are described by
+    self.columns, keyed by the OID of the column/leaf itself.
+    '''
+
+    def __init__(self, configs, rules=None, latency=0.0, jitter=0.0, loss=0.0, mibIndex=None):
+        self.rules = rules or {}
+        self.mibIndex = mibIndex
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.communities = self.rules.get('communities', {'public': 'ro', 'private': 'rw'})
+        self.users = self.rules.get('users', {})
+        self.userKeys = {}
+        self.usmCounters = {}
+        self.engineId = binascii.unhexlify(self.rules.get('engineID', DEFAULT_ENGINE_ID))
+        self.started = time.time()
+
+        self.columns = {}
+        self.entries = {}
+        self.rows = {}
+        self.values = {}
+        self.sortedOids = []
+        self.dirty = True
+
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(['requests', 'gets', 'getnexts', 'getbulks', 'sets',
+                                    'setFailures', 'dropped', 'discoveries', 'usmFailures'], 0)
+        self.sock = None
+        self.thread = None
+
+        self.configsLoad(configs)
+
+    def ruleGet(self, name):
+        rule = dict(DEFAULT_RULES)
+        rule.update(self.rules.get('default', {}))
+        rule.update(self.rules.get('leaves', {}).get(name, {}))
+        return rule
+
+    def configsLoad(self, configs):
+        '''
+        configs is a list of parsed conf files.  Table confs (pycreate/makemeone)
+        map module -> entry -> leaves, leaf confs (pyschar) map module -> [leaves].
+        '''
+        tables = []
+        scalars = []
+        names = []
+
+        for configData in configs:
+            names.extend(pytransport.confObjectNamesGet(configData))
+            for module, children in configData.items():
+                if isinstance(children, list):
+                    scalars.extend('%s::%s' % (module, leaf) for leaf in children)
+                    continue
+                for entry, obj in children.items():
+                    tables.append((module, entry, obj))
+
+        #pyresolve.py output saves the snmptranslate calls, the rules file wins
+        known = {}
+        try:
+            with open(pytransport.OIDMAP_FILENAME) as oidmapFile:
+                known.update(json.load(oidmapFile))
+        except IOError:
+            pass
+        known.update(self.rules.get('oids', {}))
+        #--native, what neither of them lists comes from the MIB files
+        if self.mibIndex:
+            for name in names:
+                record = self.mibIndex.objectGet(*name.split('::', 1))
+                if name not in known and record and record['oid']:
+                    known[name] = ''.join('.%d' % arc for arc in record['oid'])
+        try:
+            oids = pytransport.oidsResolve(list(OrderedDict.fromkeys(names)), known)
+        except ValueError as err:
+            raise ValueError("%s, add them to the 'oids' section of the rules file or use --native" % err)
+        oids = dict((name, pyber.oidParse(oid)) for name, oid in oids.items())
+
+        for module, entry, obj in tables:
+            entryKey = '%s::%s' % (module, entry)
+            leaves = [leaf for leaf in obj if leaf != 'index']
+            lastLeaf = leaves[-1] if leaves else None
+            statusLeaf = None
+            style = 'permanent'
+            if lastLeaf and obj[lastLeaf]['type'] == 'i' and 'Status' in lastLeaf:
+                statusLeaf = lastLeaf
+                createValue = obj[lastLeaf]['value']
+                if createValue in ('2', '3'):
+                    style = 'EntryStatus'
+                elif createValue != str(STATUS_DESTROY):
+                    style = 'RowStatus'
+            style = self.rules.get('statusStyle', {}).get(entryKey, style)
+
+            info = self.entries.setdefault(entryKey, {'style': style, 'columns': [],
+                                                      'status': None})
+            for leaf in leaves:
+                name = '%s::%s' % (module, leaf)
+                oid = oids[name]
+                column = self.columns.setdefault(oid, {'name': name, 'entry': entryKey,
+                                                       'tag': pyber.TYPE_LETTERS[obj[leaf]['type']],
+                                                       'rule': self.ruleGet(name)})
+                column['entry'] = entryKey
+                if oid not in info['columns']:
+                    info['columns'].append(oid)
+                if leaf == statusLeaf:
+                    info['status'] = oid
+
+            #rows that are never created by the scripts have to exist up front
+            if style == 'permanent' and 'index' in obj:
+                if self.mibIndex:
+                    pyindex.mibIndexSpecGet(self.mibIndex, module, entry)
+                #the same INDEX clause encoding as the scripts
+                index = pyber.oidParse(pyindex.suffixGet(module, entry, obj['index']))
+                self.rowCreate(entryKey, index, self.values, self.rows, STATUS_ACTIVE)
+
+        for name in scalars:
+            oid = oids[name]
+            if oid in self.columns:
+                continue
+            self.columns[oid] = {'name': name, 'entry': None, 'tag': pyber.ASN_OCTET_STR,
+                                 'rule': self.ruleGet(name)}
+            instance = pyber.oidParse(self.rules.get('instances', {}).get(name, '.0'))
+            self.values[oid + instance] = (pyber.ASN_OCTET_STR, b'')
+
+        self.dirty = True
+
+    def rowCreate(self, entryKey, index, values, rows, status):
+        entry = self.entries[entryKey]
+        rows[(entryKey, index)] = status
+        for column in entry['columns']:
+            if column == entry['status']:
+                values[column + index] = (pyber.ASN_INTEGER, status)
+            elif column + index not in values:
+                values[column + index] = self.defaultValue(self.columns[column]['tag'])
+
+    def rowDestroy(self, entryKey, index, values, rows):
+        entry = self.entries[entryKey]
+        rows.pop((entryKey, index), None)
+        for column in entry['columns']:
+            values.pop(column + index, None)
+
+    def defaultValue(self, tag):
+        if tag == pyber.ASN_OBJECT_ID:
+            return (tag, (0, 0))
+        if tag == pyber.ASN_IPADDRESS:
+            return (tag, b'\x00\x00\x00\x00')
+        if tag == pyber.ASN_OCTET_STR:
+            return (tag, b'')
+        return (tag, 0)
+
+    def columnFind(self, oid):
+        '''
+        longest known column/leaf OID that prefixes oid, returns (columnOid, index)
+        '''
+        for length in range(len(oid) - 1, 0, -1):
+            if oid[:length] in self.columns:
+                return oid[:length], oid[length:]
+        return None, None
+
+    def stringCheck(self, rule, value):
+        text = value.decode('latin-1')
+        if len(text) < rule['minLength'] or len(text) > rule['maxLength']:
+            return pyber.ERR_WRONGLENGTH
+        for char in text:
+            if char in rule['reject']:
+                return pyber.ERR_WRONGVALUE
+        if text and text[0] in rule['rejectLeading']:
+            return pyber.ERR_WRONGVALUE
+        if text and text[-1] in rule['rejectTrailing']:
+            return pyber.ERR_WRONGVALUE
+        return pyber.ERR_NOERROR
+
+    def stringMangle(self, rule, value):
+        '''
+        what the agent really stores for an accepted string
+        '''
+        transcode = rule.get('transcode')
+        if transcode:
+            text = value.decode('latin-1')
+            value = ''.join(transcode.get(char, char) for char in text).encode('latin-1')
+        if rule.get('truncate') is not None:
+            value = value[:rule['truncate']]
+        return value
+
+    def statusApply(self, entryKey, index, status, values, rows):
+        '''
+        applies a rowStatus write to the staged values/rows, returns an error-status
+        '''
+        style = self.entries[entryKey]['style']
+        exists = (entryKey, index) in rows
+
+        if style == 'permanent':
+            if status in (STATUS_DESTROY, ENTRY_INVALID):
+                #nothing to destroy, put the row back to its defaults instead
+                self.rowDestroy(entryKey, index, values, rows)
+                self.rowCreate(entryKey, index, values, rows, STATUS_ACTIVE)
+            return pyber.ERR_NOERROR
+
+        if style == 'EntryStatus':
+            if status in (STATUS_NOTINSERVICE, STATUS_UNDERCREATION):
+                if exists and status == STATUS_NOTINSERVICE:
+                    return pyber.ERR_INCONSISTENTVALUE
+                if not exists:
+                    self.rowCreate(entryKey, index, values, rows, STATUS_UNDERCREATION)
+                return pyber.ERR_NOERROR
+            if status == STATUS_ACTIVE:
+                if not exists:
+                    return pyber.ERR_INCONSISTENTVALUE
+                rows[(entryKey, index)] = STATUS_ACTIVE
+                return pyber.ERR_NOERROR
+            if status == ENTRY_INVALID:
+                self.rowDestroy(entryKey, index, values, rows)
+                return pyber.ERR_NOERROR
+            return pyber.ERR_WRONGVALUE
+
+        if status in (STATUS_CREATEANDGO, STATUS_CREATEANDWAIT):
+            if exists:
+                return pyber.ERR_INCONSISTENTVALUE
+            if status == STATUS_CREATEANDGO:
+                self.rowCreate(entryKey, index, values, rows, STATUS_ACTIVE)
+            else:
+                self.rowCreate(entryKey, index, values, rows, STATUS_NOTINSERVICE)
+            return pyber.ERR_NOERROR
+        if status in (STATUS_ACTIVE, STATUS_NOTINSERVICE):
+            if not exists:
+                return pyber.ERR_INCONSISTENTVALUE
+            rows[(entryKey, index)] = status
+            return pyber.ERR_NOERROR
+        if status == STATUS_DESTROY:
+            self.rowDestroy(entryKey, index, values, rows)
+            return pyber.ERR_NOERROR
+        return pyber.ERR_WRONGVALUE
+
+    def setProcess(self, varbinds):
+        '''
+        All-or-nothing SET: every varbind is applied to a staged copy of the
+        instances and the copy is only kept if all of them succeed.
+        Returns (errorStatus, errorIndex).
+        '''
+        values = dict(self.values)
+        rows = dict(self.rows)
+
+        #rowStatus varbinds go first so a create in the same PDU makes the row
+        ordered = sorted(enumerate(varbinds),
+                         key=lambda item: not self.statusColumnIs(item[1][0]))
+
+        for position, (oid, value) in ordered:
+            errorIndex = position + 1
+            column, index = self.columnFind(oid)
+            if column is None or not index:
+                return pyber.ERR_NOTWRITABLE, errorIndex
+            info = self.columns[column]
+            if value[0] != info['tag']:
+                return pyber.ERR_WRONGTYPE, errorIndex
+
+            entryKey = info['entry']
+            if entryKey and self.entries[entryKey]['status'] == column:
+                error = self.statusApply(entryKey, index, value[1], values, rows)
+                if error:
+                    return error, errorIndex
+                if (entryKey, index) in rows:
+                    values[oid] = (pyber.ASN_INTEGER, rows[(entryKey, index)])
+                continue
+
+            if entryKey and (entryKey, index) not in rows:
+                return pyber.ERR_NOCREATION, errorIndex
+            if not entryKey and oid not in values:
+                return pyber.ERR_NOCREATION, errorIndex
+
+            if value[0] == pyber.ASN_OCTET_STR:
+                error = self.stringCheck(info['rule'], value[1])
+                if error:
+                    return error, errorIndex
+                value = (value[0], self.stringMangle(info['rule'], value[1]))
+            values[oid] = value
+
+        self.values = values
+        self.rows = rows
+        self.dirty = True
+        return pyber.ERR_NOERROR, 0
+
+    def statusColumnIs(self, oid):
+        column, index = self.columnFind(oid)
+        if column is None:
+            return False
+        entryKey = self.columns[column]['entry']
+        return bool(entryKey) and self.entries[entryKey]['status'] == column
+
+    def nextGet(self, oid):
+        if self.dirty:
+            self.sortedOids = sorted(self.values)
+            self.dirty = False
+        position = bisect.bisect_right(self.sortedOids, oid)
+        if position >= len(self.sortedOids):
+            return oid, (pyber.SNMP_ENDOFMIBVIEW, None)
+        nextOid = self.sortedOids[position]
+        return nextOid, self.values[nextOid]
+
+    def exactGet(self, oid):
+        if oid in self.values:
+            return oid, self.values[oid]
+        column, index = self.columnFind(oid)
+        if column is not None or oid in self.columns:
+            return oid, (pyber.SNMP_NOSUCHINSTANCE, None)
+        return oid, (pyber.SNMP_NOSUCHOBJECT, None)
+
+    def pduProcess(self, access, pdu):
+        '''
+        Returns the response PDU for a request PDU, access is 'ro' or 'rw'
+        '''
+        response = {'type': pyber.PDU_RESPONSE, 'requestId': pdu['requestId'],
+                    'errorStatus': 0, 'errorIndex': 0, 'varbinds': pdu['varbinds']}
+
+        with self.lock:
+            self.stats['requests'] += 1
+            if pdu['type'] == pyber.PDU_GET:
+                self.stats['gets'] += 1
+                response['varbinds'] = [self.exactGet(oid) for oid, value in pdu['varbinds']]
+            elif pdu['type'] == pyber.PDU_GETNEXT:
+                self.stats['getnexts'] += 1
+                response['varbinds'] = [self.nextGet(oid) for oid, value in pdu['varbinds']]
+            elif pdu['type'] == pyber.PDU_GETBULK:
+                self.stats['getbulks'] += 1
+                response['varbinds'] = self.bulkGet(pdu)
+            elif pdu['type'] == pyber.PDU_SET:
+                self.stats['sets'] += 1
+                if access != 'rw':
+                    response['errorStatus'] = pyber.ERR_NOACCESS
+                    response['errorIndex'] = 1
+                else:
+                    error, errorIndex = self.setProcess(pdu['varbinds'])
+                    response['errorStatus'] = error
+                    response['errorIndex'] = errorIndex
+                if response['errorStatus']:
+                    self.stats['setFailures'] += 1
+            else:
+                response['errorStatus'] = pyber.ERR_GENERR
+
+        return response
+
+    def bulkGet(self, pdu):
+        nonRepeaters = max(pdu['nonRepeaters'], 0)
+        repetitions = max(pdu['maxRepetitions'], 0)
+        varbinds = []
+        for oid, value in pdu['varbinds'][:nonRepeaters]:
+            varbinds.append(self.nextGet(oid))
+        current = [oid for oid, value in pdu['varbinds'][nonRepeaters:]]
+        for repetition in range(repetitions):
+            if not current:
+                break
+            row = [self.nextGet(oid) for oid in current]
+            varbinds.extend(row)
+            if all(value[0] == pyber.SNMP_ENDOFMIBVIEW for oid, value in row):
+                break
+            current = [oid for oid, value in row]
+        return varbinds
+
+    def userKeyGet(self, userName):
+        '''
+        (authProtocol, localized key) of a user, (None, None) for noAuth users
+        '''
+        if userName not in self.userKeys:
+            auth = self.users[userName].get('auth')
+            if auth:
+                protocol, sep, password = auth.partition(':')
+                self.userKeys[userName] = (protocol, pyusm.localizedKeyGet(password, protocol,
+                                                                           self.engineId))
+            else:
+                self.userKeys[userName] = (None, None)
+        return self.userKeys[userName]
+
+    def usmProcess(self, data, msg):
+        '''
+        USM side of a v3 request (RFC 3414 3.2), returns the reply message or
+        None when the request is not worth an answer
+        '''
+        try:
+            params = pyusm.usmParametersDecode(msg['securityParameters'])
+        except pyber.BerError:
+            return None
+        scopedPdu = msg.get('scopedPdu')
+        requestId = scopedPdu['pdu']['requestId'] if scopedPdu else 0
+        replyParams = {'engineId': self.engineId, 'boots': ENGINE_BOOTS,
+                       'time': int(time.time() - self.started), 'userName': params['userName'],
+                       'authParams': b'', 'privParams': b''}
+
+        def reportGet(oid, protocol=None, key=None):
+            with self.lock:
+                self.stats['usmFailures' if oid != pyusm.USM_STATS_UNKNOWN_ENGINE_IDS
+                           else 'discoveries'] += 1
+                self.usmCounters[oid] = self.usmCounters.get(oid, 0) + 1
+                count = self.usmCounters[oid]
+            report = {'type': pyber.PDU_REPORT, 'requestId': requestId,
+                      'varbinds': [(oid, (pyber.ASN_COUNTER, count))]}
+            return pyusm.messageBuild(msg['msgId'], pyusm.FLAG_AUTH if key else 0, replyParams,
+                                      {'contextEngineId': self.engineId, 'contextName': b'',
+                                       'pdu': report}, key, protocol)
+
+        if params['engineId'] != self.engineId:
+            return reportGet(pyusm.USM_STATS_UNKNOWN_ENGINE_IDS)
+        userName = params['userName'].decode('latin-1')
+        if userName not in self.users:
+            return reportGet(pyusm.USM_STATS_UNKNOWN_USER_NAMES)
+        protocol, key = self.userKeyGet(userName)
+        authRequested = bool(msg['flags'] & pyusm.FLAG_AUTH)
+        if msg['flags'] & pyusm.FLAG_PRIV or scopedPdu is None or authRequested != bool(key):
+            return reportGet(pyusm.USM_STATS_UNSUPPORTED_SEC_LEVELS)
+        if key:
+            if not pyusm.messageVerify(data, msg, params, key, protocol):
+                return reportGet(pyusm.USM_STATS_WRONG_DIGESTS)
+            if (params['boots'] != ENGINE_BOOTS
+                    or abs(params['time'] - replyParams['time']) > TIME_WINDOW):
+                return reportGet(pyusm.USM_STATS_NOT_IN_TIME_WINDOWS, protocol, key)
+
+        response = self.pduProcess(self.users[userName].get('access', 'ro'), scopedPdu['pdu'])
+        return pyusm.messageBuild(msg['msgId'], msg['flags'] & pyusm.FLAG_AUTH, replyParams,
+                                  {'contextEngineId': self.engineId,
+                                   'contextName': scopedPdu['contextName'], 'pdu': response},
+                                  key, protocol)
+
+    def datagramHandle(self, data, address):
+        try:
+            msg = pyber.messageDecode(data)
+        except pyber.BerError:
+            return
+        if msg['version'] == 3:
+            reply = self.usmProcess(data, msg)
+            if reply is None:
+                return
+        elif msg['community'].decode('latin-1') in self.communities:
+            response = self.pduProcess(self.communities[msg['community'].decode('latin-1')],
+                                       msg['pdu'])
+            reply = pyber.messageEncode({'version': msg['version'],
+                                         'community': msg['community'], 'pdu': response})
+        else:
+            return
+        if self.loss and random.random() * 100 < self.loss:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return
+        sock = self.sock
+        if sock is None:
+            return
+        try:
+            sock.sendto(reply, address)
+        except socket.error:
+            pass
+
+    def start(self, port=1161, host='127.0.0.1'):
+        '''
+        binds the UDP socket and serves requests from a daemon thread
+        '''
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.thread = threading.Thread(target=self.serve, args=(self.sock,))
+        self.thread.daemon = True
+        self.thread.start()
+        return self.sock.getsockname()[1]
+
+    def serve(self, sock):
+        #stop() drops self.sock while this thread may still be reading from it
+        while True:
+            try:
+                data, address = sock.recvfrom(65535)
+            except socket.error:
+                return
+            if self.sock is not sock:
+                return
+            if self.loss and random.random() * 100 < self.loss:
+                with self.lock:
+                    self.stats['dropped'] += 1
+                continue
+            delay = (self.latency + random.random() * self.jitter) / 1000.0
+            if delay > 0:
+                #answer from a timer so slow responses do not serialize each other
+                timer = threading.Timer(delay, self.datagramHandle, (data, address))
+                timer.daemon = True
+                timer.start()
+            else:
+                self.datagramHandle(data, address)
+
+    def stop(self):
+        '''
+        stops serving, the serve thread is done with the socket when this returns
+        '''
+        sock = self.sock
+        if sock is None:
+            return
+        self.sock = None
+        #closing the socket does not wake a thread blocked in recvfrom(), a datagram does
+        wake = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            wake.sendto(b'', sock.getsockname())
+        except socket.error:
+            pass
+        wake.close()
+        self.thread.join()
+        sock.close()
+
+    def statsGet(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def rulesLoad(rulesFilename):
+    try:
+        with open(rulesFilename) as rulesFile:
+            return json.load(rulesFile, object_pairs_hook=OrderedDict)
+    except IOError:
+        return {}
+
+
+def configsLoad(configFilenames):
+    configs = []
+    for configFilename in configFilenames:
+        with open(configFilename) as jsonConfigFile:
+            configs.append(json.load(jsonConfigFile, object_pairs_hook=OrderedDict))
+    return configs
+
+
+def agentFromOptions(options, configFilenames):
+    '''
+    builds a StubAgent from the --rules/--latency/--jitter/--loss/--native
+    options.  Raises pymibparse.MibParseError when --native finds no MIB files.
+    '''
+    rules = rulesLoad(options.get('rules', 'pystub.conf'))
+    configs = configsLoad(configFilenames)
+    mibIndex = None
+    if 'native' in options:
+        mibDirectory = options['native']
+        if mibDirectory is True:
+            mibDirectory = pymibparse.DEFAULT_MIB_DIRECTORY
+        modules = OrderedDict.fromkeys(module for configData in configs for module in configData)
+        mibIndex, errors = pymibparse.mibIndexBuild(mibDirectory, list(modules))
+        for error in errors:
+            print('WARNING: %s' % error)
+    return StubAgent(configs, rules,
+                     latency=float(options.get('latency', 0)),
+                     jitter=float(options.get('jitter', 0)),
+                     loss=float(options.get('loss', 0)),
+                     mibIndex=mibIndex)
+
+
+######
+# main
+######
+
+if __name__ == '__main__':
+    usage = '''Usage: $ python pystub.py [--port=1161] [--rules=pystub.conf] [--latency=MS] [--jitter=MS] [--loss=PCT] [--native[=mibDirectory]] [confFile ...]'''
+
+    options, args = pytransport.optionsParse(sys.argv)
+    if (len(args) == 2) and ((args[1] == '-h') or (args[1] == '--help')):
+        print(__doc__)
+        sys.exit()
+
+    configFilenames = args[1:] or DEFAULT_CONFS
+    try:
+        agent = agentFromOptions(options, configFilenames)
+    except (IOError, ValueError, pymibparse.MibParseError) as err:
+        print("ERROR: %s\n%s" % (err, usage))
+        sys.exit(1)
+
+    port = agent.start(int(options.get('port', 1161)))
+    print('stub agent serving %d objects on 127.0.0.1:%d' % (len(agent.columns), port))
+    try:
+        while agent.thread.is_alive():
+            agent.thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    agent.stop()
+    print(agent.statsGet())
@@ -0,0 +1,1123 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pytransport.py
+
+Description:
+    shared helpers for the way pyoids/pyschar/pycreate/makemeone talk to the
+    net-SNMP command-line tools and to the SNMP agent.
+
+    Scripts call optionsParse() on sys.argv to split the optional --name=value
+    arguments from the positional ones, then agentAddress() to get the agent
+    string that goes into every snmpset/snmpget command.  Every net-SNMP
+    command goes through snmpRun() so it can be recorded or replayed.
+
+Options understood by every script:
+    --port=N
+        UDP port of the SNMP agent (default 161).  Handy for the pystub.py
+        loopback agent which normally runs on an unprivileged port.
+    --record=traceFile
+        run against the agent as usual and save every command with its exit
+        code and output to traceFile (gzipped JSON lines).
+    --replay=traceFile
+        answer every command from traceFile instead of running it, no agent
+        or MIB files needed.  Commands are matched with the agent address
+        taken out, so a trace can be replayed against any agent argument.
+    --speculative
+        send the three special char tiers (char, 'a'+char, 'a'+char+'b') at
+        the same time instead of one after another, for sets on leaves that
+        already exist.  See tiersRun().
+    --verify
+        read back the values the agent accepted, in batched multi-varbind
+        GETs (see snmpGetBatch()), and report the ones that came back
+        different as accepted-but-mangled.
+    --numeric[=oidmap.json]
+        send numeric OIDs with MIB loading turned off (-m '') instead of
+        MODULE::leaf names, so net-SNMP does not parse every MIB file on each
+        command.  The names are looked up in the map written by pyresolve.py,
+        anything missing is resolved once and added to the map.  The reports
+        still use the symbolic names.
+    --v3-user=name [--v3-auth=MD5|SHA:password] [--v3-priv=DES|AES:password]
+        talk SNMPv3 (USM) instead of v2c: noAuthNoPriv with just --v3-user,
+        authNoPriv with --v3-auth, authPriv with both.  The -v 2c -c community
+        of every command is swapped for the v3 arguments, with the engineID,
+        boots/time and localized keys worked out once per agent (see
+        AgentSession.usmArgsGet()) so net-SNMP skips its discovery request and
+        its megabyte of password hashing on every command.  Traces keep the
+        v2c command lines, so they can be replayed without the passwords.
+    --profile[=file.pstats]
+        profile the run: cProfile of the Python side, saved to file.pstats
+        (default scriptname.pstats) for snakeviz, plus the wall and CPU time
+        of every net-SNMP child process.  At exit the time is broken down into
+        Python CPU, child process CPU and network wait (child wall time not
+        spent on child CPU), per tool, see Profiler.
+    --timeline=file.json
+        write every command run against the agent as a Chrome trace-event
+        span to file.json, for chrome://tracing or Perfetto.  The scripts
+        group their commands into operations (create, validate, destroy,
+        probe, read-back...) with operation(), tagged with the module, leaf
+        and special char, see Timeline.
+    --results=results.db [--firmware=label]
+        add every probe outcome of pyschar/pycreate to an SQLite database, with
+        the agent's sysDescr.0 (or label) as the firmware of the run, see
+        pyresults.py for the queries.
+    --progress[=SECONDS]
+        show the completed units out of the planned ones, the commands per
+        second, the average command latency, the sets so far and an ETA.  On a
+        terminal it is a status line kept at the bottom, otherwise (logs, CI,
+        pyprobed.py jobs) a key=value "progress ..." line every SECONDS
+        (default 30), see Progress.
+    --daemon[=socketFile]
+        hand the whole run to a pyprobed.py daemon listening on socketFile
+        (default ~/.pyprobed.sock) and print its output, see daemonForward().
+        Without a daemon listening the script runs by itself as usual.
+
+Running inside pyprobed.py:
+    the daemon runs the scripts over and over in one process, so the state
+    kept here outlives a run: the --numeric map, the conf files read with
+    confLoad() and the AgentSession of every agent.  transportClose() ends
+    the parts that belong to a single run (traces, replay summary, map save).
+==================================================================================="""
+
+from __future__ import print_function
+from subprocess import Popen, PIPE, CalledProcessError, STDOUT
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import atexit
+import cProfile
+import resource
+import pstats
+import socket
+import binascii
+import gzip
+import json
+import threading
+import time
+import sys
+import os
+import re
+
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+
+import pyresults
+import pyusm
+
+
+#options shared by all of the scripts, filled in by optionsParse()
+options = {}
+
+#agent string handed out by agentAddress(), taken out of traced commands
+agent = None
+
+TRACE_VERSION = 1
+#most varbinds sent in one snmpget by snmpGetBatch()
+MAX_GET_VARBINDS = 24
+
+#default map of MODULE::leaf names to numeric OIDs, see pyresolve.py
+OIDMAP_FILENAME = 'oidmap.json'
+#net-SNMP tools that talk to the agent, the ones --numeric rewrites
+AGENT_TOOLS = ('snmpset', 'snmpget', 'snmpgetnext', 'snmpbulkget', 'snmpwalk', 'snmpbulkwalk')
+SYMBOL_PATTERN = re.compile(r'(?<= )([A-Z][A-Z0-9-]*::[A-Za-z][\w-]*)')
+AGENT_PLACEHOLDER = '{agent}'
+
+#where pyprobed.py listens unless told otherwise
+DAEMON_SOCKET = os.path.expanduser('~/.pyprobed.sock')
+
+#AgentSession per agent address, see agentAddress()
+sessions = {}
+
+#the run state every command updates (sessions, --timeline, --record, --progress), the
+#pycreate --pipeline stages run commands from two threads
+stateLock = threading.Lock()
+
+#how long a discovered engineID/boots/time is trusted before asking again
+USM_REDISCOVER_SECONDS = 300
+#what each set of v3 options gives net-SNMP as -l
+USM_LEVELS = {(False, False): 'noAuthNoPriv', (True, False): 'authNoPriv', (True, True): 'authPriv'}
+
+#parsed conf files, abspath: (mtime, size, configData), see confLoad()
+confCache = {}
+
+#functions listed by the --profile summary
+PROFILE_TOP_FUNCTIONS = 10
+
+#--progress: status line refresh on a terminal, default seconds between
+#the lines written to a log, and how far back the rates and the ETA look
+PROGRESS_REFRESH_SECONDS = 0.5
+PROGRESS_INTERVAL_SECONDS = 30
+PROGRESS_WINDOW_SECONDS = 120
+
+
+def optionsParse(argv):
+    '''
+    Split argv into a dictionary of --name=value options and a list of the
+    remaining positional arguments (argv[0] included so the scripts can keep
+    their existing len(sys.argv) style checks).  A bare --name is stored as True.
+    -h and --help are left alone as positional arguments on purpose.
+    '''
+    parsed = {}
+    args = []
+
+    for arg in argv:
+        if arg.startswith('--') and arg != '--help':
+            name, sep, value = arg[2:].partition('=')
+            if sep:
+                parsed[name] = value
+            else:
+                parsed[name] = True
+        else:
+            args.append(arg)
+
+    options.clear()
+    options.update(parsed)
+
+    if parsed.get('numeric'):
+        oidmapFilename = os.path.abspath(OIDMAP_FILENAME if parsed['numeric'] is True
+                                         else parsed['numeric'])
+        #a daemon keeps the map it already loaded
+        if not OidMap.instance or OidMap.instance.oidmapFilename != oidmapFilename:
+            OidMap.instance = OidMap(oidmapFilename)
+    else:
+        OidMap.instance = None
+
+    if parsed.get('record') and parsed.get('replay'):
+        raise SystemExit('ERROR: --record and --replay cannot be used together')
+    try:
+        usmSettingsGet()
+    except ValueError as err:
+        raise SystemExit('ERROR: %s' % err)
+    Replayer.instance = None
+    Recorder.instance = None
+    if parsed.get('replay'):
+        Replayer.instance = Replayer(parsed['replay'])
+    elif parsed.get('record'):
+        Recorder.instance = Recorder(parsed['record'])
+    if parsed.get('results') and not pyresults.ResultsStore.instance:
+        pyresults.ResultsStore.instance = pyresults.ResultsStore(
+            parsed['results'], os.path.splitext(os.path.basename(argv[0]))[0], argv[1:], runInfoGet)
+    if parsed.get('timeline') and not Timeline.instance:
+        Timeline.instance = Timeline(parsed['timeline'])
+    if parsed.get('progress') and not Progress.instance:
+        Progress.instance = Progress(PROGRESS_INTERVAL_SECONDS if parsed['progress'] is True
+                                     else float(parsed['progress']))
+    if parsed.get('profile') and not Profiler.instance:
+        pstatsFilename = (parsed['profile'] if parsed['profile'] is not True
+                          else os.path.splitext(os.path.basename(argv[0]))[0] + '.pstats')
+        Profiler.instance = Profiler(pstatsFilename)
+
+    return parsed, args
+
+
+def usmSettingsGet():
+    '''
+    Returns (user, authProtocol, authPassword, privProtocol, privPassword) from
+    the --v3-* options, None when running v2c.  Raises ValueError on bad options.
+    '''
+    if not options.get('v3-user'):
+        if options.get('v3-auth') or options.get('v3-priv'):
+            raise ValueError('--v3-auth and --v3-priv need --v3-user')
+        return None
+    if options['v3-user'] is True:
+        raise ValueError('--v3-user needs a user name')
+
+    settings = [options['v3-user']]
+    for name, protocols in (('v3-auth', sorted(pyusm.AUTH_PROTOCOLS)),
+                            ('v3-priv', pyusm.PRIV_PROTOCOLS)):
+        value = options.get(name)
+        if not value:
+            settings += [None, None]
+            continue
+        protocol, sep, password = str(value).partition(':')
+        if protocol not in protocols or not password:
+            raise ValueError('--%s must be one of %s followed by :password' % (name, '/'.join(protocols)))
+        settings += [protocol, password]
+    if settings[3] and not settings[1]:
+        raise ValueError('--v3-priv needs --v3-auth')
+    return tuple(settings)
+
+
+def transportClose():
+    '''
+    End of a run: closes the --record trace, the --timeline and the --results
+    database, prints the --replay summary, saves new --numeric map entries and
+    writes the --profile stats.  Runs at exit for the scripts, after every job
+    for pyprobed.py.
+    '''
+    if pyresults.ResultsStore.instance:
+        pyresults.ResultsStore.instance.close()
+        pyresults.ResultsStore.instance = None
+    if Timeline.instance:
+        Timeline.instance.close()
+        Timeline.instance = None
+    if Progress.instance:
+        Progress.instance.close()
+        Progress.instance = None
+    if Profiler.instance:
+        Profiler.instance.close()
+        Profiler.instance = None
+    if Recorder.instance:
+        Recorder.instance.close()
+    if Replayer.instance:
+        Replayer.instance.summaryPrint()
+    if OidMap.instance:
+        OidMap.instance.save()
+    Recorder.instance = None
+    Replayer.instance = None
+
+
+atexit.register(transportClose)
+
+
+def workerStart(ip):
+    '''
+    Start of a pyshard.py worker process, forked from a script after its
+    optionsParse(): points the transport at the worker's agent and opens the
+    worker's own --results run, the parent's connection is left alone.
+    Returns the agent address like agentAddress().
+    '''
+    #the coordinator shows the progress of the units
+    Progress.instance = None
+    store = pyresults.ResultsStore.instance
+    if store:
+        pyresults.ResultsStore.instance = pyresults.ResultsStore(store.databaseFilename, store.script,
+                                                                 store.argv, store.runInfoGet)
+    return agentAddress(ip)
+
+
+def workerEnd():
+    '''
+    End of a pyshard.py worker: forked processes leave without the atexit
+    transportClose(), which stays the parent's, so only the worker's own
+    --results run is closed here
+    '''
+    if pyresults.ResultsStore.instance:
+        pyresults.ResultsStore.instance.close()
+        pyresults.ResultsStore.instance = None
+
+
+def confLoad(configFilename):
+    '''
+    json.load() of a conf file into OrderedDicts, parsed once per process for
+    as long as the file does not change.  Raises IOError like open() when the
+    file is missing.  The result is shared, do not modify it.
+    '''
+    with open(configFilename) as jsonConfigFile:
+        stat = os.fstat(jsonConfigFile.fileno())
+        key = os.path.abspath(configFilename)
+        cached = confCache.get(key)
+        if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        configData = json.load(jsonConfigFile, object_pairs_hook=OrderedDict)
+    confCache[key] = (stat.st_mtime, stat.st_size, configData)
+    return configData
+
+
+class AgentSession(object):
+    '''
+    State kept per agent for the life of the process.  The net-SNMP tools
+    start a new process for every command so there is no socket to hold on
+    to; what carries over from one command (and, in pyprobed.py, from one job)
+    to the next is kept here.
+    '''
+
+    def __init__(self, address):
+        self.address = address
+        self.created = time.time()
+        self.lastUsed = None
+        self.commands = 0
+        self.failures = 0
+        self.usm = None
+        self.usmKeys = {}
+
+    def commandCount(self, returncode):
+        self.commands += 1
+        if returncode:
+            self.failures += 1
+        self.lastUsed = time.time()
+
+    def statusGet(self):
+        status = {'address': self.address, 'commands': self.commands, 'failures': self.failures,
+                  'idle': round(time.time() - self.lastUsed, 1) if self.lastUsed else None}
+        if self.usm and self.usm['engineId']:
+            status['engineId'] = binascii.hexlify(self.usm['engineId']).decode('ascii')
+        return status
+
+    def usmDiscover(self):
+        '''
+        engineID/boots/time discovery, once and then every USM_REDISCOVER_SECONDS
+        in case the agent rebooted
+        '''
+        now = time.time()
+        if self.usm and now - self.usm['discovered'] < USM_REDISCOVER_SECONDS:
+            return self.usm
+        host, sep, port = self.address.partition(':')
+        try:
+            engineId, boots, engineTime = pyusm.engineDiscover(host, int(port or 161))
+        except (pyusm.UsmError, socket.error) as err:
+            print('WARNING: %s, leaving the v3 discovery to net-SNMP' % err, file=sys.stderr)
+            engineId, boots, engineTime = None, 0, 0
+        self.usm = {'engineId': engineId, 'boots': boots, 'time': engineTime, 'discovered': now}
+        return self.usm
+
+    def usmKeyGet(self, password, protocol):
+        key = (self.usm['engineId'], protocol, password)
+        if key not in self.usmKeys:
+            self.usmKeys[key] = pyusm.localizedKeyGet(password, protocol, self.usm['engineId'])
+        return '0x' + binascii.hexlify(self.usmKeys[key]).decode('ascii')
+
+    def usmArgsGet(self):
+        '''
+        The net-SNMP arguments that replace "-v 2c -c community".  With the
+        engineID known the tools get it (-e), the current boots/time (-Z) and
+        the localized keys (-3k/-3K) instead of the passwords, so they neither
+        probe the agent nor hash the passwords.  Privacy keys are localized
+        with the authentication hash, as RFC 3414/3826 do.
+        '''
+        user, authProtocol, authPassword, privProtocol, privPassword = usmSettingsGet()
+        usm = self.usmDiscover()
+        args = ['-v 3', '-l %s' % USM_LEVELS[(bool(authProtocol), bool(privProtocol))],
+                '-u %s' % quote(user)]
+        if usm['engineId'] is None:
+            if authProtocol:
+                args.append('-a %s -A %s' % (authProtocol, quote(authPassword)))
+            if privProtocol:
+                args.append('-x %s -X %s' % (privProtocol, quote(privPassword)))
+            return ' '.join(args)
+
+        if authProtocol:
+            args.append('-a %s -3k %s' % (authProtocol, self.usmKeyGet(authPassword, authProtocol)))
+        if privProtocol:
+            args.append('-x %s -3K %s' % (privProtocol, self.usmKeyGet(privPassword, authProtocol)))
+        engineTime = usm['time'] + int(time.time() - usm['discovered'])
+        args.append('-e 0x%s -Z %d,%d' % (binascii.hexlify(usm['engineId']).decode('ascii'),
+                                          usm['boots'], engineTime))
+        return ' '.join(args)
+
+    def usmCmdRewrite(self, cmd):
+        return re.sub(r'-v 2c -c \S+', lambda match: self.usmArgsGet(), cmd, count=1)
+
+
+def sessionGet(address=None):
+    '''
+    the AgentSession of address (default the current agent), created on first use
+    '''
+    address = address or agent
+    if address not in sessions:
+        sessions[address] = AgentSession(address)
+    return sessions[address]
+
+
+def agentAddress(ip):
+    '''
+    Returns the agent address in net-SNMP syntax, with the port appended
+    when --port was given.
+    '''
+    global agent
+
+    port = options.get('port')
+    if port and port is not True:
+        agent = '%s:%s' % (ip, int(port))
+    else:
+        agent = ip
+    sessionGet(agent)
+    return agent
+
+
+def runInfoGet():
+    '''
+    (agent, firmware) of the run for --results, the firmware being --firmware
+    or the agent's sysDescr.0
+    '''
+    firmware = options.get('firmware')
+    if not firmware or firmware is True:
+        try:
+            output = snmpRun("snmpget -v 2c -c public -Oqv %s SNMPv2-MIB::sysDescr.0" % agent, stderr=STDOUT)
+            firmware = output.decode('latin-1').strip().strip('"') or 'unknown'
+        except CalledProcessError:
+            firmware = 'unknown'
+    return agent, firmware
+
+
+def cmdNormalize(cmd):
+    '''
+    takes the agent address out of a command so traces do not depend on it
+    '''
+    if agent:
+        return cmd.replace(' %s ' % agent, ' %s ' % AGENT_PLACEHOLDER)
+    return cmd
+
+
+class Recorder(object):
+    '''
+    Appends one JSON line per command to a gzipped trace file.  Lines are
+    written as they happen so a run that dies half way still leaves a usable trace.
+    '''
+    instance = None
+
+    def __init__(self, traceFilename):
+        self.traceFile = gzip.open(traceFilename, 'wb')
+        self.lineWrite({'trace': TRACE_VERSION})
+
+    def lineWrite(self, record):
+        self.traceFile.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+
+    def record(self, cmd, returncode, output):
+        self.lineWrite({'cmd': cmdNormalize(cmd), 'rc': returncode,
+                        'out': output.decode('latin-1')})
+
+    def close(self):
+        if self.traceFile:
+            self.traceFile.close()
+            self.traceFile = None
+
+
+class Replayer(object):
+    '''
+    Answers commands from a trace.  Repeated commands get their recorded
+    responses in order; once those run out the last one is repeated.
+    '''
+    instance = None
+
+    def __init__(self, traceFilename):
+        self.responses = {}
+        self.misses = 0
+        try:
+            traceFile = gzip.open(traceFilename, 'rb')
+            for line in traceFile:
+                record = json.loads(line.decode('utf-8'))
+                if 'cmd' in record:
+                    self.responses.setdefault(record['cmd'], deque()).append(
+                        (record['rc'], record['out'].encode('latin-1')))
+            traceFile.close()
+        except IOError:
+            raise SystemExit('ERROR: cannot read trace file %s' % traceFilename)
+
+    def replay(self, cmd):
+        responses = self.responses.get(cmdNormalize(cmd))
+        if not responses:
+            self.misses += 1
+            return 1, ('pytransport: no recorded response for: %s\n' % cmd).encode('latin-1')
+        if len(responses) > 1:
+            return responses.popleft()
+        return responses[0]
+
+    def summaryPrint(self):
+        if self.misses:
+            print('WARNING: %d commands were not found in the replay trace' % self.misses,
+                  file=sys.stderr)
+
+
+def cpuTimeGet(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler(object):
+    '''
+    --profile: cProfile runs from optionsParse() to transportClose(), and
+    snmpRun()/snmpRunParallel() time their child processes with
+    childrenStart()/childrenEnd().  Child CPU is what the waited-for children
+    used (RUSAGE_CHILDREN), the rest of the time spent waiting on them is
+    counted as network wait, which includes their startup.  Commands run
+    together by snmpRunParallel() share the wall and CPU time of the batch.
+    '''
+    instance = None
+
+    def __init__(self, pstatsFilename):
+        self.pstatsFilename = pstatsFilename
+        #tool: [commands, wall, cpu]
+        self.tools = OrderedDict()
+        self.started = time.time()
+        self.selfCpuStart = cpuTimeGet(resource.RUSAGE_SELF)
+        self.childCpuStart = cpuTimeGet(resource.RUSAGE_CHILDREN)
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def childrenStart(self):
+        return time.time(), cpuTimeGet(resource.RUSAGE_CHILDREN)
+
+    def childrenEnd(self, mark, cmds):
+        wall = time.time() - mark[0]
+        cpu = cpuTimeGet(resource.RUSAGE_CHILDREN) - mark[1]
+        for cmd in cmds:
+            tool = self.tools.setdefault(cmd.split(' ', 1)[0], [0, 0.0, 0.0])
+            tool[0] += 1
+            tool[1] += wall / len(cmds)
+            tool[2] += cpu / len(cmds)
+
+    def close(self):
+        self.profile.disable()
+        wall = time.time() - self.started
+        selfCpu = cpuTimeGet(resource.RUSAGE_SELF) - self.selfCpuStart
+        #the MIB parser pool and anything else waited for counts as child CPU too
+        childCpu = cpuTimeGet(resource.RUSAGE_CHILDREN) - self.childCpuStart
+        networkWait = max(0.0, sum(tool[1] - tool[2] for tool in self.tools.values()))
+        other = max(0.0, wall - selfCpu - childCpu - networkWait)
+        self.profile.dump_stats(self.pstatsFilename)
+
+        print('\nprofile: %.2fs wall, cProfile stats saved to %s' % (wall, self.pstatsFilename),
+              file=sys.stderr)
+        for label, seconds in (('python cpu', selfCpu), ('child cpu', childCpu),
+                               ('network wait', networkWait), ('other', other)):
+            print('    %-14s %8.2fs %6.1f%%' % (label, seconds, 100.0 * seconds / wall if wall else 0),
+                  file=sys.stderr)
+        for name, (commands, toolWall, toolCpu) in self.tools.items():
+            print('    %-14s %8d commands %8.2fs wall %8.2fs cpu' % (name, commands, toolWall, toolCpu),
+                  file=sys.stderr)
+        stats = pstats.Stats(self.profile, stream=sys.stderr)
+        stats.sort_stats('tottime').print_stats(PROFILE_TOP_FUNCTIONS)
+
+
+class Timeline(object):
+    '''
+    --timeline: Chrome trace-event spans ("ph": "X", microseconds) of the
+    commands run against the agent and of the operations around them.  Each
+    agent is a process lane; operations and serial commands run on thread 0,
+    the commands of one snmpRunParallel() batch on threads 1..n so their
+    overlap shows.  A command span is named after its tool, its category is
+    the innermost operation and its args carry the tags of every enclosing
+    operation, the objects it touches, its exit code and its attempt number
+    in the operation (the tier, for the special char formats).
+
+    Events are written as they happen in the JSON array format, which the
+    viewers read without the closing bracket, so a run that dies half way
+    still leaves a timeline.
+    '''
+    instance = None
+
+    def __init__(self, timelineFilename):
+        self.timelineFile = open(timelineFilename, 'w')
+        self.timelineFile.write('[\n')
+        self.started = time.time()
+        self.pids = {}
+        #open operations, [name, tags, start, commands so far]
+        self.stack = []
+
+    def eventWrite(self, event):
+        self.timelineFile.write(json.dumps(event, sort_keys=True) + ',\n')
+
+    def pidGet(self):
+        address = agent or 'local'
+        if address not in self.pids:
+            self.pids[address] = len(self.pids) + 1
+            self.eventWrite({'name': 'process_name', 'ph': 'M', 'pid': self.pids[address], 'tid': 0,
+                             'args': {'name': address}})
+        return self.pids[address]
+
+    def tagsGet(self):
+        tags = {'agent': agent}
+        for name, operationTags, start, commands in self.stack:
+            tags.update(operationTags)
+        return tags
+
+    def spanWrite(self, name, category, start, end, args, tid=0):
+        self.eventWrite({'name': name, 'cat': category, 'ph': 'X', 'pid': self.pidGet(), 'tid': tid,
+                         'ts': int((start - self.started) * 1e6), 'dur': int((end - start) * 1e6),
+                         'args': args})
+
+    def commandWrite(self, cmd, start, end, returncode, tid=0):
+        args = self.tagsGet()
+        args.update({'cmd': cmd, 'rc': returncode, 'objects': SYMBOL_PATTERN.findall(cmd)})
+        category = 'snmp'
+        if self.stack:
+            self.stack[-1][3] += 1
+            category = self.stack[-1][0]
+            args['attempt'] = self.stack[-1][3]
+        self.spanWrite(cmd.split(' ', 1)[0], category, start, end, args, tid)
+
+    def close(self):
+        end = {'name': 'end', 'ph': 'i', 's': 'g', 'pid': self.pidGet(), 'tid': 0,
+               'ts': int((time.time() - self.started) * 1e6)}
+        self.timelineFile.write(json.dumps(end, sort_keys=True) + '\n]\n')
+        self.timelineFile.close()
+        self.timelineFile = None
+
+
+class ProgressOutput(object):
+    '''
+    stdout while the --progress status line is up on a terminal: the line is
+    cleared before anything else is printed and drawn again on the next update
+    '''
+
+    def __init__(self, stream, progress):
+        self.stream = stream
+        self.progress = progress
+
+    def write(self, text):
+        self.progress.statusClear()
+        self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Progress(object):
+    '''
+    --progress: completed units out of the planned ones (the scripts say what
+    a unit is, a special char on a leaf for pyschar/pycreate, an entry for
+    makemeone), the rolling rate of sets taken by the agent, the average
+    command latency and an ETA from the rate the units were completed at over
+    the last PROGRESS_WINDOW_SECONDS, so it follows the agent getting slower
+    or faster.  On a terminal a status line is redrawn at most every
+    PROGRESS_REFRESH_SECONDS, otherwise a key=value line is printed every
+    --progress=SECONDS (default PROGRESS_INTERVAL_SECONDS) so logs stay short.
+    '''
+    instance = None
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.time()
+        self.total = 0
+        self.done = 0
+        self.current = ''
+        #(time, units) of the recent advances and (time, latency) of the recent commands
+        self.units = deque()
+        self.commands = deque()
+        self.sets = 0
+        self.lastShown = 0
+        self.statusShown = False
+        #the pycreate --pipeline stages update it from two threads
+        self.lock = threading.Lock()
+        self.tty = sys.stdout.isatty()
+        self.stdout = sys.stdout
+        if self.tty:
+            sys.stdout = ProgressOutput(self.stdout, self)
+
+    def plan(self, units):
+        self.total += units
+        self.show()
+
+    def advance(self, units, current=None):
+        self.done += units
+        self.units.append((time.time(), units))
+        if current:
+            self.current = current
+        self.show()
+
+    def commandDone(self, tool, latency):
+        now = time.time()
+        self.commands.append((now, latency))
+        if tool == 'snmpset':
+            self.sets += 1
+        self.show()
+
+    def windowTrim(self, now):
+        for window in (self.units, self.commands):
+            while window and window[0][0] < now - PROGRESS_WINDOW_SECONDS:
+                window.popleft()
+
+    def statsGet(self):
+        '''
+        (commands per second, average latency, eta seconds or None) over the window
+        '''
+        now = time.time()
+        self.windowTrim(now)
+        span = min(now - self.started, PROGRESS_WINDOW_SECONDS) or 1e-6
+        rate = len(self.commands) / span
+        latency = sum(seconds for end, seconds in self.commands) / len(self.commands) if self.commands else 0.0
+        unitRate = sum(units for end, units in self.units) / span
+        eta = (self.total - self.done) / unitRate if unitRate and self.total > self.done else None
+        return rate, latency, eta
+
+    def durationFormat(self, seconds):
+        if seconds is None:
+            return '?'
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return '%dh%02dm' % (hours, minutes) if hours else '%dm%02ds' % (minutes, seconds)
+
+    def statusClear(self):
+        if self.statusShown:
+            self.stdout.write('\r\x1b[K')
+            self.statusShown = False
+
+    def show(self, final=False):
+        now = time.time()
+        if not final and now - self.lastShown < (PROGRESS_REFRESH_SECONDS if self.tty else self.interval):
+            return
+        #another thread is drawing it already
+        if not self.lock.acquire(final):
+            return
+        try:
+            self.lastShown = now
+            self.draw(now, final)
+        finally:
+            self.lock.release()
+
+    def draw(self, now, final):
+        rate, latency, eta = self.statsGet()
+        percent = 100.0 * self.done / self.total if self.total else 0.0
+        if self.tty:
+            self.statusClear()
+            self.stdout.write('[%d/%d %5.1f%%] %.1f cmds/s %dms/cmd %d sets  ETA %s  %s' % (
+                self.done, self.total, percent, rate, latency * 1000, self.sets,
+                'done' if final else self.durationFormat(eta), self.current))
+            self.statusShown = True
+            if final:
+                self.stdout.write('\n')
+                self.statusShown = False
+        else:
+            self.stdout.write('progress units=%d total=%d percent=%.1f cmds_per_s=%.2f latency_ms=%d '
+                              'sets=%d elapsed_s=%d eta_s=%s current=%s\n' % (
+                                  self.done, self.total, percent, rate, latency * 1000, self.sets,
+                                  now - self.started, '0' if final else ('%d' % eta if eta else '-'),
+                                  self.current or '-'))
+        self.stdout.flush()
+
+    def close(self):
+        self.show(final=True)
+        if sys.stdout is not self.stdout and isinstance(sys.stdout, ProgressOutput):
+            sys.stdout = self.stdout
+
+
+def progressPlan(units):
+    '''
+    adds units to the total the --progress ETA counts down from, or takes
+    them back with a negative number of units
+    '''
+    if Progress.instance:
+        with stateLock:
+            Progress.instance.plan(units)
+
+
+def progressAdvance(units=1, current=None):
+    '''
+    marks units done, current being what is worked on ('MODULE::leaf')
+    '''
+    if Progress.instance:
+        with stateLock:
+            Progress.instance.advance(units, current)
+
+
+@contextmanager
+def operation(name, obj=None, char=None):
+    '''
+    Groups the commands run inside it into one --timeline operation span,
+    tagged with the module and leaf of obj ('MODULE::leaf') and the special
+    char.  Operations nest.  Does nothing without --timeline.
+    '''
+    timeline = Timeline.instance
+    if not timeline:
+        yield
+        return
+    tags = {}
+    if obj:
+        tags['module'], sep, tags['leaf'] = obj.partition('::')
+    if char is not None:
+        tags['char'] = char
+    timeline.stack.append([name, tags, time.time(), 0])
+    try:
+        yield
+    finally:
+        start = timeline.stack.pop()[2]
+        #the run may have ended inside the operation
+        if timeline.timelineFile:
+            args = timeline.tagsGet()
+            args.update(tags)
+            timeline.spanWrite(name, 'operation', start, time.time(), args)
+
+
+def confObjectNamesGet(configData):
+    '''
+    Every 'MODULE::leaf' name used by a conf file, table confs (pycreate/makemeone)
+    and leaf confs (pyschar) alike.
+    '''
+    names = []
+    for module, children in configData.items():
+        if isinstance(children, list):
+            names.extend('%s::%s' % (module, leaf) for leaf in children)
+            continue
+        for entry, obj in children.items():
+            names.extend('%s::%s' % (module, leaf) for leaf in obj if leaf != 'index')
+    return names
+
+
+def oidsResolve(names, known=None):
+    '''
+    Turns 'MODULE::leaf' names into numeric OID strings ('.1.3.6...').  Names
+    found in known are used as-is, the rest are resolved with one snmptranslate
+    per module rather than one per name.  Raises ValueError for names that
+    cannot be resolved.
+    '''
+    known = known or {}
+    resolved = {}
+    missing = OrderedDict()
+
+    for name in names:
+        if name in known:
+            resolved[name] = known[name]
+        else:
+            module = name.split('::')[0]
+            missing.setdefault(module, []).append(name)
+
+    for module, moduleNames in missing.items():
+        cmd = 'snmptranslate -On %s' % ' '.join(moduleNames)
+        try:
+            output = snmpRun(cmd, stderr=STDOUT)
+        except CalledProcessError:
+            raise ValueError("cannot resolve objects of %s" % module)
+        lines = [line.strip() for line in output.decode('latin-1').splitlines()
+                 if line.startswith('.')]
+        if len(lines) != len(moduleNames):
+            raise ValueError('snmptranslate returned %d OIDs for %d objects of %s'
+                             % (len(lines), len(moduleNames), module))
+        for name, line in zip(moduleNames, lines):
+            resolved[name] = str(line)
+
+    return resolved
+
+
+class OidMap(object):
+    '''
+    MODULE::leaf to numeric OID map used by --numeric.  Names that are not in
+    the map file are resolved on first use and the file is rewritten at exit.
+    '''
+    instance = None
+
+    def __init__(self, oidmapFilename):
+        self.oidmapFilename = oidmapFilename
+        self.oids = {}
+        self.changed = False
+        try:
+            with open(oidmapFilename) as oidmapFile:
+                self.oids = json.load(oidmapFile)
+        except IOError:
+            pass
+
+    def oidGet(self, name):
+        if name not in self.oids:
+            try:
+                self.oids.update(oidsResolve([name]))
+            except ValueError:
+                #leave it symbolic, net-SNMP will complain about it
+                return name
+            self.changed = True
+        return self.oids[name]
+
+    def cmdRewrite(self, cmd):
+        '''
+        numeric OIDs and no MIB loading for the agent tools, and snmptranslate -On
+        answered from the map when it can be
+        '''
+        tool = cmd.split(' ', 1)[0]
+        if tool in AGENT_TOOLS:
+            cmd = SYMBOL_PATTERN.sub(lambda match: self.oidGet(match.group(1)), cmd)
+            return "%s -m ''%s" % (tool, cmd[len(tool):])
+        return cmd
+
+    def translateAnswer(self, cmd):
+        match = re.match(r"^snmptranslate -On (\S+::\S+?)( 2>/dev/null)?$", cmd)
+        if match and match.group(1) in self.oids:
+            return self.oids[match.group(1)] + '\n'
+        return None
+
+    def save(self):
+        if self.changed:
+            with open(self.oidmapFilename, 'w') as oidmapFile:
+                json.dump(self.oids, oidmapFile, indent=4, sort_keys=True)
+            self.changed = False
+
+
+def usmCmdGet(cmd):
+    '''
+    the command that actually runs: with --v3-user the agent tools are switched
+    to v3 here, after recording, so traces never hold keys or passwords
+    '''
+    if agent and options.get('v3-user') and cmd.split(' ', 1)[0] in AGENT_TOOLS:
+        return sessionGet().usmCmdRewrite(cmd)
+    return cmd
+
+
+def snmpRun(cmd, stderr=None, check=True):
+    '''
+    Drop-in for check_output(cmd, stderr=stderr, shell=True) that records or
+    replays the command when --record/--replay are given.  With check=False the
+    output is returned even when the command fails, like a shell pipeline would.
+    '''
+    symbolicCmd = cmd
+    if OidMap.instance:
+        answer = OidMap.instance.translateAnswer(cmd)
+        if answer is not None:
+            return answer.encode('latin-1')
+        cmd = OidMap.instance.cmdRewrite(cmd)
+
+    if Replayer.instance:
+        returncode, output = Replayer.instance.replay(cmd)
+    else:
+        mark = Profiler.instance.childrenStart() if Profiler.instance else None
+        start = time.time()
+        proc = Popen(usmCmdGet(cmd), stdout=PIPE, stderr=stderr, shell=True)
+        output = proc.communicate()[0]
+        returncode = proc.returncode
+        end = time.time()
+        if mark:
+            Profiler.instance.childrenEnd(mark, [cmd])
+        with stateLock:
+            if Timeline.instance and agent and cmd.split(' ', 1)[0] in AGENT_TOOLS:
+                Timeline.instance.commandWrite(symbolicCmd, start, end, returncode)
+            if Recorder.instance:
+                Recorder.instance.record(cmd, returncode, output)
+            if agent and cmd.split(' ', 1)[0] in AGENT_TOOLS:
+                sessionGet().commandCount(returncode)
+                if Progress.instance:
+                    Progress.instance.commandDone(cmd.split(' ', 1)[0], end - start)
+
+    if check and returncode:
+        raise CalledProcessError(returncode, cmd, output)
+    return output
+
+
+def snmpRunParallel(cmds, stderr=None):
+    '''
+    Runs all of cmds at the same time and returns their (returncode, output)
+    pairs in the same order as cmds.
+    '''
+    symbolicCmds = cmds
+    if OidMap.instance:
+        cmds = [OidMap.instance.cmdRewrite(cmd) for cmd in cmds]
+
+    if Replayer.instance:
+        return [Replayer.instance.replay(cmd) for cmd in cmds]
+
+    mark = Profiler.instance.childrenStart() if Profiler.instance else None
+    start = time.time()
+    procs = [Popen(usmCmdGet(cmd), stdout=PIPE, stderr=stderr, shell=True) for cmd in cmds]
+    outputs = []
+    ends = []
+    for proc in procs:
+        outputs.append(proc.communicate()[0])
+        ends.append(time.time())
+    if mark:
+        Profiler.instance.childrenEnd(mark, cmds)
+    results = []
+    with stateLock:
+        if Timeline.instance and agent:
+            for tid, (cmd, proc, end) in enumerate(zip(symbolicCmds, procs, ends)):
+                Timeline.instance.commandWrite(cmd, start, end, proc.returncode, tid + 1)
+        for cmd, proc, output in zip(cmds, procs, outputs):
+            results.append((proc.returncode, output))
+            if Recorder.instance:
+                Recorder.instance.record(cmd, proc.returncode, output)
+            if agent:
+                sessionGet().commandCount(proc.returncode)
+        if Progress.instance and agent:
+            for cmd, end in zip(cmds, ends):
+                Progress.instance.commandDone(cmd.split(' ', 1)[0], end - start)
+    return results
+
+
+def tiersRun(tierCmds):
+    '''
+    Speculative version of the nested try/except tier logic in pyschar/pycreate:
+    all tier commands go out at once and the first tier, in tier order, that
+    succeeded is returned (0 for the plain char).  Returns None when every
+    tier failed.  Only use this on leaves that already exist, the tiers race
+    each other on the agent so they must not depend on one another.
+    '''
+    for tier, (returncode, output) in enumerate(snmpRunParallel(tierCmds, stderr=STDOUT)):
+        if returncode == 0:
+            return tier
+    return None
+
+
+def setValueGet(cmd, obj):
+    '''
+    Returns the string an snmpset command line sets on obj ('MODULE::leaf.index'),
+    taking the shell quotes off, or None if obj is not set as a string by cmd.
+    '''
+    match = re.search(r" %s s (['\"])(.*?)\1(?= |$)" % re.escape(obj), cmd)
+    if match is None:
+        return None
+    return match.group(2)
+
+
+def hexStringDecode(text):
+    '''
+    '61 62 63' (an OCTET STRING printed with -Ox) to 'abc', None for anything else
+    '''
+    tokens = text.replace('"', ' ').split()
+    for token in tokens:
+        if not re.match(r'^[0-9A-Fa-f]{2}$', token):
+            return None
+    return bytes(bytearray(int(token, 16) for token in tokens))
+
+
+def snmpGetBatch(ip, objs, community='public'):
+    '''
+    Reads objs with as few snmpget commands as possible, MAX_GET_VARBINDS
+    varbinds per GET, and returns the printed value of each one in the same
+    order as objs (None if the GET failed).  Strings are printed in hex (-Ox),
+    use hexStringDecode() on them.
+    '''
+    values = []
+    for start in range(0, len(objs), MAX_GET_VARBINDS):
+        chunk = objs[start:start + MAX_GET_VARBINDS]
+        cmd = "snmpget -v 2c -c %s -Onqx %s %s" % (community, ip, ' '.join(chunk))
+        try:
+            with operation('read-back'):
+                output = snmpRun(cmd, stderr=STDOUT)
+        except CalledProcessError:
+            values.extend([None] * len(chunk))
+            continue
+
+        #every varbind starts on a new line with its numeric OID, long hex
+        #strings carry on over the following lines
+        printed = []
+        for line in output.decode('latin-1').splitlines():
+            if line.startswith('.'):
+                printed.append(line.partition(' ')[2])
+            elif printed:
+                printed[-1] = printed[-1] + ' ' + line
+        printed.extend([None] * (len(chunk) - len(printed)))
+        values.extend(printed[:len(chunk)])
+
+    return values
+
+
+def daemonForward(argv):
+    '''
+    Thin client side of pyprobed.py.  With --daemon[=socketFile] in argv the
+    script's arguments, working directory and piped stdin are sent to the
+    daemon, which runs the job in its warm process and streams the output
+    back.  Returns the job's exit code, or None when there is no --daemon
+    option or no daemon listening (after a warning), in which case the script
+    carries on by itself.
+    '''
+    socketFilename = None
+    jobArgv = []
+    for arg in argv[1:]:
+        if arg == '--daemon' or arg.startswith('--daemon='):
+            socketFilename = arg.partition('=')[2] or DAEMON_SOCKET
+        else:
+            jobArgv.append(arg)
+    if socketFilename is None:
+        return None
+
+    script = os.path.splitext(os.path.basename(argv[0]))[0]
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socketFilename)
+    except socket.error as err:
+        print('WARNING: no daemon on %s (%s), running locally' % (socketFilename, err),
+              file=sys.stderr)
+        client.close()
+        return None
+
+    #read only once connected, the local fallback still needs the piped input
+    stdin = '' if sys.stdin.isatty() else sys.stdin.read()
+    request = {'job': 'run', 'script': script, 'argv': jobArgv, 'cwd': os.getcwd(),
+               'stdin': stdin}
+    client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+    returncode = 1
+    for line in client.makefile('rb'):
+        message = json.loads(line.decode('utf-8'))
+        if 'out' in message:
+            sys.stdout.write(message['out'])
+            sys.stdout.flush()
+        elif 'exit' in message:
+            returncode = message['exit']
+    client.close()
+    return returncode
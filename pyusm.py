@@ -0,0 +1,200 @@
+#!/usr/bin/python
+
+"""===================================================================================
+pyusm.py
+
+Description:
+    SNMPv3 User-based Security Model (RFC 3414) pieces used by pytransport.py
+    and pystub.py: the password to key derivation and key localization, the
+    USM security parameters, HMAC-MD5-96/HMAC-SHA-96 message authentication
+    and engineID discovery.
+
+    Every net-SNMP tool launched with -v 3 and passwords first discovers the
+    agent's engineID/boots/time with an extra request, then hashes a megabyte
+    of password per key to localize it.  pytransport.py does both once per
+    agent with the functions here and hands the results to the tools (-e,
+    -Z, -3k, -3K), so only the first command pays for them.
+
+    Privacy (DES/AES) is left to net-SNMP, only the key localization is done here.
+==================================================================================="""
+
+from __future__ import print_function
+import hashlib
+import hmac
+import random
+import socket
+
+import pyber
+
+
+AUTH_PROTOCOLS = {'MD5': hashlib.md5, 'SHA': hashlib.sha1}
+PRIV_PROTOCOLS = ('DES', 'AES')
+
+#msgFlags bits and the USM security model number
+FLAG_AUTH = 0x01
+FLAG_PRIV = 0x02
+FLAG_REPORTABLE = 0x04
+SECURITY_MODEL_USM = 3
+
+#HMAC-*-96 authentication parameters are the first 12 bytes of the digest
+AUTH_PARAMS_LENGTH = 12
+PASSWORD_EXPANSION = 1048576
+MAX_MESSAGE_SIZE = 65507
+
+#usmStats counters sent back in Reports
+USM_STATS_UNSUPPORTED_SEC_LEVELS = (1, 3, 6, 1, 6, 3, 15, 1, 1, 1, 0)
+USM_STATS_NOT_IN_TIME_WINDOWS = (1, 3, 6, 1, 6, 3, 15, 1, 1, 2, 0)
+USM_STATS_UNKNOWN_USER_NAMES = (1, 3, 6, 1, 6, 3, 15, 1, 1, 3, 0)
+USM_STATS_UNKNOWN_ENGINE_IDS = (1, 3, 6, 1, 6, 3, 15, 1, 1, 4, 0)
+USM_STATS_WRONG_DIGESTS = (1, 3, 6, 1, 6, 3, 15, 1, 1, 5, 0)
+
+#(protocol, password): master key, the expensive part of the derivation
+masterKeys = {}
+
+
+class UsmError(Exception):
+    pass
+
+
+def passwordToKey(password, protocol):
+    '''
+    RFC 3414 A.2: hash a megabyte of the repeated password
+    '''
+    if (protocol, password) not in masterKeys:
+        if not password:
+            raise UsmError('empty %s password' % protocol)
+        data = bytearray(password.encode('utf-8') if not isinstance(password, bytes) else password)
+        expanded = (data * (PASSWORD_EXPANSION // len(data) + 1))[:PASSWORD_EXPANSION]
+        masterKeys[(protocol, password)] = AUTH_PROTOCOLS[protocol](bytes(expanded)).digest()
+    return masterKeys[(protocol, password)]
+
+
+def keyLocalize(masterKey, engineId, protocol):
+    return AUTH_PROTOCOLS[protocol](masterKey + engineId + masterKey).digest()
+
+
+def localizedKeyGet(password, protocol, engineId):
+    '''
+    the localized key of password for one engine, privacy keys use the
+    authentication protocol's hash
+    '''
+    return keyLocalize(passwordToKey(password, protocol), engineId, protocol)
+
+
+def usmParametersEncode(params):
+    '''
+    Encodes {'engineId', 'boots', 'time', 'userName', 'authParams', 'privParams'}
+    and returns (bytes, offset of the authParams content in them)
+    '''
+    fields = [pyber.tlvEncode(pyber.ASN_OCTET_STR, bytearray(params['engineId'])),
+              pyber.integerEncode(params['boots']),
+              pyber.integerEncode(params['time']),
+              pyber.tlvEncode(pyber.ASN_OCTET_STR, bytearray(params['userName']))]
+    authParams = pyber.tlvEncode(pyber.ASN_OCTET_STR, bytearray(params['authParams']))
+    privParams = pyber.tlvEncode(pyber.ASN_OCTET_STR, bytearray(params['privParams']))
+    encoded = pyber.sequenceEncode(fields + [authParams, privParams])
+
+    contentLength = sum(len(field) for field in fields) + len(authParams) + len(privParams)
+    headerLength = len(encoded) - contentLength
+    authOffset = (headerLength + sum(len(field) for field in fields)
+                  + len(authParams) - len(params['authParams']))
+    return bytes(encoded), authOffset
+
+
+def usmParametersDecode(data):
+    '''
+    Returns the parameters as usmParametersEncode() takes them, plus 'authOffset'
+    '''
+    data = bytearray(data)
+    tag, content, end = pyber.tlvDecode(data, 0)
+    headerLength = end - len(content)
+    items = []
+    pos = 0
+    offsets = []
+    while pos < len(content):
+        itemTag, item, nextPos = pyber.tlvDecode(content, pos)
+        offsets.append(headerLength + nextPos - len(item))
+        items.append(item)
+        pos = nextPos
+    if tag != pyber.ASN_SEQUENCE or len(items) < 6:
+        raise pyber.BerError('bad UsmSecurityParameters')
+    return {'engineId': bytes(items[0]),
+            'boots': pyber.integerDecode(items[1]),
+            'time': pyber.integerDecode(items[2]),
+            'userName': bytes(items[3]),
+            'authParams': bytes(items[4]),
+            'privParams': bytes(items[5]),
+            'authOffset': offsets[4]}
+
+
+def digestGet(message, authKey, protocol):
+    return hmac.new(authKey, bytes(message), AUTH_PROTOCOLS[protocol]).digest()[:AUTH_PARAMS_LENGTH]
+
+
+def messageBuild(msgId, flags, params, scopedPdu, authKey=None, protocol=None):
+    '''
+    Encodes a v3 USM message, authenticated with authKey when the auth flag is set
+    '''
+    params = dict(params)
+    if flags & FLAG_AUTH:
+        params['authParams'] = bytes(bytearray(AUTH_PARAMS_LENGTH))
+    securityParameters, authOffset = usmParametersEncode(params)
+    message = bytearray(pyber.messageEncode({
+        'version': 3, 'msgId': msgId, 'maxSize': MAX_MESSAGE_SIZE, 'flags': flags,
+        'securityModel': SECURITY_MODEL_USM, 'securityParameters': securityParameters,
+        'scopedPdu': scopedPdu}))
+    if flags & FLAG_AUTH:
+        position = message.find(securityParameters) + authOffset
+        message[position:position + AUTH_PARAMS_LENGTH] = digestGet(message, authKey, protocol)
+    return bytes(message)
+
+
+def messageVerify(data, msg, params, authKey, protocol):
+    '''
+    checks the HMAC of a received message decoded with pyber.messageDecode()
+    and usmParametersDecode()
+    '''
+    if len(params['authParams']) != AUTH_PARAMS_LENGTH:
+        return False
+    message = bytearray(data)
+    position = message.find(msg['securityParameters']) + params['authOffset']
+    message[position:position + AUTH_PARAMS_LENGTH] = bytearray(AUTH_PARAMS_LENGTH)
+    return hmac.compare_digest(digestGet(message, authKey, protocol), params['authParams'])
+
+
+def engineDiscover(host, port=161, timeout=1.0, retries=3):
+    '''
+    Sends the empty noAuthNoPriv request of RFC 3414 4 and returns the
+    (engineId, boots, time) of the Report the agent answers with.
+    Raises UsmError when nothing usable comes back.
+    '''
+    msgId = random.randint(1, 0x7fffffff)
+    params = {'engineId': b'', 'boots': 0, 'time': 0, 'userName': b'',
+              'authParams': b'', 'privParams': b''}
+    scopedPdu = {'contextEngineId': b'', 'contextName': b'',
+                 'pdu': {'type': pyber.PDU_GET, 'requestId': msgId, 'varbinds': []}}
+    request = messageBuild(msgId, FLAG_REPORTABLE, params, scopedPdu)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        for attempt in range(retries):
+            sock.sendto(request, (host, port))
+            try:
+                while True:
+                    data = sock.recv(MAX_MESSAGE_SIZE)
+                    try:
+                        msg = pyber.messageDecode(data)
+                        if msg['version'] != 3 or msg['msgId'] != msgId:
+                            continue
+                        params = usmParametersDecode(msg['securityParameters'])
+                    except pyber.BerError:
+                        continue
+                    if not params['engineId']:
+                        raise UsmError('%s:%s sent an empty engineID' % (host, port))
+                    return params['engineId'], params['boots'], params['time']
+            except socket.timeout:
+                continue
+    finally:
+        sock.close()
+    raise UsmError('no engineID discovery answer from %s:%s' % (host, port))
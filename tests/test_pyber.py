@@ -0,0 +1,103 @@
+"""===================================================================================
+test_pyber.py
+
+Description:
+    BER encoding of the values pystub.py answers with, checked against the
+    bytes net-SNMP puts on the wire, and messages that go through
+    messageEncode() and messageDecode() unchanged.
+==================================================================================="""
+
+import binascii
+import unittest
+
+import pyber
+
+
+def hexGet(data):
+    return binascii.hexlify(bytes(data)).decode('ascii')
+
+
+class ValueTest(unittest.TestCase):
+
+    def testOid(self):
+        #sysDescr.0
+        self.assertEqual(hexGet(pyber.oidEncode((1, 3, 6, 1, 2, 1, 1, 1, 0))), '06082b06010201010100')
+        #arcs of more than 7 bits are split in base 128
+        self.assertEqual(hexGet(pyber.oidEncode((1, 3, 6, 1, 4, 1, 6141))), '06072b06010401af7d')
+        self.assertEqual(pyber.oidParse('.1.3.6.1.4.1.6141'), (1, 3, 6, 1, 4, 1, 6141))
+        self.assertEqual(pyber.oidFormat((1, 3, 6, 1, 4, 1, 6141)), '.1.3.6.1.4.1.6141')
+
+    def testInteger(self):
+        self.assertEqual(hexGet(pyber.integerEncode(0)), '020100')
+        self.assertEqual(hexGet(pyber.integerEncode(127)), '02017f')
+        self.assertEqual(hexGet(pyber.integerEncode(128)), '02020080')
+        self.assertEqual(hexGet(pyber.integerEncode(-1)), '0201ff')
+        self.assertEqual(hexGet(pyber.integerEncode(-129)), '0202ff7f')
+        #unsigned types get a leading zero octet rather than going negative
+        self.assertEqual(hexGet(pyber.integerEncode(0xffffffff, pyber.ASN_COUNTER)), '410500ffffffff')
+
+    def testLength(self):
+        self.assertEqual(hexGet(pyber.lengthEncode(127)), '7f')
+        self.assertEqual(hexGet(pyber.lengthEncode(200)), '81c8')
+        self.assertEqual(hexGet(pyber.lengthEncode(1000)), '8203e8')
+
+    def testValueRoundTrip(self):
+        values = [(pyber.ASN_INTEGER, 0), (pyber.ASN_INTEGER, -2147483648), (pyber.ASN_INTEGER, 2147483647),
+                  (pyber.ASN_OCTET_STR, b''), (pyber.ASN_OCTET_STR, b'a#b\x00\xff' * 60),
+                  (pyber.ASN_OBJECT_ID, (1, 3, 6, 1, 4, 1, 6141, 2, 60, 4294967295)),
+                  (pyber.ASN_IPADDRESS, b'\x0a\x00\x00\x01'),
+                  (pyber.ASN_COUNTER, 4294967295), (pyber.ASN_GAUGE, 0), (pyber.ASN_TIMETICKS, 360000),
+                  (pyber.ASN_COUNTER64, 18446744073709551615),
+                  (pyber.ASN_NULL, None), (pyber.SNMP_NOSUCHINSTANCE, None), (pyber.SNMP_ENDOFMIBVIEW, None)]
+        for value in values:
+            tag, content, end = pyber.tlvDecode(pyber.valueEncode(value), 0)
+            self.assertEqual(pyber.valueDecode(tag, content), value)
+
+    def testUnknownTag(self):
+        self.assertRaises(pyber.BerError, pyber.valueEncode, (0x99, 1))
+
+
+class MessageTest(unittest.TestCase):
+
+    def testGetRequest(self):
+        #snmpget -v2c -c public 127.0.0.1 sysDescr.0
+        msg = {'version': 1, 'community': b'public',
+               'pdu': {'type': pyber.PDU_GET, 'requestId': 1, 'errorStatus': 0, 'errorIndex': 0,
+                       'varbinds': [((1, 3, 6, 1, 2, 1, 1, 1, 0), (pyber.ASN_NULL, None))]}}
+        data = pyber.messageEncode(msg)
+        self.assertEqual(hexGet(data), '302602010104067075626c6963a019020101020100020100'
+                                       '300e300c06082b060102010101000500')
+        self.assertEqual(pyber.messageDecode(data), msg)
+
+    def testGetBulk(self):
+        msg = {'version': 1, 'community': b'private',
+               'pdu': {'type': pyber.PDU_GETBULK, 'requestId': 70000, 'errorStatus': 0,
+                       'errorIndex': 25, 'varbinds': [((1, 3, 6, 1, 2, 1, 16), (pyber.ASN_NULL, None))]}}
+        pdu = pyber.messageDecode(pyber.messageEncode(msg))['pdu']
+        self.assertEqual((pdu['nonRepeaters'], pdu['maxRepetitions']), (0, 25))
+
+    def testV3(self):
+        msg = {'version': 3, 'msgId': 12345, 'maxSize': 65507, 'flags': 0x05, 'securityModel': 3,
+               'securityParameters': b'\x30\x00',
+               'scopedPdu': {'contextEngineId': b'\x80\x00\x1f\x88\x04', 'contextName': b'',
+                             'pdu': {'type': pyber.PDU_SET, 'requestId': 7, 'errorStatus': 0,
+                                     'errorIndex': 0,
+                                     'varbinds': [((1, 3, 6, 1, 2, 1, 16, 9, 1, 1, 7, 1),
+                                                   (pyber.ASN_OCTET_STR, b'x' * 300))]}}}
+        self.assertEqual(pyber.messageDecode(pyber.messageEncode(msg)), msg)
+
+        encrypted = dict(msg, encryptedPdu=b'\x01\x02\x03')
+        del encrypted['scopedPdu']
+        self.assertEqual(pyber.messageDecode(pyber.messageEncode(encrypted)), encrypted)
+
+    def testBroken(self):
+        data = pyber.messageEncode({'version': 1, 'community': b'public',
+                                    'pdu': {'type': pyber.PDU_GET, 'requestId': 1,
+                                            'varbinds': [((1, 3, 6, 1), (pyber.ASN_NULL, None))]}})
+        self.assertRaises(pyber.BerError, pyber.messageDecode, data[:-3])
+        self.assertRaises(pyber.BerError, pyber.messageDecode, b'\x02\x01\x00')
+        self.assertRaises(pyber.BerError, pyber.messageDecode, b'\x30\x03\x02\x01\x05')
+
+
+if __name__ == '__main__':
+    unittest.main()
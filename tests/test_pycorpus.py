@@ -0,0 +1,150 @@
+"""===================================================================================
+test_pycorpus.py
+
+Description:
+    the pyschar.py --length-probe search, against agents that enforce the
+    MIB SIZE, a shorter or a longer limit, or no limit at all, and the
+    --corpus class probing and report against leaves that enforce SIZE in
+    octets or in chars, or take no multibyte strings.
+==================================================================================="""
+
+import unittest
+
+import pycorpus
+
+
+CEILING = 4096
+
+
+class Agent(object):
+    '''
+    takes strings from minimum to maximum octets long, counts the sets
+    '''
+
+    def __init__(self, maximum, minimum=1):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.lengths = []
+
+    def accepted(self, length):
+        self.lengths.append(length)
+        return self.minimum <= length <= self.maximum
+
+
+class MaxLengthSearchTest(unittest.TestCase):
+
+    def searchGet(self, agent, sizeMin, sizeMax):
+        return pycorpus.maxLengthSearch(agent.accepted, sizeMin, sizeMax, CEILING)
+
+    def testMibLimit(self):
+        agent = Agent(32)
+        self.assertEqual(self.searchGet(agent, 0, 32), '32')
+        self.assertEqual(agent.lengths, [1, 32, 64, 48, 40, 36, 34, 33])
+
+    def testShorterLimit(self):
+        for limit in (1, 2, 20, 31, 254):
+            agent = Agent(limit)
+            self.assertEqual(self.searchGet(agent, 0, 255), str(limit))
+            #a binary search, not one set per length
+            self.assertTrue(len(agent.lengths) <= 10, agent.lengths)
+
+    def testLongerLimit(self):
+        agent = Agent(300)
+        self.assertEqual(self.searchGet(agent, 0, 255), '300 (MIB 255)')
+        self.assertEqual(agent.lengths[:4], [1, 255, 510, 382])
+
+    def testNoLimit(self):
+        agent = Agent(10 ** 6)
+        self.assertEqual(self.searchGet(agent, 0, 255), '>=%d (MIB 255)' % CEILING)
+        self.assertEqual(agent.lengths, [1, 255, 510, 1020, 2040, 4080, CEILING])
+
+    def testLimitNearCeiling(self):
+        #between the last doubling and the ceiling
+        agent = Agent(4090)
+        self.assertEqual(self.searchGet(agent, 0, 255), '4090 (MIB 255)')
+        self.assertEqual(agent.lengths[:7], [1, 255, 510, 1020, 2040, 4080, CEILING])
+
+    def testMibAboveCeiling(self):
+        agent = Agent(10 ** 6)
+        self.assertEqual(self.searchGet(agent, 0, 8192), '>=8192 (MIB 8192)')
+        self.assertEqual(agent.lengths, [1, 8192])
+
+    def testNothingTaken(self):
+        agent = Agent(0)
+        self.assertEqual(self.searchGet(agent, 0, 255), 'none')
+        self.assertEqual(agent.lengths, [1])
+
+    def testSizeMinimum(self):
+        agent = Agent(16, minimum=8)
+        self.assertEqual(self.searchGet(agent, 8, 32), '16')
+        self.assertEqual(agent.lengths[0], 8)
+        self.assertEqual(min(agent.lengths), 8)
+
+    def testFixedSize(self):
+        self.assertEqual(self.searchGet(Agent(6, minimum=6), 6, 6), '6')
+        #a SIZE maximum below the minimum probe is raised to it
+        self.assertEqual(self.searchGet(Agent(40), 0, 0), '40 (MIB 1)')
+
+
+class Leaf(object):
+    '''
+    a leaf of SIZE (0..maximum) counting its length in octets or in UTF-8
+    chars, that may reject every non-ASCII byte
+    '''
+
+    def __init__(self, maximum, chars=False, asciiOnly=False):
+        self.maximum = maximum
+        self.chars = chars
+        self.asciiOnly = asciiOnly
+        self.probed = []
+
+    def probe(self, label, value, expected):
+        self.probed.append(label)
+        if self.asciiOnly and [byte for byte in bytearray(value) if byte > 0x7f]:
+            return False
+        length = len(value.decode('utf-8')) if self.chars else len(value)
+        return length <= self.maximum
+
+
+class ClassProbeTest(unittest.TestCase):
+
+    def summaryGet(self, name, leaf):
+        corpus = pycorpus.corpusClasses[name]
+        unexpected, probed, conclusive = pycorpus.classProbe(corpus, 0, leaf.maximum, leaf.probe)
+        return pycorpus.classSummaryGet(corpus, unexpected, probed, conclusive)
+
+    def testLengthsOctets(self):
+        #a conforming leaf takes what fits in octets and rejects the rest
+        leaf = Leaf(32)
+        self.assertEqual(self.summaryGet('lengths', leaf), None)
+        self.assertEqual(leaf.probed, ['max-octets-multibyte', 'split-at-max', 'max-chars-multibyte'])
+
+    def testLengthsChars(self):
+        leaf = Leaf(32, chars=True)
+        self.assertEqual(self.summaryGet('lengths', leaf), 'lengths:+split-at-max,+max-chars-multibyte')
+
+    def testLengthsAsciiOnly(self):
+        #rejecting the over SIZE probes is expected, so the class is not all rejected
+        self.assertEqual(self.summaryGet('lengths', Leaf(32, asciiOnly=True)),
+                         'lengths:max-octets-multibyte')
+
+    def testConclusive(self):
+        leaf = Leaf(32, asciiOnly=True)
+        self.assertEqual(self.summaryGet('utf8', leaf), 'utf8:all(3 probed)')
+        self.assertEqual(leaf.probed, ['2-byte', '3-byte', '4-byte'])
+
+    def testTakesEverything(self):
+        leaf = Leaf(255)
+        self.assertEqual(self.summaryGet('utf8', leaf), None)
+        self.assertEqual(len(leaf.probed), 12)
+
+    def testProbesFitSize(self):
+        corpus = pycorpus.corpusClasses['whitespace']
+        probes = list(corpus.probesGet(4, 4))
+        self.assertTrue(probes)
+        self.assertEqual([label for label, value, expected in probes if len(value) != 4], [])
+        self.assertEqual([label for label, value, expected in probes if not expected], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
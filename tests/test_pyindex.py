@@ -0,0 +1,155 @@
+"""===================================================================================
+test_pyindex.py
+
+Description:
+    RFC 2578 7.7 encoding of the conf "index" values from the INDEX clause:
+    the snmptranslate -Td definitions parsed into a spec, the spec read from
+    a pymibparse.py index instead, and the suffixes the values encode to.
+==================================================================================="""
+
+from collections import OrderedDict
+import shutil
+import tempfile
+import unittest
+import os
+
+import pyindex
+import pymibparse
+
+
+ENTRY_DEFINITION = '''
+testEntry OBJECT-TYPE
+  -- FROM	TEST-MIB
+  MAX-ACCESS	not-accessible
+  STATUS	current
+  INDEX		{ testIndex, testAddress, IMPLIED testName }
+'''
+
+TEST_MIB = '''
+TEST-MIB DEFINITIONS ::= BEGIN
+IMPORTS enterprises, OBJECT-TYPE, Integer32, IpAddress FROM SNMPv2-SMI
+        DisplayString, MacAddress FROM SNMPv2-TC;
+testMib OBJECT IDENTIFIER ::= { enterprises 99999 }
+testTable OBJECT-TYPE SYNTAX SEQUENCE OF TestEntry MAX-ACCESS not-accessible STATUS current
+    ::= { testMib 1 }
+testEntry OBJECT-TYPE SYNTAX TestEntry MAX-ACCESS not-accessible STATUS current
+    INDEX { testIndex, testMac, testAddress, IMPLIED testName } ::= { testTable 1 }
+testIndex OBJECT-TYPE SYNTAX Integer32 MAX-ACCESS not-accessible STATUS current ::= { testEntry 1 }
+testMac OBJECT-TYPE SYNTAX MacAddress MAX-ACCESS not-accessible STATUS current ::= { testEntry 2 }
+testAddress OBJECT-TYPE SYNTAX IpAddress MAX-ACCESS not-accessible STATUS current ::= { testEntry 3 }
+testName OBJECT-TYPE SYNTAX DisplayString (SIZE (1..32)) MAX-ACCESS not-accessible STATUS current
+    ::= { testEntry 4 }
+testExtraEntry OBJECT-TYPE SYNTAX TestExtraEntry MAX-ACCESS not-accessible STATUS current
+    AUGMENTS { testEntry } ::= { testMib 2 }
+testScalar OBJECT-TYPE SYNTAX DisplayString MAX-ACCESS read-write STATUS current ::= { testMib 3 }
+END
+'''
+
+
+class DefinitionTest(unittest.TestCase):
+
+    def testIndexClause(self):
+        self.assertEqual(pyindex.indexClauseParse(ENTRY_DEFINITION),
+                         [('testIndex', False), ('testAddress', False), ('testName', True)])
+        self.assertIsNone(pyindex.indexClauseParse('testScalar OBJECT-TYPE\n  SYNTAX\tDisplayString\n'))
+
+    def testSyntax(self):
+        for syntax, expected in (('Integer32 (1..100)', ('integer', None)),
+                                 ('INTEGER {up(1), down(2)}', ('integer', None)),
+                                 ('Unsigned32', ('integer', None)),
+                                 ('IpAddress', ('address', None)),
+                                 ('OBJECT IDENTIFIER', ('oid', None)),
+                                 #snmptranslate prints the SIZE of a string without the keyword
+                                 ('OCTET STRING (6) ', ('string', 6)),
+                                 ('OCTET STRING (0..32) ', ('string', None)),
+                                 ('OCTET STRING (4 | 16) ', ('string', None)),
+                                 ('BITS {a(0)}', (None, None))):
+            self.assertEqual(pyindex.syntaxParse('  SYNTAX\t%s\n' % syntax), expected)
+        self.assertEqual(pyindex.syntaxParse(''), (None, None))
+
+
+class EncodeTest(unittest.TestCase):
+
+    spec = [('testIndex', 'integer', None, False), ('testMac', 'string', 6, False),
+            ('testAddress', 'address', None, False), ('testName', 'string', None, True)]
+
+    def testComponents(self):
+        encode = pyindex.componentEncode
+        self.assertEqual(encode('i', '7', 'integer', None, False), [7])
+        self.assertEqual(encode('i', 7, 'integer', None, False), [7])
+        self.assertEqual(encode('a', '10.0.0.1', 'address', None, False), [10, 0, 0, 1])
+        self.assertEqual(encode('o', '.1.3.6', 'oid', None, False), [3, 1, 3, 6])
+        self.assertEqual(encode('o', '1.3.6', 'oid', None, True), [1, 3, 6])
+        self.assertEqual(encode('s', 'ab', 'string', None, False), [2, 97, 98])
+        self.assertEqual(encode('s', 'ab', 'string', None, True), [97, 98])
+        self.assertEqual(encode('s', '00:11:22:aa:bb:cc', 'string', 6, False), [0, 17, 34, 170, 187, 204])
+        self.assertEqual(encode('s', '00-11-22-aa-bb-cc', 'string', 6, False), [0, 17, 34, 170, 187, 204])
+        self.assertEqual(encode('s', 'abcdef', 'string', 6, False), [97, 98, 99, 100, 101, 102])
+
+    def testBadValues(self):
+        encode = pyindex.componentEncode
+        for args in (('i', 'x', 'integer', None, False), ('a', '10.0.0', 'address', None, False),
+                     ('a', '10.0.0.256', 'address', None, False), ('o', '1.x', 'oid', None, False),
+                     ('s', 'abc', 'string', 6, False)):
+            self.assertRaises(pyindex.IndexEncodeError, encode, *args)
+
+    def testSuffix(self):
+        byName = OrderedDict([('testName', 'ab'), ('testAddress', '10.0.0.1'), ('testIndex', '5'),
+                              ('testMac', '00:00:00:00:00:01')])
+        self.assertEqual(pyindex.suffixEncode(self.spec, byName), '.5.0.0.0.0.0.1.10.0.0.1.97.98')
+        #names that do not match the INDEX objects are taken in INDEX order
+        byOrder = OrderedDict([('ifIndex', '5'), ('mac', '00:00:00:00:00:01'), ('ip', '10.0.0.1'),
+                               ('name', 'ab')])
+        self.assertEqual(pyindex.suffixEncode(self.spec, byOrder), '.5.0.0.0.0.0.1.10.0.0.1.97.98')
+        self.assertRaises(pyindex.IndexEncodeError, pyindex.suffixEncode, self.spec,
+                          OrderedDict([('testIndex', '5')]))
+
+    def testGuess(self):
+        self.assertEqual(pyindex.indexGuess(OrderedDict([('a', '1'), ('b', '2')])), '.1.2')
+        self.assertEqual(pyindex.indexGuess(OrderedDict([('a', '1'), ('userName', 'ab')])), '.97.98')
+
+
+class SuffixGetTest(unittest.TestCase):
+
+    def setUp(self):
+        pyindex.indexSpecs.clear()
+        pyindex.suffixes.clear()
+
+    def tearDown(self):
+        pyindex.indexSpecs.clear()
+        pyindex.suffixes.clear()
+
+    def testCached(self):
+        pyindex.indexSpecs['TEST-MIB::testEntry'] = [('testIndex', 'integer', None, False)]
+        self.assertEqual(pyindex.suffixGet('TEST-MIB', 'testEntry', OrderedDict([('testIndex', '3')])), '.3')
+        self.assertEqual(pyindex.suffixes, {('TEST-MIB::testEntry', (('testIndex', '3'),)): '.3'})
+        self.assertEqual(pyindex.suffixGet('TEST-MIB', 'testEntry', None), '')
+
+    def testGuessed(self):
+        pyindex.indexSpecs['TEST-MIB::testEntry'] = None
+        self.assertEqual(pyindex.suffixGet('TEST-MIB', 'testEntry', OrderedDict([('ifIndex', '3')])), '.3')
+
+    def testMibIndex(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, 'TEST-MIB.my'), 'w') as mibFile:
+                mibFile.write(TEST_MIB)
+            mibIndex, errors = pymibparse.mibIndexBuild(directory, processes=1)
+        finally:
+            shutil.rmtree(directory)
+
+        expected = [('testIndex', 'integer', None, False), ('testMac', 'string', 6, False),
+                    ('testAddress', 'address', None, False), ('testName', 'string', None, True)]
+        self.assertEqual(pyindex.mibIndexSpecGet(mibIndex, 'TEST-MIB', 'testEntry'), expected)
+        self.assertEqual(pyindex.mibIndexSpecGet(mibIndex, 'TEST-MIB', 'testExtraEntry'), expected)
+        self.assertIsNone(pyindex.mibIndexSpecGet(mibIndex, 'TEST-MIB', 'testScalar'))
+        self.assertIsNone(pyindex.mibIndexSpecGet(mibIndex, 'TEST-MIB', 'missingEntry'))
+        self.assertEqual(sorted(pyindex.indexSpecs), ['TEST-MIB::testEntry', 'TEST-MIB::testExtraEntry'])
+        #suffixGet() finds the spec without asking snmptranslate
+        values = OrderedDict([('testIndex', '1'), ('testMac', '00:00:00:00:00:02'),
+                              ('testAddress', '192.168.0.1'), ('testName', 'x')])
+        self.assertEqual(pyindex.suffixGet('TEST-MIB', 'testExtraEntry', values), '.1.0.0.0.0.0.2.192.168.0.1.120')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""===================================================================================
+test_pymatrix.py
+
+Description:
+    bit-packed ResultMatrix rows: the tiers recorded and read back, the
+    union/intersect/diff merges, and report cells parsed and formatted the
+    way pyschar.py and pycreate.py write them, read from reports and from
+    a --results run.
+==================================================================================="""
+
+import shutil
+import tempfile
+import unittest
+import csv
+import os
+
+import pymatrix
+import pyresults
+
+
+PYSCHAR_COLUMNS = ['disallowed-chars']
+PYCREATE_COLUMNS = ['disallowed-chars(CREATE)', 'disallowed-chars(POST-CREATE)']
+
+
+def matrixGet(results, column='disallowed-chars'):
+    '''
+    a matrix from [(leaf, ['#1', '%3', ...]), ...]
+    '''
+    matrix = pymatrix.ResultMatrix()
+    for leaf, tokens in results:
+        matrix.rows[(leaf, column)] = 0
+        for token in tokens:
+            matrix.record(leaf, column, token[0], token)
+    return matrix
+
+
+class MatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.build1 = matrixGet([('A::owner', ['#1', '%3']), ('A::descr', []), ('A::community', ['~2'])])
+        self.build2 = matrixGet([('A::owner', ['#3', '&1']), ('A::descr', ['%1']), ('A::location', ['"3'])])
+
+    def tokensGet(self, matrix):
+        return dict((leaf, matrix.tokensGet(leaf, 'disallowed-chars')) for leaf in matrix.leavesGet())
+
+    def testRecord(self):
+        self.assertEqual(self.tokensGet(self.build1), {'A::owner': ['#1', '%3'], 'A::descr': [],
+                                                      'A::community': ['~2']})
+        self.assertEqual(self.build1.rows[('A::owner', 'disallowed-chars')],
+                         (0b1 << self.build1.positions['#']) | (0b111 << self.build1.positions['%']))
+        #a taken char and '' leave the row as it is
+        self.build1.record('A::descr', 'disallowed-chars', '#', False)
+        self.build1.record('A::descr', 'disallowed-chars', '%', '')
+        self.assertEqual(self.build1.tokensGet('A::descr', 'disallowed-chars'), [])
+        self.assertEqual(self.build1.leavesGet(), ['A::owner', 'A::descr', 'A::community'])
+
+    def testUnion(self):
+        self.assertEqual(self.tokensGet(self.build1.union(self.build2)), {
+            'A::owner': ['#3', '%3', '&1'], 'A::descr': ['%1'], 'A::community': ['~2'], 'A::location': ['"3']})
+
+    def testIntersection(self):
+        self.assertEqual(self.tokensGet(self.build1.intersection(self.build2)), {
+            'A::owner': ['#1'], 'A::descr': [], 'A::community': [], 'A::location': []})
+
+    def testDifference(self):
+        self.assertEqual(self.tokensGet(self.build1.difference(self.build2)), {
+            'A::owner': ['%3'], 'A::descr': [], 'A::community': ['~2'], 'A::location': []})
+        self.assertEqual(self.tokensGet(self.build2.difference(self.build1)), {
+            'A::owner': ['#3', '&1'], 'A::descr': ['%1'], 'A::location': ['"3'], 'A::community': []})
+
+    def testSeveralInputs(self):
+        build3 = matrixGet([('A::owner', ['#2'])])
+        self.assertEqual(self.build1.intersection(self.build2, build3).tokensGet('A::owner', 'disallowed-chars'),
+                         ['#1'])
+        self.assertEqual(self.build1.difference(self.build2, build3).tokensGet('A::owner', 'disallowed-chars'),
+                         ['%3'])
+        #the inputs are left as they were
+        self.assertEqual(self.build1.tokensGet('A::owner', 'disallowed-chars'), ['#1', '%3'])
+
+    def testAlphabets(self):
+        other = pymatrix.ResultMatrix('#%')
+        self.assertRaises(ValueError, self.build1.union, other)
+
+
+class CellTest(unittest.TestCase):
+
+    def testParse(self):
+        self.assertEqual(pymatrix.tokensParse('#1 %3'), [('#', '1'), ('%', '3')])
+        self.assertEqual(pymatrix.tokensParse('# 1 % 3'), [('#', '1'), ('%', '3')])
+        self.assertEqual(pymatrix.tokensParse('None'), [])
+        self.assertEqual(pymatrix.tokensParse(''), [])
+        self.assertEqual(pymatrix.tokensParse(None), [])
+        #chars outside the alphabet are dropped, anything else is an error
+        self.assertEqual(pymatrix.tokensParse('#1 x2'), [('#', '1')])
+        self.assertRaises(ValueError, pymatrix.tokensParse, '#1 %')
+
+    def testFormat(self):
+        self.assertEqual(pymatrix.cellFormat(['#1', '%3'], 'disallowed-chars'), '#1 %3')
+        self.assertEqual(pymatrix.cellFormat([], 'disallowed-chars'), None)
+        self.assertEqual(pymatrix.cellFormat(['#1', '%3'], 'disallowed-chars(CREATE)'), '# 1 % 3')
+        self.assertEqual(pymatrix.cellFormat([], 'disallowed-chars(POST-CREATE)'), 'None')
+
+    def testRoundTrip(self):
+        for column, text in (('disallowed-chars', '#1 %3 ~2'), ('disallowed-chars(CREATE)', '# 1 % 3 ~ 2')):
+            tokens = [char + tier for char, tier in pymatrix.tokensParse(text)]
+            self.assertEqual(pymatrix.cellFormat(tokens, column), text)
+
+
+class ReportTest(unittest.TestCase):
+
+    def setUp(self):
+        csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True,
+                             quoting=csv.QUOTE_MINIMAL, quotechar="'")
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def reportWrite(self, filename, rows):
+        filename = os.path.join(self.directory, filename)
+        with open(filename, 'w') as report:
+            csv.writer(report, dialect='singlequote').writerows(rows)
+        return filename
+
+    def linesGet(self, matrix, columns):
+        filename = os.path.join(self.directory, 'merged.csv')
+        with open(filename, 'w') as out:
+            pymatrix.reportWrite(matrix, columns, out)
+        with open(filename) as merged:
+            return merged.read().splitlines()
+
+    def testPyschar(self):
+        rows = [['MODULE::leafName', 'disallowed-chars', 'max-length'],
+                ['RMON-MIB::etherStatsOwner', '#1 %3', '127'],
+                ['RMON-MIB::eventDescription', '', '127']]
+        matrix, columns = pymatrix.reportRead(self.reportWrite('pyschar.csv', rows))
+        self.assertEqual(columns, PYSCHAR_COLUMNS)
+        self.assertEqual(self.linesGet(matrix, columns), [
+            'MODULE::leafName\tdisallowed-chars', 'RMON-MIB::etherStatsOwner\t#1 %3',
+            'RMON-MIB::eventDescription\t'])
+
+    def testPycreate(self):
+        rows = [['MODULE::leafName'] + PYCREATE_COLUMNS,
+                ['RMON-MIB::eventDescription.5', '# 1', 'None'],
+                ['RMON-MIB::eventCommunity.5', 'None', '% 3']]
+        old, columns = pymatrix.reportRead(self.reportWrite('old.csv', rows))
+        rows[2][2] = '% 3 ~ 1'
+        new, columns = pymatrix.reportRead(self.reportWrite('new.csv', rows))
+        self.assertEqual(columns, PYCREATE_COLUMNS)
+        self.assertEqual(self.linesGet(new.difference(old), columns), [
+            'MODULE::leafName\tdisallowed-chars(CREATE)\tdisallowed-chars(POST-CREATE)',
+            'RMON-MIB::eventDescription.5\tNone\tNone', 'RMON-MIB::eventCommunity.5\tNone\t~ 1'])
+
+    def testRun(self):
+        databaseFilename = os.path.join(self.directory, 'results.db')
+        store = pyresults.ResultsStore(databaseFilename, 'pycreate', [],
+                                       lambda: ('10.0.0.1', '8.1'))
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '#', 'create', 1, 0.1)
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '%', 'post-create', 3, 0.1)
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '~', 'create', 0, 0.1)
+        store.close()
+        matrix, columns = pymatrix.runRead(databaseFilename, store.run['run'])
+        self.assertEqual(columns, PYCREATE_COLUMNS)
+        self.assertEqual([(leaf, [matrix.tokensGet(leaf, column) for column in columns])
+                          for leaf in matrix.leavesGet()],
+                         [('RMON-MIB::eventDescription', [['#1'], ['%3']])])
+        self.assertRaises(ValueError, pymatrix.runRead, databaseFilename, 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
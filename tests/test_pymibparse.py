@@ -0,0 +1,215 @@
+"""===================================================================================
+test_pymibparse.py
+
+Description:
+    parsing of the SMI constructs pyoids and pystub rely on (IMPORTS, OBJECT
+    IDENTIFIER assignments, textual conventions, INDEX/IMPLIED/AUGMENTS,
+    SIZE ranges), and OIDs and base types resolved across modules by
+    mibIndexBuild() from a directory of MIB files.
+==================================================================================="""
+
+import shutil
+import tempfile
+import unittest
+import os
+
+import pymibparse
+
+
+BASE_MIB = '''
+TEST-TC-MIB DEFINITIONS ::= BEGIN
+IMPORTS
+    MODULE-IDENTITY, enterprises FROM SNMPv2-SMI
+    TEXTUAL-CONVENTION FROM SNMPv2-TC;
+
+testTc MODULE-IDENTITY
+    LAST-UPDATED "202601010000Z"
+    ORGANIZATION "test"
+    CONTACT-INFO "test"
+    DESCRIPTION "a module ::= { with } braces in its text"
+    ::= { enterprises 99999 }
+
+-- a comment with ::= { 1 2 } in it
+TestName ::= TEXTUAL-CONVENTION
+    DISPLAY-HINT "255a"
+    STATUS current
+    DESCRIPTION "a name"
+    SYNTAX OCTET STRING (SIZE (1..32))
+
+TestMac ::= OCTET STRING (SIZE (6))
+END
+'''
+
+TABLE_MIB = '''
+TEST-TABLE-MIB DEFINITIONS ::= BEGIN
+IMPORTS
+    OBJECT-TYPE, Integer32 FROM SNMPv2-SMI
+    DisplayString, RowStatus FROM SNMPv2-TC
+    testTc, TestName, TestMac FROM TEST-TC-MIB;
+
+testObjects OBJECT IDENTIFIER ::= { testTc 1 }
+
+testTable OBJECT-TYPE
+    SYNTAX SEQUENCE OF TestEntry
+    MAX-ACCESS not-accessible
+    STATUS current
+    DESCRIPTION "a table"
+    ::= { testObjects 1 }
+
+testEntry OBJECT-TYPE
+    SYNTAX TestEntry
+    MAX-ACCESS not-accessible
+    STATUS current
+    DESCRIPTION "a row"
+    INDEX { testIndex, IMPLIED testName }
+    ::= { testTable 1 }
+
+TestEntry ::= SEQUENCE { testIndex Integer32, testName TestName, testMac TestMac,
+                         testDescr DisplayString, testStatus RowStatus }
+
+testIndex OBJECT-TYPE
+    SYNTAX Integer32 (1..100)
+    MAX-ACCESS not-accessible
+    STATUS current
+    DESCRIPTION "index"
+    ::= { testEntry 1 }
+
+testName OBJECT-TYPE
+    SYNTAX TestName
+    MAX-ACCESS not-accessible
+    STATUS current
+    DESCRIPTION "index"
+    ::= { testEntry 2 }
+
+testMac OBJECT-TYPE
+    SYNTAX TestMac
+    MAX-ACCESS read-create
+    STATUS current
+    DESCRIPTION "mac"
+    DEFVAL { '000000000000'H }
+    ::= { testEntry 3 }
+
+testDescr OBJECT-TYPE
+    SYNTAX DisplayString (SIZE (0..64))
+    MAX-ACCESS read-create
+    STATUS current
+    DESCRIPTION "descr"
+    ::= { testEntry 4 }
+
+testStatus OBJECT-TYPE
+    SYNTAX RowStatus
+    MAX-ACCESS read-create
+    STATUS current
+    DESCRIPTION "status"
+    ::= { testEntry 5 }
+
+testStatsEntry OBJECT-TYPE
+    SYNTAX TestStatsEntry
+    MAX-ACCESS not-accessible
+    STATUS current
+    DESCRIPTION "more columns"
+    AUGMENTS { testEntry }
+    ::= { testObjects 2 }
+
+testScalar OBJECT-TYPE
+    SYNTAX OCTET STRING
+    MAX-ACCESS read-only
+    STATUS current
+    DESCRIPTION "read-only"
+    ::= { testObjects 3 }
+END
+'''
+
+
+class TextParseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.module, = pymibparse.textParse(TABLE_MIB)
+
+    def testImports(self):
+        self.assertEqual(self.module['name'], 'TEST-TABLE-MIB')
+        self.assertEqual(self.module['imports']['TestName'], 'TEST-TC-MIB')
+        self.assertEqual(self.module['imports']['RowStatus'], 'SNMPv2-TC')
+
+    def testObjects(self):
+        objects = self.module['objects']
+        self.assertEqual(list(objects)[:3], ['testObjects', 'testTable', 'testEntry'])
+        self.assertEqual(objects['testObjects']['value'], [('testTc', None), (None, 1)])
+        self.assertEqual(objects['testEntry']['index'], [('testIndex', False), ('testName', True)])
+        self.assertEqual(objects['testStatsEntry']['augments'], 'testEntry')
+        self.assertEqual(objects['testDescr']['access'], 'read-create')
+        self.assertEqual(objects['testDescr']['sizes'], [(0, 64)])
+        self.assertEqual(objects['testIndex']['ranges'], [(1, 100)])
+
+    def testTypes(self):
+        module, = pymibparse.textParse(BASE_MIB)
+        self.assertEqual(list(module['objects']), ['testTc'])
+        self.assertEqual(module['types']['TestName']['syntax'], 'OCTET STRING')
+        self.assertEqual(module['types']['TestName']['sizes'], [(1, 32)])
+        self.assertEqual(module['types']['TestMac']['sizes'], [(6, 6)])
+
+
+class MibIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for filename, text in (('TEST-TC-MIB.my', BASE_MIB), ('TEST-TABLE-MIB.my', TABLE_MIB),
+                               ('BROKEN-MIB.txt', 'BROKEN-MIB DEFINITIONS ::= BEGIN\nbroken OBJECT')):
+            with open(os.path.join(self.directory, filename), 'w') as mibFile:
+                mibFile.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testResolve(self):
+        index, errors = pymibparse.mibIndexBuild(self.directory, ['TEST-TABLE-MIB'], processes=1)
+        self.assertEqual(sorted(index.modules), ['TEST-TABLE-MIB', 'TEST-TC-MIB'])
+        record = index.objectGet('TEST-TABLE-MIB', 'testName')
+        self.assertEqual(record['oid'], (1, 3, 6, 1, 4, 1, 99999, 1, 1, 1, 2))
+        self.assertEqual((record['baseType'], record['sizes']), ('OCTET STRING', [(1, 32)]))
+        #a textual convention of another module, and SNMPv2-TC ones from the builtin table
+        self.assertEqual(index.objectGet('TEST-TABLE-MIB', 'testMac')['sizes'], [(6, 6)])
+        self.assertEqual(index.objectGet('TEST-TABLE-MIB', 'testDescr')['sizes'], [(0, 64)])
+        self.assertEqual(index.objectGet('TEST-TABLE-MIB', 'testStatus')['baseType'], 'INTEGER')
+        #imported names resolve to the record of the module that defines them
+        self.assertEqual(index.objectGet('TEST-TABLE-MIB', 'testTc')['module'], 'TEST-TC-MIB')
+
+    def testObjectsUnder(self):
+        index, errors = pymibparse.mibIndexBuild(self.directory, processes=1)
+        names = [record['name'] for record in index.objectsUnder(index.rootOidGet('TEST-TABLE-MIB', 'testObjects'))]
+        self.assertEqual(names, ['testTable', 'testEntry', 'testIndex', 'testName', 'testMac',
+                                 'testDescr', 'testStatus', 'testStatsEntry', 'testScalar'])
+        writable = [record['name'] for record in index.objectsUnder((1, 3, 6, 1, 4, 1, 99999))
+                    if pymibparse.writableStringLeaf(record)]
+        self.assertEqual(writable, ['testMac', 'testDescr'])
+        self.assertEqual(index.rootOidGet('TEST-TABLE-MIB', '.1.3.6.1.4.1.99999'), (1, 3, 6, 1, 4, 1, 99999))
+
+    def testErrors(self):
+        index, errors = pymibparse.mibIndexBuild(self.directory, ['TEST-TABLE-MIB', 'MISSING-MIB'], processes=1)
+        #the broken file is reported and skipped, the others still compile
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith(os.path.join(self.directory, 'BROKEN-MIB.txt')))
+        self.assertEqual(errors[1], 'module MISSING-MIB not found in %s' % self.directory)
+        self.assertTrue(index.objectGet('TEST-TABLE-MIB', 'testScalar'))
+        emptyDirectory = tempfile.mkdtemp()
+        try:
+            self.assertRaises(pymibparse.MibParseError, pymibparse.mibIndexBuild, emptyDirectory)
+        finally:
+            shutil.rmtree(emptyDirectory)
+
+    def testParsedOnce(self):
+        pymibparse.mibIndexBuild(self.directory, processes=1)
+        filename = os.path.join(self.directory, 'TEST-TABLE-MIB.my')
+        modules = pymibparse.parsedFiles[filename][1]
+        pymibparse.mibIndexBuild(self.directory, processes=1)
+        self.assertTrue(pymibparse.parsedFiles[filename][1] is modules)
+
+    def testProcessPool(self):
+        serial, errors = pymibparse.mibIndexBuild(self.directory, processes=1)
+        pymibparse.parsedFiles.clear()
+        pooled, errors = pymibparse.mibIndexBuild(self.directory, processes=2)
+        self.assertEqual(list(serial.objects), list(pooled.objects))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""===================================================================================
+test_pyoidtree.py
+
+Description:
+    OidTree against a plain dict of the same OIDs: lookups, longest-prefix
+    match, subtree order and filters, plus the invariants of the packed
+    layout (sorted children keyed by the first arc of their edge, no empty
+    edges, unnamed single-child nodes compressed away).
+==================================================================================="""
+
+import random
+import unittest
+
+import pyoidtree
+
+
+def oidsGenerate(count, seed):
+    '''
+    OIDs with long shared prefixes, like the columns and instances of a few tables
+    '''
+    generator = random.Random(seed)
+    roots = [(1, 3, 6, 1, 4, 1, 6141, 2, 60), (1, 3, 6, 1, 4, 1, 1271, 2, 1), (1, 3, 6, 1, 2, 1, 16)]
+    oids = set()
+    while len(oids) < count:
+        oid = generator.choice(roots) + tuple(generator.randint(0, 4) for depth in range(generator.randint(0, 5)))
+        oids.add(oid)
+    return sorted(oids)
+
+
+class OidTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.oids = oidsGenerate(500, 7)
+        generator = random.Random(11)
+        self.expected = {}
+        self.tree = pyoidtree.OidTree()
+        inserted = list(self.oids)
+        generator.shuffle(inserted)
+        for position, oid in enumerate(inserted):
+            name = 'TEST-MIB::leaf%d' % position
+            access = ('read-write', 'read-only')[position % 2]
+            self.tree.insert(oid, name, access=access, syntax='OCTET STRING')
+            self.expected[oid] = (name, access)
+
+    def testLookups(self):
+        self.assertEqual(len(self.tree), len(self.expected))
+        for oid, (name, access) in self.expected.items():
+            node = self.tree.get(oid)
+            self.assertEqual((node.name, node.access, node.syntax), (name, access, 'OCTET STRING'))
+            self.assertEqual(self.tree.get('.' + '.'.join(str(arc) for arc in oid)).name, name)
+        self.assertIsNone(self.tree.get((1, 3, 6, 1, 4, 1, 9)))
+        self.assertIsNone(self.tree.get((1, 3, 6)))
+
+    def testLongestPrefixMatch(self):
+        for oid in self.oids[::7]:
+            instance = oid + (9, 9, 9)
+            node, suffix = self.tree.longestPrefixMatch(instance)
+            prefixes = [instance[:depth] for depth in range(len(instance) + 1) if instance[:depth] in self.expected]
+            self.assertEqual(node.name, self.expected[prefixes[-1]][0])
+            self.assertEqual(suffix, instance[len(prefixes[-1]):])
+        self.assertEqual(self.tree.longestPrefixMatch((2, 5)), (None, (2, 5)))
+
+    def testSubtreeIterate(self):
+        self.assertEqual([oid for oid, node in self.tree.subtreeIterate()], self.oids)
+        for root in ((1, 3, 6, 1, 4, 1, 6141), (1, 3, 6, 1, 4, 1, 6141, 2, 60, 1), (1, 3, 6, 1, 2, 1, 16, 2, 3)):
+            expected = [oid for oid in self.oids if oid[:len(root)] == root]
+            self.assertEqual([oid for oid, node in self.tree.subtreeIterate(root)], expected)
+        self.assertEqual(list(self.tree.subtreeIterate((1, 3, 6, 1, 6))), [])
+
+    def testLeavesFilter(self):
+        writable = [oid for oid, node in self.tree.leavesFilter(access=('read-write',))]
+        self.assertEqual(writable, [oid for oid in self.oids if self.expected[oid][1] == 'read-write'])
+        self.assertEqual(list(self.tree.leavesFilter(syntax=('INTEGER',))), [])
+
+    def testLayout(self):
+        tree = self.tree
+        for nodeId in range(1, tree.nodesCount()):
+            self.assertTrue(tree.edgeLengths[nodeId] > 0)
+        for nodeId, (keys, ids) in tree.children.items():
+            self.assertEqual(list(keys), sorted(keys))
+            self.assertEqual(list(keys), [tree.edgeGet(child)[0] for child in ids])
+            #an unnamed node with one child would have been merged into its edge
+            if nodeId and len(ids) == 1:
+                self.assertTrue(tree.nameLengths[nodeId])
+
+    def testPathCompression(self):
+        tree = pyoidtree.OidTree()
+        tree.insert('.1.3.6.1.4.1.6141.2.60.1.1.1.1.1', 'TEST-MIB::deep')
+        self.assertEqual(tree.nodesCount(), 2)
+        tree.insert('.1.3.6.1.4.1.6141.2.61', 'TEST-MIB::other')
+        self.assertEqual(tree.nodesCount(), 4)
+        self.assertEqual(tree.get('.1.3.6.1.4.1.6141.2.60.1.1.1.1.1').name, 'TEST-MIB::deep')
+
+    def testLongEdge(self):
+        tree = pyoidtree.OidTree()
+        oid = (1, 3, 6, 1, 4, 1) + tuple(range(1, 400))
+        tree.insert(oid, 'TEST-MIB::long')
+        tree.insert(oid[:300], 'TEST-MIB::split')
+        self.assertEqual(tree.get(oid).name, 'TEST-MIB::long')
+        node, suffix = tree.longestPrefixMatch(oid[:350])
+        self.assertEqual((node.name, suffix), ('TEST-MIB::split', oid[300:350]))
+
+    def testRepeatedInsert(self):
+        tree = pyoidtree.OidTree()
+        for count in range(3):
+            tree.insert('.1.3.6.1.2.1.1.5', 'SNMPv2-MIB::sysName', access='read-write')
+        size = len(tree.names)
+        tree.insert('.1.3.6.1.2.1.1.5', 'SNMPv2-MIB::sysName', access='read-only')
+        self.assertEqual((len(tree), len(tree.names)), (1, size))
+        self.assertEqual(tree.get('.1.3.6.1.2.1.1.5').access, 'read-only')
+        tree.insert('.1.3.6.1.2.1.1.5', 'SNMPv2-MIB::renamed')
+        self.assertEqual((len(tree), tree.get('.1.3.6.1.2.1.1.5').name), (1, 'SNMPv2-MIB::renamed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""===================================================================================
+test_pyresults.py
+
+Description:
+    outcomes of pyschar/pycreate runs written through ResultsStore, the
+    per-firmware and per-month rollups kept in the same transactions, the
+    canned queries that read them, the report export of a run, and the
+    pyschar --corpus probes kept apart from the char outcomes.
+==================================================================================="""
+
+import shutil
+import tempfile
+import unittest
+import csv
+import os
+
+import pyresults
+
+
+class ResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        csv.register_dialect('singlequote', delimiter='\t', escapechar=None, doublequote=True,
+                             quoting=csv.QUOTE_MINIMAL, quotechar="'")
+        self.directory = tempfile.mkdtemp()
+        self.databaseFilename = os.path.join(self.directory, 'results.db')
+        self.infoCalls = []
+
+    def tearDown(self):
+        pyresults.ResultsStore.instance = None
+        shutil.rmtree(self.directory)
+
+    def storeGet(self, script, firmware):
+        def runInfoGet():
+            self.infoCalls.append(firmware)
+            return '10.0.0.1', firmware
+        return pyresults.ResultsStore(self.databaseFilename, script, [script, '10.0.0.1'], runInfoGet)
+
+    def runsRecord(self):
+        '''
+        two pyschar runs on two builds, owner strings start rejecting '#' in the second
+        '''
+        for firmware, ownerTier in (('8.1', 0), ('8.2', 3)):
+            store = self.storeGet('pyschar', firmware)
+            for position in range(pyresults.BATCH_ROWS + 100):
+                store.outcomeAdd('RMON-MIB::eventDescription', '%', 'set', 1, 0.01)
+            store.outcomeAdd('RMON-MIB::etherStatsOwner', '#', 'set', ownerTier, 0.5)
+            store.outcomeAdd('RMON-MIB::etherStatsOwner', '~', 'set', 0, 0.02)
+            store.close()
+
+    def testTier(self):
+        self.assertEqual(pyresults.tierGet('#', False), 0)
+        self.assertEqual(pyresults.tierGet('#', ''), 0)
+        self.assertEqual(pyresults.tierGet('#', '#1'), 1)
+        self.assertEqual(pyresults.tierGet('%%', '%%3'), 3)
+
+    def testRunWrittenLazily(self):
+        store = self.storeGet('pyschar', '8.1')
+        store.close()
+        self.assertEqual(self.infoCalls, [])
+        connection = pyresults.databaseOpen(self.databaseFilename)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM runs').fetchone(), (0,))
+
+    def testOutcomeRecord(self):
+        pyresults.outcomeRecord('RMON-MIB::eventDescription', '#', 'set', '#3', 0.1)
+        pyresults.ResultsStore.instance = self.storeGet('pycreate', '8.1')
+        pyresults.outcomeRecord('RMON-MIB::eventDescription.5', '#', 'create', '#2', 0.1)
+        pyresults.ResultsStore.instance.close()
+        connection = pyresults.databaseOpen(self.databaseFilename)
+        self.assertEqual(connection.execute('SELECT leaf, char, phase, tier FROM outcomes').fetchall(),
+                         [('eventDescription', '#', 'create', 2)])
+
+    def testRollups(self):
+        self.runsRecord()
+        self.assertEqual(self.infoCalls, ['8.1', '8.2'])
+        connection = pyresults.databaseOpen(self.databaseFilename)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM outcomes').fetchone(),
+                         (2 * (pyresults.BATCH_ROWS + 102),))
+        self.assertEqual(connection.execute(
+            '''SELECT firmware, tier, probes, rejections FROM firmwareOutcomes
+               WHERE leaf = 'eventDescription' ORDER BY firmware''').fetchall(),
+            [('8.1', 1, pyresults.BATCH_ROWS + 100, 0), ('8.2', 1, pyresults.BATCH_ROWS + 100, 0)])
+        self.assertEqual(pyresults.probedLeavesGet(connection, '8.2', 'set'),
+                         set(['RMON-MIB::eventDescription', 'RMON-MIB::etherStatsOwner']))
+        self.assertEqual(pyresults.probedLeavesGet(connection, '8.2', 'create'), set())
+
+    def testQueries(self):
+        self.runsRecord()
+        connection = pyresults.databaseOpen(self.databaseFilename)
+
+        columns, rows = pyresults.queryRun(connection, 'first-rejected', {'char': '#'})
+        self.assertEqual(columns[:3], ['module', 'leaf', 'firmware'])
+        self.assertEqual([row[:3] for row in rows], [('RMON-MIB', 'etherStatsOwner', '8.2')])
+
+        columns, rows = pyresults.queryRun(connection, 'firmware-diff', {'old': '8.1', 'new': '8.2'})
+        self.assertEqual(rows, [('RMON-MIB', 'etherStatsOwner', '#', 'set', 0, 3)])
+
+        columns, rows = pyresults.queryRun(connection, 'trend', {'char': '#', 'leaf': '%Owner%'})
+        self.assertEqual([row[1:] for row in rows], [(1, 1)])
+
+        columns, rows = pyresults.queryRun(connection, 'slowest', {'limit': 1})
+        self.assertEqual(rows[0][:2], ('RMON-MIB', 'etherStatsOwner'))
+
+        columns, rows = pyresults.queryRun(connection, 'runs', {})
+        self.assertEqual([row[4] for row in rows], ['8.2', '8.1'])
+
+        self.assertRaises(ValueError, pyresults.queryRun, connection, 'trend', {})
+        self.assertRaises(ValueError, pyresults.queryRun, connection, 'trend', {'char': True})
+
+    def testCorpusOutcomes(self):
+        pyresults.corpusOutcomeRecord('RMON-MIB::etherStatsOwner', 'lengths', 'split-at-max', True, False, 0.1)
+        for firmware, taken in (('8.1', False), ('8.2', True)):
+            pyresults.ResultsStore.instance = self.storeGet('pyschar', firmware)
+            pyresults.outcomeRecord('RMON-MIB::etherStatsOwner', '#', 'set', '#3', 0.1)
+            for label, accepted, expected in (('max-octets-multibyte', True, True),
+                                              ('split-at-max', taken, False),
+                                              ('max-chars-multibyte', False, False)):
+                pyresults.corpusOutcomeRecord('RMON-MIB::etherStatsOwner', 'lengths', label,
+                                              accepted, expected, 0.1)
+            pyresults.ResultsStore.instance.close()
+        connection = pyresults.databaseOpen(self.databaseFilename)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM corpusOutcomes').fetchone(), (6,))
+        #the corpus labels are not chars, the char queries do not see them
+        self.assertEqual(connection.execute('SELECT DISTINCT char FROM outcomes').fetchall(), [('#',)])
+        columns, rows = pyresults.queryRun(connection, 'firmware-diff', {'old': '8.1', 'new': '8.2'})
+        self.assertEqual(rows, [])
+        columns, rows = pyresults.queryRun(connection, 'corpus', {'leaf': '%Owner'})
+        self.assertEqual(rows, [('RMON-MIB', 'etherStatsOwner', 'lengths', 'split-at-max', '8.2',
+                                 'accepted', 1)])
+
+    def testExport(self):
+        store = self.storeGet('pycreate', '8.1')
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '#', 'create', 0, 0.1)
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '%', 'create', 3, 0.1)
+        store.outcomeAdd('RMON-MIB::eventDescription.5', '%', 'post-create', 1, 0.1)
+        store.outcomeAdd('RMON-MIB::eventCommunity.5', '#', 'create', 0, 0.1)
+        store.close()
+        connection = pyresults.databaseOpen(self.databaseFilename)
+
+        exportFilename = os.path.join(self.directory, 'export.csv')
+        with open(exportFilename, 'w') as out:
+            pyresults.runExport(connection, store.run['run'], out)
+        with open(exportFilename) as exported:
+            self.assertEqual(exported.read().splitlines(), [
+                'MODULE::leafName\tdisallowed-chars(CREATE)\tdisallowed-chars(POST-CREATE)',
+                'RMON-MIB::eventDescription\t%3\t%1',
+                'RMON-MIB::eventCommunity\tNone\tNone'])
+        self.assertRaises(ValueError, pyresults.runExport, connection, 99, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
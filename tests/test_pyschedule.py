@@ -0,0 +1,135 @@
+"""===================================================================================
+test_pyschedule.py
+
+Description:
+    --time-budget scheduling: the order plan() picks items in, what fits in
+    a budget, the averaged timings and the checkpointed cycle kept in the
+    schedule file across runs.
+==================================================================================="""
+
+import shutil
+import tempfile
+import unittest
+import json
+import os
+
+import pyschedule
+
+
+class BudgetTest(unittest.TestCase):
+
+    def testParse(self):
+        self.assertEqual(pyschedule.budgetParse('5400'), 5400)
+        self.assertEqual(pyschedule.budgetParse('90m'), 5400)
+        self.assertEqual(pyschedule.budgetParse(' 1.5h'), 5400)
+        self.assertEqual(pyschedule.budgetParse(30), 30)
+        for text in ('', '1d', '-5', 'h', '1.5.h'):
+            self.assertRaises(ValueError, pyschedule.budgetParse, text)
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scheduleFilename = os.path.join(self.directory, 'pycreate.schedule.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def schedulerGet(self, budget=3600):
+        return pyschedule.Scheduler(self.scheduleFilename, budget)
+
+    def keysGet(self, items):
+        return [key for key, units, mibHash, payload in items]
+
+    def testPriorities(self):
+        scheduler = self.schedulerGet()
+        items = [('tested-recently', 1, 'h1', None), ('tested-long-ago', 1, 'h2', None),
+                 ('changed', 1, 'h3', None), ('new-expensive', 3, 'h4', None), ('new-cheap', 1, 'h5', None)]
+        scheduler.plan(items)
+        for key, lastRun in (('tested-recently', 200), ('tested-long-ago', 100), ('changed', 300)):
+            scheduler.itemDone(key, 10.0, [])
+            scheduler.state['items'][key]['lastRun'] = lastRun
+
+        #a new cycle, with the MIB definition of one item changed since
+        scheduler = self.schedulerGet()
+        scheduler.state['cycle'] = None
+        planned = scheduler.plan([item if item[0] != 'changed' else ('changed', 1, 'h3-new', None)
+                                  for item in items])
+        self.assertEqual(self.keysGet(planned), ['new-cheap', 'new-expensive', 'changed',
+                                                 'tested-long-ago', 'tested-recently'])
+
+    def testEstimates(self):
+        scheduler = self.schedulerGet()
+        self.assertEqual(scheduler.estimateGet('a', 2), 2 * pyschedule.DEFAULT_UNIT_SECONDS)
+        scheduler.plan([('a', 4, 'h', None), ('b', 2, 'h', None)])
+        scheduler.itemDone('a', 10.0, [])
+        #new items are guessed from the seconds per string leaf of the timed ones
+        self.assertEqual(scheduler.estimateGet('b', 2), 5.0)
+        scheduler.itemDone('a', 20.0, [])
+        self.assertEqual(scheduler.estimateGet('a', 4), 15.0)
+        self.assertEqual(scheduler.state['items']['a']['runs'], 2)
+
+    def testFit(self):
+        scheduler = self.schedulerGet(budget=pyschedule.DEFAULT_UNIT_SECONDS * 2.5)
+        planned = scheduler.plan([('a', 1, 'h', 'A'), ('b', 2, 'h', 'B'), ('c', 1, 'h', 'C')])
+        self.assertEqual(self.keysGet(planned), ['a', 'c', 'b'])
+        self.assertEqual(self.keysGet(scheduler.itemsFit(planned)), ['a', 'c'])
+        #in conf order the greedy fit still fills what is left after b
+        self.assertEqual(self.keysGet(scheduler.itemsFit([planned[0], planned[2], planned[1]])), ['a', 'c'])
+
+        #each item taking its estimate, the wall clock decides what still fits
+        payloads = []
+        for payload in scheduler.itemsIterate(planned):
+            payloads.append(payload)
+            scheduler.started -= pyschedule.DEFAULT_UNIT_SECONDS * {'A': 1, 'B': 2, 'C': 1}[payload]
+        self.assertEqual(payloads, ['A', 'C'])
+
+    def testCycle(self):
+        items = [('a', 1, 'h', None), ('b', 1, 'h', None), ('c', 1, 'h', None)]
+        scheduler = self.schedulerGet()
+        scheduler.plan(items)
+        scheduler.itemDone('b', 1.0, [['MIB::b', 'None']])
+        scheduler.itemDone('a', 1.0, [['MIB::a', '#3']])
+
+        #the next run only gets c, and the rows of a and b in conf order
+        scheduler = self.schedulerGet()
+        self.assertEqual(self.keysGet(scheduler.plan(items)), ['c'])
+        self.assertEqual(scheduler.resultsGet(), [['MIB::a', '#3'], ['MIB::b', 'None']])
+        scheduler.itemDone('c', 1.0, [])
+
+        #every item done, a new cycle starts over all of them
+        scheduler = self.schedulerGet()
+        self.assertEqual(sorted(self.keysGet(scheduler.plan(items))), ['a', 'b', 'c'])
+        self.assertEqual(scheduler.resultsGet(), [])
+
+    def testChangedItemRunAgain(self):
+        scheduler = self.schedulerGet()
+        scheduler.plan([('a', 1, 'h', None), ('b', 1, 'h', None)])
+        scheduler.itemDone('a', 1.0, [])
+        scheduler = self.schedulerGet()
+        #b was never tested, so it still goes before a
+        self.assertEqual(self.keysGet(scheduler.plan([('a', 1, 'h2', None), ('b', 1, 'h', None)])), ['b', 'a'])
+
+    def testScheduleFile(self):
+        scheduler = self.schedulerGet()
+        scheduler.plan([('a', 1, 'h', None)])
+        scheduler.itemDone('a', 3.0, [])
+        self.assertFalse(os.path.exists(self.scheduleFilename + '.tmp'))
+        with open(self.scheduleFilename) as scheduleFile:
+            state = json.load(scheduleFile)
+        self.assertEqual(state['items']['a']['seconds'], 3.0)
+        self.assertEqual(state['cycle']['done'], {'a': 'h'})
+
+        #a schedule file of another version is started over
+        state['schedule'] = pyschedule.SCHEDULE_VERSION + 1
+        with open(self.scheduleFilename, 'w') as scheduleFile:
+            json.dump(state, scheduleFile)
+        self.assertEqual(self.schedulerGet().state['items'], {})
+
+    def testDefinitionHash(self):
+        self.assertEqual(pyschedule.definitionHashGet(b'abc'), 'a9993e364706816aba3e25717850c26c9cd0d89d')
+
+
+if __name__ == '__main__':
+    unittest.main()
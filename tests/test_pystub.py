@@ -0,0 +1,191 @@
+"""===================================================================================
+test_pystub.py
+
+Description:
+    the behaviour of the pystub.py agent the scripts rely on: all-or-nothing
+    SETs, the RowStatus and EntryStatus row transitions, the rejection of
+    read-only, unknown, mistyped and oversized writes, and serving on the
+    loopback interface between start() and stop().
+==================================================================================="""
+
+from collections import OrderedDict
+import socket
+import unittest
+
+import pyber
+import pystub
+
+
+ENTERPRISE = '.1.3.6.1.4.1.99999'
+OIDS = {
+    'TEST-MIB::testName': ENTERPRISE + '.1.1.2',
+    'TEST-MIB::testStatus': ENTERPRISE + '.1.1.3',
+    'TEST-MIB::eventOwner': ENTERPRISE + '.2.1.2',
+    'TEST-MIB::eventStatus': ENTERPRISE + '.2.1.3',
+    'TEST-MIB::testOwner': ENTERPRISE + '.3',
+    'TEST-MIB::testContact': ENTERPRISE + '.4',
+}
+CONFS = [
+    OrderedDict([('TEST-MIB', OrderedDict([
+        #RowStatus, created with createAndGo(4)
+        ('testEntry', OrderedDict([
+            ('index', OrderedDict([('testIndex', '1')])),
+            ('testName', {'type': 's', 'value': None}),
+            ('testStatus', {'type': 'i', 'value': '4'})])),
+        #EntryStatus, created with createRequest(2) as the RMON tables are
+        ('eventEntry', OrderedDict([
+            ('index', OrderedDict([('eventIndex', '1')])),
+            ('eventOwner', {'type': 's', 'value': None}),
+            ('eventStatus', {'type': 'i', 'value': '3'})]))]))]),
+    OrderedDict([('TEST-MIB', ['testOwner', 'testContact'])]),
+]
+RULES = {
+    'oids': OIDS,
+    'leaves': {'TEST-MIB::testOwner': {'reject': '#', 'maxLength': 8},
+               'TEST-MIB::testContact': {'truncate': 4}},
+}
+
+
+def oidGet(name, index=''):
+    return pyber.oidParse(OIDS[name] + index)
+
+
+def string(value):
+    return (pyber.ASN_OCTET_STR, value)
+
+
+def integer(value):
+    return (pyber.ASN_INTEGER, value)
+
+
+class StubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agent = pystub.StubAgent(CONFS, RULES)
+
+    def set(self, *varbinds, **options):
+        response = self.agent.pduProcess(options.get('access', 'rw'),
+                                         {'type': pyber.PDU_SET, 'requestId': 1,
+                                          'varbinds': list(varbinds)})
+        return response['errorStatus'], response['errorIndex']
+
+    def get(self, oid):
+        response = self.agent.pduProcess('ro', {'type': pyber.PDU_GET, 'requestId': 1,
+                                                'varbinds': [(oid, (pyber.ASN_NULL, None))]})
+        return response['varbinds'][0][1]
+
+    def testSetRollback(self):
+        owner = oidGet('TEST-MIB::testOwner', '.0')
+        contact = oidGet('TEST-MIB::testContact', '.0')
+        self.assertEqual(self.set((owner, string(b'first'))), (pyber.ERR_NOERROR, 0))
+        #the second varbind is rejected, the first one is not kept either
+        self.assertEqual(self.set((contact, string(b'abc')), (owner, string(b'a#b'))),
+                         (pyber.ERR_WRONGVALUE, 2))
+        self.assertEqual(self.get(owner), string(b'first'))
+        self.assertEqual(self.get(contact), string(b''))
+
+        #a row created in a failed SET is not created
+        status = oidGet('TEST-MIB::testStatus', '.7')
+        self.assertEqual(self.set((oidGet('TEST-MIB::testName', '.7'), string(b'x')),
+                                  (status, integer(pystub.STATUS_CREATEANDGO)),
+                                  (owner, string(b'too long for it'))),
+                         (pyber.ERR_WRONGLENGTH, 3))
+        self.assertEqual(self.get(status), (pyber.SNMP_NOSUCHINSTANCE, None))
+        self.assertEqual(self.agent.statsGet()['setFailures'], 2)
+
+    def testRowStatus(self):
+        status = oidGet('TEST-MIB::testStatus', '.1')
+        name = oidGet('TEST-MIB::testName', '.1')
+        self.assertEqual(self.set((name, string(b'x'))), (pyber.ERR_NOCREATION, 1))
+
+        #the rowStatus varbind goes first whatever its place in the PDU
+        self.assertEqual(self.set((name, string(b'probe')), (status, integer(pystub.STATUS_CREATEANDGO))),
+                         (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(status), integer(pystub.STATUS_ACTIVE))
+        self.assertEqual(self.get(name), string(b'probe'))
+        self.assertEqual(self.set((status, integer(pystub.STATUS_CREATEANDGO))),
+                         (pyber.ERR_INCONSISTENTVALUE, 1))
+
+        self.assertEqual(self.set((status, integer(pystub.STATUS_DESTROY))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(name), (pyber.SNMP_NOSUCHINSTANCE, None))
+        self.assertEqual(self.set((status, integer(pystub.STATUS_ACTIVE))), (pyber.ERR_INCONSISTENTVALUE, 1))
+
+        self.assertEqual(self.set((status, integer(pystub.STATUS_CREATEANDWAIT))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(status), integer(pystub.STATUS_NOTINSERVICE))
+        self.assertEqual(self.get(name), string(b''))
+        self.assertEqual(self.set((status, integer(pystub.STATUS_ACTIVE))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(status), integer(pystub.STATUS_ACTIVE))
+        self.assertEqual(self.set((status, integer(99))), (pyber.ERR_WRONGVALUE, 1))
+
+    def testEntryStatus(self):
+        status = oidGet('TEST-MIB::eventStatus', '.1')
+        owner = oidGet('TEST-MIB::eventOwner', '.1')
+        #createRequest(2)
+        self.assertEqual(self.set((status, integer(2))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(status), integer(pystub.STATUS_UNDERCREATION))
+        self.assertEqual(self.set((status, integer(2))), (pyber.ERR_INCONSISTENTVALUE, 1))
+        self.assertEqual(self.set((owner, string(b'probe')), (status, integer(pystub.STATUS_ACTIVE))),
+                         (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(status), integer(pystub.STATUS_ACTIVE))
+        self.assertEqual(self.set((status, integer(pystub.ENTRY_INVALID))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(owner), (pyber.SNMP_NOSUCHINSTANCE, None))
+
+    def testRejectedWrites(self):
+        owner = oidGet('TEST-MIB::testOwner', '.0')
+        self.assertEqual(self.set((owner, string(b'x')), access='ro'), (pyber.ERR_NOACCESS, 1))
+        self.assertEqual(self.set((pyber.oidParse(ENTERPRISE + '.9.0'), string(b'x'))),
+                         (pyber.ERR_NOTWRITABLE, 1))
+        self.assertEqual(self.set((owner, integer(1))), (pyber.ERR_WRONGTYPE, 1))
+        self.assertEqual(self.set((oidGet('TEST-MIB::testOwner', '.1'), string(b'x'))),
+                         (pyber.ERR_NOCREATION, 1))
+
+        #SIZE (0..8)
+        self.assertEqual(self.set((owner, string(b'a' * 9))), (pyber.ERR_WRONGLENGTH, 1))
+        self.assertEqual(self.set((owner, string(b'a' * 8))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(owner), string(b'a' * 8))
+        self.assertEqual(self.agent.statsGet()['setFailures'], 5)
+
+    def testTruncate(self):
+        contact = oidGet('TEST-MIB::testContact', '.0')
+        self.assertEqual(self.set((contact, string(b'abcdefgh'))), (pyber.ERR_NOERROR, 0))
+        self.assertEqual(self.get(contact), string(b'abcd'))
+
+
+class ServeTest(unittest.TestCase):
+
+    def request(self, port, community, pdu):
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.settimeout(2)
+        try:
+            client.sendto(pyber.messageEncode({'version': 1, 'community': community, 'pdu': pdu}),
+                          ('127.0.0.1', port))
+            data, address = client.recvfrom(65535)
+        finally:
+            client.close()
+        return pyber.messageDecode(data)['pdu']
+
+    def testStartStop(self):
+        agent = pystub.StubAgent(CONFS, RULES)
+        owner = oidGet('TEST-MIB::testOwner', '.0')
+        for attempt in range(2):
+            port = agent.start(0)
+            response = self.request(port, b'private', {
+                'type': pyber.PDU_SET, 'requestId': 7, 'errorStatus': 0, 'errorIndex': 0,
+                'varbinds': [(owner, string(b'run%d' % attempt))]})
+            self.assertEqual((response['requestId'], response['errorStatus']), (7, 0))
+            response = self.request(port, b'public', {
+                'type': pyber.PDU_GET, 'requestId': 8, 'errorStatus': 0, 'errorIndex': 0,
+                'varbinds': [(owner, (pyber.ASN_NULL, None))]})
+            self.assertEqual(response['varbinds'], [(owner, string(b'run%d' % attempt))])
+
+            thread = agent.thread
+            agent.stop()
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(agent.sock, None)
+            agent.stop()
+        self.assertEqual(agent.statsGet()['requests'], 4)
+        self.assertEqual(agent.statsGet()['dropped'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""===================================================================================
+test_pytransport.py
+
+Description:
+    the run-wide instrumentation of pytransport.py around the commands the
+    scripts run: the --profile child process breakdown and stats, and the
+    --timeline trace events of the commands and operations.
+==================================================================================="""
+
+from subprocess import Popen, PIPE
+import shutil
+import tempfile
+import unittest
+import pstats
+import json
+import sys
+import os
+
+import pytransport
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pstatsFilename = os.path.join(self.directory, 'test.pstats')
+        pytransport.Profiler.instance = pytransport.Profiler(self.pstatsFilename)
+
+    def tearDown(self):
+        pytransport.Profiler.instance.profile.disable()
+        pytransport.Profiler.instance = None
+        shutil.rmtree(self.directory)
+
+    def testToolBreakdown(self):
+        pytransport.snmpRun('echo a')
+        pytransport.snmpRun('echo b')
+        self.assertEqual(pytransport.snmpRunParallel(['sleep 0.2', 'echo c']), [(0, b''), (0, b'c\n')])
+        tools = pytransport.Profiler.instance.tools
+        self.assertEqual(list(tools), ['echo', 'sleep'])
+        self.assertEqual([tools['echo'][0], tools['sleep'][0]], [3, 1])
+        #the commands of a parallel batch share its wall time
+        self.assertTrue(tools['sleep'][1] >= 0.1)
+        self.assertTrue(tools['echo'][1] >= 0.1)
+
+    def testClose(self):
+        pytransport.snmpRun('echo a')
+        reportFilename = os.path.join(self.directory, 'stderr.txt')
+        saved = sys.stderr
+        try:
+            with open(reportFilename, 'w') as sys.stderr:
+                pytransport.Profiler.instance.close()
+        finally:
+            sys.stderr = saved
+        with open(reportFilename) as report:
+            text = report.read()
+        for label in ('python cpu', 'child cpu', 'network wait', 'other'):
+            self.assertTrue('    %-14s' % label in text, label)
+        self.assertTrue('echo                  1 commands' in text)
+        stats = pstats.Stats(self.pstatsFilename)
+        self.assertTrue([function for function in stats.stats if function[2] == 'snmpRun'])
+
+
+class TimelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.timelineFilename = os.path.join(self.directory, 'timeline.json')
+        self.savedAgent = pytransport.agent
+        pytransport.agent = '10.0.0.1'
+        pytransport.Timeline.instance = pytransport.Timeline(self.timelineFilename)
+
+    def tearDown(self):
+        timeline = pytransport.Timeline.instance
+        if timeline and timeline.timelineFile:
+            timeline.close()
+        pytransport.Timeline.instance = None
+        pytransport.agent = self.savedAgent
+        shutil.rmtree(self.directory)
+
+    def eventsGet(self):
+        pytransport.Timeline.instance.close()
+        with open(self.timelineFilename) as timelineFile:
+            lines = timelineFile.read().splitlines()
+        #one event per line, so a run that dies half way leaves the events so far
+        self.assertEqual((lines[0], lines[-1]), ('[', ']'))
+        self.assertTrue(all(line.endswith(',') for line in lines[1:-2]))
+        with open(self.timelineFilename) as timelineFile:
+            return json.load(timelineFile)
+
+    def testOperations(self):
+        timeline = pytransport.Timeline.instance
+        cmd = 'snmpset -v 2c -c private 10.0.0.1 RMON-MIB::eventDescription.5 s %s'
+        with pytransport.operation('create', 'RMON-MIB::eventDescription', '#'):
+            timeline.commandWrite(cmd % "'#'", timeline.started, timeline.started + 0.25, 2)
+            timeline.commandWrite(cmd % "'a#'", timeline.started + 0.25, timeline.started + 0.5, 0)
+            with pytransport.operation('read-back'):
+                timeline.commandWrite('snmpget -v 2c -c public 10.0.0.1 RMON-MIB::eventDescription.5',
+                                      timeline.started + 0.5, timeline.started + 0.75, 0)
+
+        events = self.eventsGet()
+        self.assertEqual(events[0], {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0,
+                                     'args': {'name': '10.0.0.1'}})
+        spans = [event for event in events if event['ph'] == 'X']
+        self.assertEqual([(span['name'], span['cat']) for span in spans], [
+            ('snmpset', 'create'), ('snmpset', 'create'), ('snmpget', 'read-back'),
+            ('read-back', 'operation'), ('create', 'operation')])
+        self.assertEqual(spans[0]['args'], {
+            'agent': '10.0.0.1', 'module': 'RMON-MIB', 'leaf': 'eventDescription', 'char': '#',
+            'cmd': cmd % "'#'", 'rc': 2, 'objects': ['RMON-MIB::eventDescription'], 'attempt': 1})
+        self.assertEqual((spans[0]['ts'], spans[0]['dur']), (0, 250000))
+        self.assertEqual((spans[1]['args']['attempt'], spans[1]['ts']), (2, 250000))
+        #the commands of a nested operation carry the tags of the enclosing ones
+        self.assertEqual((spans[2]['args']['attempt'], spans[2]['args']['char']), (1, '#'))
+        self.assertEqual(spans[4]['args']['leaf'], 'eventDescription')
+        self.assertTrue(spans[4]['dur'] >= spans[3]['dur'])
+        self.assertEqual(events[-1]['name'], 'end')
+
+    def testAgentsAndThreads(self):
+        timeline = pytransport.Timeline.instance
+        start = timeline.started
+        timeline.commandWrite('snmpget -v 2c -c public 10.0.0.1 RMON-MIB::etherStatsOwner.1', start, start, 0)
+        for tid in (1, 2):
+            timeline.commandWrite('snmpset -v 2c -c private 10.0.0.1 RMON-MIB::etherStatsOwner.1 s x',
+                                  start, start + 0.1, 0, tid)
+        pytransport.agent = '10.0.0.2'
+        timeline.commandWrite('snmpget -v 2c -c public 10.0.0.2 RMON-MIB::etherStatsOwner.1', start, start, 0)
+
+        events = self.eventsGet()
+        self.assertEqual([event['args']['name'] for event in events if event['ph'] == 'M'],
+                         ['10.0.0.1', '10.0.0.2'])
+        spans = [event for event in events if event['ph'] == 'X']
+        self.assertEqual([(span['pid'], span['tid'], span['cat']) for span in spans],
+                         [(1, 0, 'snmp'), (1, 1, 'snmp'), (1, 2, 'snmp'), (2, 0, 'snmp')])
+        self.assertTrue('attempt' not in spans[0]['args'])
+
+    def testWithoutTimeline(self):
+        pytransport.Timeline.instance.close()
+        pytransport.Timeline.instance = None
+        with pytransport.operation('create', 'RMON-MIB::eventDescription', '#'):
+            ran = True
+        self.assertTrue(ran)
+
+
+class DaemonForwardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testNoDaemonKeepsStdin(self):
+        #a piped run with no daemon listening must still see its input
+        socketFilename = os.path.join(self.directory, 'missing.sock')
+        script = ('import sys, pytransport\n'
+                  'returncode = pytransport.daemonForward(["pyoids.py", "--daemon=%s"])\n'
+                  'sys.stdout.write("%%s %%s" %% (returncode, sys.stdin.readline()))\n' % socketFilename)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = Popen([sys.executable, '-c', script], stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                        cwd=root)
+        output, errors = process.communicate(b'rootOids.csv\n')
+        self.assertEqual(process.returncode, 0, errors)
+        self.assertEqual(output, b'None rootOids.csv\n')
+        self.assertTrue(b'running locally' in errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""===================================================================================
+test_pyusm.py
+
+Description:
+    RFC 3414 A.3 key localization vectors, the UsmSecurityParameters
+    encoding and HMAC-*-96 message authentication, and engineID discovery
+    against a pystub.py agent on the loopback interface.
+==================================================================================="""
+
+import binascii
+import unittest
+
+import pyber
+import pystub
+import pyusm
+
+
+#RFC 3414 A.3, password "maplesyrup"
+ENGINE_ID = binascii.unhexlify('000000000000000000000002')
+VECTORS = {
+    'MD5': ('9faf3283884e92834ebc9847d8edd963', '526f5eed9fcce26f8964c2930787d82b'),
+    'SHA': ('9fb5cc0381497b3793528939ff788d5d79145211', '6695febc9288e36282235fc7151f128497b38f3f'),
+}
+
+
+def hexGet(data):
+    return binascii.hexlify(bytes(data)).decode('ascii')
+
+
+class KeyTest(unittest.TestCase):
+
+    def testRfc3414Vectors(self):
+        for protocol, (masterKey, localizedKey) in VECTORS.items():
+            self.assertEqual(hexGet(pyusm.passwordToKey('maplesyrup', protocol)), masterKey)
+            self.assertEqual(hexGet(pyusm.localizedKeyGet('maplesyrup', protocol, ENGINE_ID)), localizedKey)
+
+    def testMasterKeyCached(self):
+        pyusm.passwordToKey('maplesyrup', 'SHA')
+        self.assertIn(('SHA', 'maplesyrup'), pyusm.masterKeys)
+
+    def testEmptyPassword(self):
+        self.assertRaises(pyusm.UsmError, pyusm.passwordToKey, '', 'MD5')
+
+
+class MessageTest(unittest.TestCase):
+
+    params = {'engineId': ENGINE_ID, 'boots': 3, 'time': 1200, 'userName': b'pystub',
+              'authParams': b'\x00' * pyusm.AUTH_PARAMS_LENGTH, 'privParams': b''}
+    scopedPdu = {'contextEngineId': ENGINE_ID, 'contextName': b'',
+                 'pdu': {'type': pyber.PDU_GET, 'requestId': 99, 'errorStatus': 0, 'errorIndex': 0,
+                         'varbinds': [((1, 3, 6, 1, 2, 1, 1, 5, 0), (pyber.ASN_NULL, None))]}}
+
+    def testParametersRoundTrip(self):
+        encoded, authOffset = pyusm.usmParametersEncode(self.params)
+        decoded = pyusm.usmParametersDecode(encoded)
+        self.assertEqual(decoded.pop('authOffset'), authOffset)
+        self.assertEqual(decoded, self.params)
+        self.assertEqual(encoded[authOffset:authOffset + pyusm.AUTH_PARAMS_LENGTH], self.params['authParams'])
+
+    def testAuthentication(self):
+        for protocol in VECTORS:
+            authKey = pyusm.localizedKeyGet('maplesyrup', protocol, ENGINE_ID)
+            data = pyusm.messageBuild(99, pyusm.FLAG_AUTH | pyusm.FLAG_REPORTABLE, self.params,
+                                      self.scopedPdu, authKey, protocol)
+            msg = pyber.messageDecode(data)
+            params = pyusm.usmParametersDecode(msg['securityParameters'])
+            self.assertEqual(msg['scopedPdu'], self.scopedPdu)
+            self.assertTrue(pyusm.messageVerify(data, msg, params, authKey, protocol))
+
+            otherKey = pyusm.localizedKeyGet('maplesyrup', protocol, b'\x80\x00\x1f\x88\x04')
+            self.assertFalse(pyusm.messageVerify(data, msg, params, otherKey, protocol))
+            tampered = bytearray(data)
+            tampered[-1] ^= 0x01
+            self.assertFalse(pyusm.messageVerify(bytes(tampered), msg, params, authKey, protocol))
+
+
+class DiscoveryTest(unittest.TestCase):
+
+    def testEngineDiscover(self):
+        agent = pystub.StubAgent([], {'engineID': '80001f8804707973747562'})
+        port = agent.start(0)
+        try:
+            engineId, boots, engineTime = pyusm.engineDiscover('127.0.0.1', port)
+        finally:
+            agent.stop()
+        self.assertEqual(engineId, binascii.unhexlify('80001f8804707973747562'))
+        self.assertEqual(boots, pystub.ENGINE_BOOTS)
+
+
+if __name__ == '__main__':
+    unittest.main()